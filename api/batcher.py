@@ -0,0 +1,195 @@
+# api/batcher.py
+"""
+Micro-batching for search requests.
+
+Concurrent requests are queued, and a single worker task drains the queue in
+batches of up to ``max_batch`` queries (waiting at most ``max_wait_ms`` for a
+batch to fill). Each batch is encoded with one forward pass and searched with
+one FAISS call in a worker thread, so the event loop never blocks. Query
+embeddings and final results are kept in LRU caches.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class LRUCache:
+    """Small least-recently-used mapping (not thread-safe; used from one thread)."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class QueryBatcher:
+    """
+    Collects concurrent searches into batched encode + search calls.
+
+    Args:
+        store: EmbeddingStore or SegmentedEmbeddingStore (``encode_queries``,
+            ``search_vectors`` and ``resolve``).
+        max_batch (int): Maximum queries per batch.
+        max_wait_ms (float): Longest time the first query of a batch waits for others.
+        cache_size (int): Entries in each of the embedding and result LRU caches.
+    """
+
+    def __init__(self, store, max_batch: int = 32, max_wait_ms: float = 5.0, cache_size: int = 1024):
+        self.store = store
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.embeddings = LRUCache(cache_size)
+        self.results = LRUCache(cache_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # One thread: FAISS and the encoder parallelise internally, and it keeps
+        # the LRU caches single-threaded
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-batch")
+        self.batches = 0
+        self.queries = 0
+
+    async def search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> List[Dict]:
+        """Queue one search and wait for its hits (see EmbeddingStore.search)."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        subs = tuple(sorted(s.lower() for s in subreddits)) if subreddits is not None else None
+        await self._queue.put(((query, k, nprobe, ef_search, subs, start_ts, end_ts), future))
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "embedding_cache_hits": self.embeddings.hits,
+            "result_cache_hits": self.results.hits,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            requests = [request for request, _ in batch]
+            try:
+                outcomes = await loop.run_in_executor(self._executor, self._search_batch, requests)
+            except Exception as e:
+                logging.warning(f"Search batch of {len(batch)} failed: {e}")
+                outcomes = [e] * len(batch)
+            for (_, future), outcome in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+    def _search_batch(self, requests: List[Tuple]) -> List[Any]:
+        """Runs in the worker thread: one encode and one search per parameter group."""
+        self.batches += 1
+        self.queries += len(requests)
+        generation = getattr(self.store, "generation", None)
+        outcomes: List[Any] = [None] * len(requests)
+        todo = []
+        for i, request in enumerate(requests):
+            cached = self.results.get((generation, request))
+            if cached is not None:
+                outcomes[i] = cached
+            else:
+                todo.append(i)
+        if not todo:
+            return outcomes
+
+        texts = list(dict.fromkeys(requests[i][0] for i in todo))
+        vectors: Dict[str, np.ndarray] = {}
+        missing = []
+        for text in texts:
+            vector = self.embeddings.get(text)
+            if vector is None:
+                missing.append(text)
+            else:
+                vectors[text] = vector
+        if missing:
+            for text, vector in zip(missing, self.store.encode_queries(missing)):
+                self.embeddings.put(text, vector)
+                vectors[text] = vector
+
+        # Queries with the same knobs and filters share one FAISS call at their largest k
+        groups: Dict[Tuple, List[int]] = {}
+        for i in todo:
+            groups.setdefault(requests[i][2:], []).append(i)
+        for params, members in groups.items():
+            try:
+                self._search_group(requests, members, params, vectors, generation, outcomes)
+            except Exception as e:
+                # Only this group's requests fail; the rest of the batch is unaffected
+                logging.warning(f"Search group of {len(members)} failed: {e}")
+                for i in members:
+                    outcomes[i] = e
+        return outcomes
+
+    def _search_group(
+        self,
+        requests: List[Tuple],
+        members: List[int],
+        params: Tuple,
+        vectors: Dict[str, np.ndarray],
+        generation: Any,
+        outcomes: List[Any],
+    ) -> None:
+        """One FAISS call for the requests ``members`` sharing knobs and filters ``params``."""
+        nprobe, ef_search, subs, start_ts, end_ts = params
+        k = max(requests[i][1] for i in members)
+        matrix = np.vstack([vectors[requests[i][0]] for i in members]).astype("float32")
+        D, I = self.store.search_vectors(
+            matrix, k, nprobe, ef_search, subreddits=subs, start_ts=start_ts, end_ts=end_ts,
+        )
+        for row, i in enumerate(members):
+            k_i = requests[i][1]
+            hits = self.store.resolve(D[row][:k_i], I[row][:k_i])
+            self.results.put((generation, requests[i]), hits)
+            outcomes[i] = hits
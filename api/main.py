@@ -1,36 +1,180 @@
 # api/main.py
 
+import asyncio
+import calendar
+import logging
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from nlp_core.embeddings import EmbeddingStore
+from nlp_core.index_segments import SegmentedEmbeddingStore, load_store
+from nlp_core.query import open_features
+from api.batcher import QueryBatcher
 import uvicorn
 
 app = FastAPI(title="Election NLP API")
 
-# Initialize embedding store (assumes index built elsewhere)
-emb_store = EmbeddingStore()
+# Segmented index written by run_pipeline (<out-root>/embeddings/index), or a
+# single EmbeddingStore.save directory
+EMBEDDINGS_DIR = os.environ.get("EMBEDDINGS_DIR", "data/embeddings/index")
+
+# Enriched features written by run_pipeline (<out-root>/features); opened on
+# the first query and reopened after the pipeline rewrites it
+FEATURES_DIR = os.environ.get("FEATURES_DIR", "data/features")
+MAX_FEATURE_ROWS = int(os.environ.get("MAX_FEATURE_ROWS", "10000"))
+
+# Largest top_k a search may ask for; larger values are rejected with a 422
+MAX_TOP_K = int(os.environ.get("MAX_TOP_K", "1000"))
+
+# Segments are memory-mapped, so every uvicorn worker shares one on-disk copy;
+# new segments and deletions are picked up on the next search
+emb_store: Optional[Union[EmbeddingStore, SegmentedEmbeddingStore]] = None
 try:
-    # In a real scenario, load a pre-built index file
-    pass  # emb_store.index = faiss.read_index("data/embeddings/index.faiss")
-except Exception:
-    pass
+    emb_store = load_store(EMBEDDINGS_DIR)
+except Exception as e:
+    logging.warning(f"No embedding index loaded from {EMBEDDINGS_DIR}: {e}")
+
+# Concurrent searches are encoded and searched together; SEARCH_BATCH_MAX=1
+# turns batching off (e.g. to compare with benchmarks/load_test_api.py)
+batcher: Optional[QueryBatcher] = None
+if emb_store is not None:
+    batcher = QueryBatcher(
+        emb_store,
+        max_batch=int(os.environ.get("SEARCH_BATCH_MAX", "32")),
+        max_wait_ms=float(os.environ.get("SEARCH_BATCH_WAIT_MS", "5")),
+        cache_size=int(os.environ.get("SEARCH_CACHE_SIZE", "1024")),
+    )
 
 class QueryRequest(BaseModel):
     query: str
-    top_k: int = 5
+    top_k: int = Field(5, gt=0, le=MAX_TOP_K)
+    # Recall/latency knobs for IVF (nprobe) and HNSW (ef_search) indexes
+    nprobe: Optional[int] = Field(None, gt=0)
+    ef_search: Optional[int] = Field(None, gt=0)
+    # Optional filters: subreddits (case-insensitive) and an inclusive UTC date range
+    subreddits: Optional[List[str]] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: int = Field(5, gt=0, le=MAX_TOP_K)
+    nprobe: Optional[int] = Field(None, gt=0)
+    ef_search: Optional[int] = Field(None, gt=0)
+    subreddits: Optional[List[str]] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+class FeatureQueryRequest(BaseModel):
+    # Columns to return (default: nlp_core.query.DEFAULT_COLUMNS)
+    columns: Optional[List[str]] = None
+    subreddits: Optional[List[str]] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+    # Further [column, op, value] conditions, e.g. ["sarcasm_score", ">", 0.8]
+    filters: Optional[List[Tuple[str, str, Any]]] = None
+    limit: int = 100
+
+def _time_window(start: Optional[date], end: Optional[date]) -> Tuple[Optional[int], Optional[int]]:
+    """Epoch-second bounds covering whole UTC days."""
+    start_ts = calendar.timegm(start.timetuple()) if start else None
+    end_ts = calendar.timegm(end.timetuple()) + 86399 if end else None
+    if start_ts is not None and end_ts is not None and start_ts > end_ts:
+        raise HTTPException(status_code=400, detail="start must not be after end.")
+    return start_ts, end_ts
+
+def _require_batcher() -> QueryBatcher:
+    if batcher is None:
+        raise HTTPException(status_code=503, detail=f"No embedding index at {EMBEDDINGS_DIR}.")
+    return batcher
 
 @app.post("/api/search")
-def search(request: QueryRequest):
+async def search(request: QueryRequest):
     """
     Search the comment embeddings for nearest neighbors to the query.
+
+    Returns the comment id, cosine score, subreddit and created_utc of each hit,
+    optionally restricted to ``subreddits`` and the ``start``–``end`` date range.
     """
     if not request.query:
         raise HTTPException(status_code=400, detail="Query text cannot be empty.")
+    searcher = _require_batcher()
+    start_ts, end_ts = _time_window(request.start, request.end)
+    try:
+        results = await searcher.search(
+            request.query, k=request.top_k, nprobe=request.nprobe, ef_search=request.ef_search,
+            subreddits=request.subreddits, start_ts=start_ts, end_ts=end_ts,
+        )
+        return {"results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/search/batch")
+async def search_batch(request: BatchQueryRequest):
+    """
+    Search several queries at once; results are returned in query order.
+    """
+    if not request.queries or any(not q for q in request.queries):
+        raise HTTPException(status_code=400, detail="Query texts cannot be empty.")
+    searcher = _require_batcher()
+    start_ts, end_ts = _time_window(request.start, request.end)
     try:
-        indices = emb_store.search(request.query, k=request.top_k)
-        return {"indices": indices}
+        results = await asyncio.gather(*(
+            searcher.search(
+                q, k=request.top_k, nprobe=request.nprobe, ef_search=request.ef_search,
+                subreddits=request.subreddits, start_ts=start_ts, end_ts=end_ts,
+            )
+            for q in request.queries
+        ))
+        return {"results": list(results)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _json_rows(table: pa.Table) -> List[Dict[str, Any]]:
+    """Rows of ``table`` with NaN floats as null (JSON has no NaN)."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type):
+            column = table.column(i)
+            table = table.set_column(i, field, pc.if_else(pc.is_nan(column), None, column))
+    return table.to_pylist()
+
+@app.post("/api/features")
+def query_features(request: FeatureQueryRequest):
+    """
+    Comment-level NLP features, restricted to ``subreddits``, the ``start``–``end``
+    date range and ``filters``.
+
+    Only the matching subreddit/day partitions and row groups are read; at most
+    ``limit`` rows are returned, with ``total`` counting all matches.
+    """
+    if not 0 < request.limit <= MAX_FEATURE_ROWS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_FEATURE_ROWS}.")
+    start_ts, end_ts = _time_window(request.start, request.end)
+    try:
+        dataset = open_features(FEATURES_DIR)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        table = dataset.query(
+            columns=request.columns, subreddits=request.subreddits, start_ts=start_ts, end_ts=end_ts,
+            filters=request.filters, limit=request.limit,
+        )
+        total = dataset.count(
+            subreddits=request.subreddits, start_ts=start_ts, end_ts=end_ts, filters=request.filters
+        )
+    except (ValueError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"total": total, "rows": _json_rows(table)}
+
+@app.get("/api/search/stats")
+def search_stats():
+    """Batching and cache counters of this worker."""
+    return _require_batcher().stats()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
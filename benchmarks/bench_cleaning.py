@@ -0,0 +1,55 @@
+# benchmarks/bench_cleaning.py
+"""
+Rows/sec and agreement of the vectorised ``clean_texts`` against the per-row
+``clean_text`` it replaces in run_pipeline.
+
+Agreement is reported twice: identical cleaned strings, and the same keep/drop
+decision (the language filter is where the two are expected to differ).
+
+Run:
+    python -m benchmarks.bench_cleaning --parquet data/parquet_raw --rows 20000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import dask.dataframe as dd
+
+from nlp_core.cleaning import clean_text, clean_texts
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--parquet", default="data/parquet_raw", help="Raw comments dataset")
+    p.add_argument("--rows", type=int, default=20_000, help="Rows to sample")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    bodies = dd.read_parquet(args.parquet, columns=["body"])["body"].head(
+        args.rows, npartitions=-1
+    )
+    bodies = bodies.reset_index(drop=True)
+    print(f"▪ {len(bodies):,} rows from {args.parquet}")
+
+    start = time.perf_counter()
+    old = bodies.map(clean_text)
+    t_old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = clean_texts(bodies).astype(object)
+    t_new = time.perf_counter() - start
+
+    same_text = (old == new).mean()
+    same_keep = ((old != "") == (new != "")).mean()
+    print(f"  clean_text  : {len(bodies) / t_old:>10,.0f} rows/s  ({t_old:.2f}s)")
+    print(f"  clean_texts : {len(bodies) / t_new:>10,.0f} rows/s  ({t_new:.2f}s)")
+    print(f"  speed-up    : {t_old / t_new:.1f}x")
+    print(f"  agreement   : {same_text:.2%} identical text, {same_keep:.2%} same keep/drop")
+    print(f"  kept        : {(old != '').sum():,} (old) vs {(new != '').sum():,} (new)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_enriched_layout.py
+"""
+Memory, serialized and Parquet size of the NLP enrichment columns in the typed
+layout run_pipeline writes (fixed-width emotion and POS columns, dictionary-
+encoded entity lists, float32) against the per-row dict/list object columns it
+replaces.
+
+Stage outputs are synthetic but shaped like the real ones: a few entity labels
+per comment, a dozen POS tags with counts, and the single top emotion the
+GoEmotions pipeline returns.
+
+Run:
+    python -m benchmarks.bench_enriched_layout --rows 200000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from nlp_core.emotion import EMOTION_LABELS
+from nlp_core.rollup import dominant_emotion
+from run_pipeline import _enriched_frame
+
+_ENTITY_LABELS = ["PERSON", "ORG", "GPE", "NORP", "DATE", "CARDINAL", "LOC", "EVENT", "LAW", "PERCENT"]
+# spaCy universal POS ids (ADJ=84 … SPACE=103, without CONJ/EOL)
+_POS_IDS = [84, 85, 86, 87, 89, 90, 91, 92, 93, 94, 95, 96, 97, 98, 99, 100, 101, 103]
+_STANCES = ["pro/left", "pro/right", "neutral/other"]
+
+# The layout before typed columns: nested values as Python objects
+_OBJECT_TYPES = {
+    "entities": pa.list_(pa.string()),
+    "pos_counts": pa.map_(pa.int64(), pa.int64()),
+    "emotions": pa.map_(pa.string(), pa.float64()),
+}
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=200_000, help="Comments per partition")
+    p.add_argument("--seed", type=int, default=0)
+    return p.parse_args()
+
+
+def stage_outputs(rows: int, seed: int):
+    """Per-row stage outputs as _nlp_partition receives them."""
+    rng = np.random.default_rng(seed)
+    n_ents = rng.poisson(1.2, size=rows)
+    n_words = np.clip(rng.lognormal(np.log(18), 1.0, size=rows), 1, 2000).astype(int)
+    feats = []
+    for k, words in zip(n_ents, n_words):
+        tags = rng.choice(_POS_IDS, size=min(words, 12), replace=False)
+        counts = rng.multinomial(words, np.full(len(tags), 1 / len(tags)))
+        feats.append({
+            "entities": [_ENTITY_LABELS[i] for i in rng.integers(len(_ENTITY_LABELS), size=k)],
+            "pos_counts": {int(t): int(c) for t, c in zip(tags, counts) if c},
+        })
+    labels = rng.integers(len(EMOTION_LABELS), size=rows)
+    emotions = [{EMOTION_LABELS[i]: float(s)} for i, s in zip(labels, rng.random(rows))]
+    return {
+        "feats": feats,
+        "sentiments": rng.uniform(-1, 1, size=rows).tolist(),
+        "emotions": emotions,
+        "stances": [_STANCES[i] for i in rng.integers(3, size=rows)],
+        "sarcasm_scores": rng.random(rows).tolist(),
+        "topics": rng.integers(-1, 50, size=rows).tolist(),
+        "confidence": rng.random(rows).tolist(),
+    }
+
+
+def object_layout(df_part, out):
+    """The enrichment columns as object/float64/int64 columns (the old layout)."""
+    df_part = df_part.copy()
+    df_part["entities"] = [f["entities"] for f in out["feats"]]
+    df_part["pos_counts"] = [f["pos_counts"] for f in out["feats"]]
+    df_part["sentiment"] = np.asarray(out["sentiments"], dtype=np.float64)
+    df_part["emotions"] = out["emotions"]
+    df_part["dominant_emotion"] = pd.array([dominant_emotion(e) for e in out["emotions"]], dtype="string[pyarrow]")
+    df_part["stance"] = pd.array(out["stances"], dtype="string[pyarrow]")
+    df_part["sarcasm_score"] = np.asarray(out["sarcasm_scores"], dtype=np.float64)
+    df_part["topic"] = np.asarray(out["topics"], dtype=np.int64)
+    df_part["topic_confidence"] = np.asarray(out["confidence"], dtype=np.float64)
+    return df_part
+
+
+def measure(name, build, path):
+    start = time.perf_counter()
+    frame = build()
+    t_build = time.perf_counter() - start
+    memory = frame.memory_usage(deep=True, index=False).sum()
+    start = time.perf_counter()
+    pickled = len(pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL))
+    t_pickle = time.perf_counter() - start
+    # Nested object columns cannot be inferred (dict keys must be strings)
+    nested = [col for col in frame.columns if col in _OBJECT_TYPES]
+    inferred = pa.Schema.from_pandas(frame.drop(columns=nested), preserve_index=False)
+    schema = pa.schema([
+        pa.field(col, _OBJECT_TYPES[col]) if col in _OBJECT_TYPES else inferred.field(col) for col in frame.columns
+    ])
+    start = time.perf_counter()
+    pq.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False), path)
+    t_write = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(
+        f"  {name:<7} {frame.shape[1]:>3} cols  memory {memory / 2**20:8.1f} MiB  "
+        f"pickled {pickled / 2**20:8.1f} MiB ({t_pickle:5.2f} s)  parquet {size / 2**20:7.1f} MiB "
+        f"({t_write:5.2f} s)  build {t_build:5.2f} s"
+    )
+    return memory, pickled, size
+
+
+def main():
+    args = parse_args()
+    out = stage_outputs(args.rows, args.seed)
+    df_part = pd.DataFrame({"id": pd.array([f"c{i}" for i in range(args.rows)], dtype="string[pyarrow]")})
+    print(f"▪ {args.rows:,} rows of synthetic stage outputs")
+    # Workers import spaCy once, before the NLP stage; keep that out of the timings
+    _enriched_frame(df_part.iloc[:0], **{key: values[:0] for key, values in out.items()})
+    with tempfile.TemporaryDirectory(prefix="bench_enriched_layout_") as tmp:
+        old = measure("object", lambda: object_layout(df_part, out), os.path.join(tmp, "object.parquet"))
+        new = measure("typed", lambda: _enriched_frame(df_part, **out), os.path.join(tmp, "typed.parquet"))
+    for label, before, after in zip(("memory", "pickled", "parquet"), old, new):
+        mark = "✓" if after < before else "✗"
+        print(f"  {mark} {label:<8} {after / before:6.1%} of the object layout")
+
+
+if __name__ == "__main__":
+    main()
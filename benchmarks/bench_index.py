@@ -0,0 +1,107 @@
+# benchmarks/bench_index.py
+"""
+Recall@k and query latency of the EmbeddingStore index types against exact
+(brute-force inner product) search.
+
+Vectors come from an embedding cache written by the pipeline, or are generated
+synthetically (clustered Gaussians) when no cache is given. The last
+``--queries`` vectors are held out as queries.
+
+Run:
+    python -m benchmarks.bench_index --cache-root data/embeddings \
+        --model all-MiniLM-L6-v2 --k 10
+    python -m benchmarks.bench_index --synthetic 200000 --dim 384
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from nlp_core.embedding_cache import EmbeddingCache
+from nlp_core.embeddings import EmbeddingStore
+
+# Query-time settings swept per index type
+SWEEPS = {
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+    "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "ivf_pq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+}
+
+
+def _synthetic(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 1000), dim))
+    x = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.normal(size=(n, dim))
+    return x.astype("float32")
+
+
+def _load(args) -> np.ndarray:
+    if args.cache_root:
+        cache = EmbeddingCache(args.cache_root, args.model)
+        return np.vstack([v for _, v in cache.iter_batches()])
+    return _synthetic(args.synthetic, args.dim)
+
+
+def _index_bytes(store: EmbeddingStore) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.faiss")
+        faiss.write_index(store.index, path)
+        return os.path.getsize(path)
+
+
+def _batches(x: np.ndarray, size: int = 65536):
+    for start in range(0, len(x), size):
+        yield [str(i) for i in range(start, min(start + size, len(x)))], x[start:start + size]
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--cache-root", default=None, help="Embedding cache root (default: synthetic data)")
+    p.add_argument("--model", default="all-MiniLM-L6-v2", help="Model subdirectory of the cache")
+    p.add_argument("--synthetic", type=int, default=100_000, help="Synthetic vectors to generate")
+    p.add_argument("--dim", type=int, default=384, help="Synthetic vector dimension")
+    p.add_argument("--queries", type=int, default=1_000, help="Held-out query vectors")
+    p.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    p.add_argument("--types", nargs="+", default=list(SWEEPS), help="Index types to test")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    x = _load(args)
+    faiss.normalize_L2(x)
+    base, queries = x[:-args.queries], x[-args.queries:]
+    print(f"▪ {len(base):,} vectors × {base.shape[1]} dims, {len(queries):,} queries, k={args.k}")
+
+    exact = faiss.IndexFlatIP(base.shape[1])
+    exact.add(base)
+    start = time.perf_counter()
+    _, truth = exact.search(queries, args.k)
+    flat_ms = 1000 * (time.perf_counter() - start) / len(queries)
+    print(f"  {'flat (exact)':<28} recall 1.000  {flat_ms:7.3f} ms/query  {base.nbytes / 2**20:8.1f} MiB")
+
+    for index_type in args.types:
+        store = EmbeddingStore(args.model)
+        start = time.perf_counter()
+        store.build_from_batches(_batches(base), index_type, n_vectors=len(base))
+        build_s = time.perf_counter() - start
+        size_mib = _index_bytes(store) / 2**20
+        print(f"  {store.config['description']} (built in {build_s:.1f}s, {size_mib:.1f} MiB)")
+        for params in SWEEPS[index_type]:
+            start = time.perf_counter()
+            _, found = store.search_vectors(queries, args.k, **params)
+            ms = 1000 * (time.perf_counter() - start) / len(queries)
+            recall = np.mean([
+                len(set(f[f >= 0]) & set(t)) / args.k for f, t in zip(found, truth)
+            ])
+            label = ", ".join(f"{k}={v}" for k, v in params.items())
+            print(f"    {label:<26} recall {recall:.3f}  {ms:7.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
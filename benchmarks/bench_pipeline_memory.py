@@ -0,0 +1,147 @@
+# benchmarks/bench_pipeline_memory.py
+"""
+Peak cluster memory of run_pipeline's clean ➜ enrich stages, with the cleaned
+dataframe persisted in memory (the old graph) and streamed through
+``parquet_clean`` (the current one).
+
+Each variant runs on a fresh local cluster. The summed RSS of its workers and
+the bytes Dask holds in worker memory (persisted or in-flight results) are
+sampled throughout; the NLP stage is replaced by a stand-in that adds the same
+columns and sleeps per row, so the persisted frame has to outlive a slow stage
+just as it does with the real models.
+
+Run:
+    python -m benchmarks.bench_pipeline_memory --parquet data/parquet_raw --workers 2
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import dask.dataframe as dd
+import numpy as np
+import psutil
+from dask.distributed import Client
+
+from nlp_core.cleaning import clean_texts
+from nlp_core.io import DEFAULT_COLUMNS
+from run_pipeline import _PortableArrowEngine, _enriched_frame, _enriched_meta, _parquet_schema
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--parquet", default="data/parquet_raw", help="Raw comments dataset")
+    p.add_argument(
+        "--cols", nargs="+", default=list(DEFAULT_COLUMNS) + ["_date"],
+        help="Columns read from the raw dataset (default: what the ingest writes)",
+    )
+    p.add_argument("--workers", type=int, default=2, help="Dask worker processes")
+    p.add_argument("--delay-ms", type=float, default=0.05, help="Stand-in NLP cost per row")
+    p.add_argument("--interval", type=float, default=0.1, help="Memory sampling interval (s)")
+    return p.parse_args()
+
+
+def _stand_in_nlp(df_part, delay_ms):
+    """Adds the enrichment columns with placeholder values at a fixed cost per row."""
+    time.sleep(len(df_part) * delay_ms / 1000)
+    n = len(df_part)
+    return _enriched_frame(
+        df_part,
+        feats=[{"entities": [], "pos_counts": {}}] * n,
+        sentiments=np.zeros(n),
+        emotions=[{"neutral": 1.0}] * n,
+        stances=["neutral/other"] * n,
+        sarcasm_scores=np.zeros(n),
+        topics=[-1] * n,
+        confidence=np.zeros(n),
+    )
+
+
+def _rss():
+    return psutil.Process().memory_info().rss
+
+
+def _managed(dask_worker):
+    return dask_worker.state.nbytes
+
+
+class _PeakSampler(threading.Thread):
+    """Polls the summed worker RSS and Dask-managed bytes until stopped."""
+
+    def __init__(self, client, interval):
+        super().__init__(daemon=True)
+        self.client, self.interval = client, interval
+        self.peak = self.baseline = sum(client.run(_rss).values())
+        self.peak_managed = 0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            try:
+                self.peak = max(self.peak, sum(self.client.run(_rss).values()))
+                self.peak_managed = max(self.peak_managed, sum(self.client.run(_managed).values()))
+            except Exception:
+                return
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def _clean(raw, cols):
+    df = dd.read_parquet(raw, columns=cols)
+    df = df.dropna(subset=["body"])
+    df["clean_body"] = df["body"].map_partitions(clean_texts, meta=("clean_body", "string[pyarrow]"))
+    return df[df["clean_body"] != ""]
+
+
+def run_variant(name, raw, cols, out, workers, delay_ms, interval):
+    clean_path, feat_path = out / f"{name}_clean", out / f"{name}_features"
+    with Client(n_workers=workers, threads_per_worker=1, processes=True) as client:
+        sampler = _PeakSampler(client, interval)
+        sampler.start()
+        start = time.perf_counter()
+        df = _clean(raw, cols)
+        clean_schema = _parquet_schema(raw, df._meta)
+        if name == "persisted":
+            df = df.persist()
+            df.to_parquet(clean_path, overwrite=True, write_index=False, schema=clean_schema)
+            source = df
+        else:
+            df.to_parquet(clean_path, overwrite=True, write_index=False, schema=clean_schema)
+            source = dd.read_parquet(clean_path)
+        enriched = source.map_partitions(_stand_in_nlp, delay_ms, meta=_enriched_meta(source._meta))
+        enriched.to_parquet(
+            feat_path, overwrite=True, write_index=False, schema=_parquet_schema(clean_path, enriched._meta),
+            engine=_PortableArrowEngine,
+        )
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+    rows = len(dd.read_parquet(feat_path, columns=["id"]))
+    return sampler, elapsed, rows
+
+
+def main():
+    args = parse_args()
+    out = Path(tempfile.mkdtemp(prefix="bench_pipeline_memory_"))
+    try:
+        print(f"▪ {args.parquet}, {args.workers} workers, stand-in NLP {args.delay_ms} ms/row")
+        for name in ("persisted", "streamed"):
+            sampler, elapsed, rows = run_variant(
+                name, args.parquet, args.cols, out, args.workers, args.delay_ms, args.interval
+            )
+            print(
+                f"  {name:<10} peak worker RSS {sampler.peak / 2**20:7.0f} MiB "
+                f"(+{(sampler.peak - sampler.baseline) / 2**20:.0f} MiB over idle), "
+                f"peak held by Dask {sampler.peak_managed / 2**20:6.0f} MiB  {elapsed:6.1f} s  {rows:,} rows"
+            )
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
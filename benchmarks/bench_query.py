@@ -0,0 +1,90 @@
+# benchmarks/bench_query.py
+"""
+Latency of filtered reads of the ``features`` dataset through nlp_core.query
+(partition pruning, column projection, row-group statistics, cached footers)
+against a ``dd.read_parquet`` scan filtered in pandas.
+
+Each query runs ``--repeat`` times; the first nlp_core.query run includes
+dataset discovery, the rest reuse the cached footers.
+
+Run:
+    python -m benchmarks.bench_query --features data/features --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import calendar
+import datetime
+import statistics
+import time
+
+import dask.dataframe as dd
+
+from nlp_core.query import DEFAULT_COLUMNS, open_features
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--features", default="data/features", help="Enriched features dataset")
+    p.add_argument("--repeat", type=int, default=5, help="Runs per query")
+    p.add_argument("--sarcasm", type=float, default=0.8, help="sarcasm_score threshold of the filtered queries")
+    return p.parse_args()
+
+
+def _queries(dataset, sarcasm):
+    """(label, query kwargs) pairs on the first subreddit and the middle day of the dataset."""
+    sub = dataset.subreddits[0]
+    day = dataset.dates[len(dataset.dates) // 2]
+    start_ts = calendar.timegm(datetime.date.fromisoformat(day).timetuple())
+    return [
+        ("one subreddit", dict(subreddits=[sub])),
+        ("one day", dict(start_ts=start_ts, end_ts=start_ts + 86399)),
+        (f"sarcasm > {sarcasm}", dict(filters=[("sarcasm_score", ">", sarcasm)])),
+        ("subreddit × day × sarcasm", dict(
+            subreddits=[sub], start_ts=start_ts, end_ts=start_ts + 86399, filters=[("sarcasm_score", ">", sarcasm)],
+        )),
+    ]
+
+
+def _scan(path, subreddits=None, start_ts=None, end_ts=None, filters=None):
+    df = dd.read_parquet(path, columns=list(DEFAULT_COLUMNS)).compute()
+    if subreddits is not None:
+        df = df[df["subreddit"].isin(subreddits)]
+    if start_ts is not None:
+        df = df[(df["created_utc"] >= start_ts) & (df["created_utc"] <= end_ts)]
+    for column, _, value in filters or ():
+        df = df[df[column] > value]
+    return len(df)
+
+
+def _time(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn()
+        runs.append(time.perf_counter() - start)
+    return rows, runs
+
+
+def main():
+    args = parse_args()
+    start = time.perf_counter()
+    dataset = open_features(args.features)
+    t_open = time.perf_counter() - start
+    print(
+        f"▪ {args.features}: {dataset.num_rows:,} rows, {len(dataset.fragments)} files, "
+        f"{len(dataset.subreddits)} subreddits × {len(dataset.dates)} days (opened in {t_open * 1000:.0f} ms)"
+    )
+    for label, kwargs in _queries(dataset, args.sarcasm):
+        rows, runs = _time(lambda: dataset.query(**kwargs).num_rows, args.repeat)
+        scanned, scan_runs = _time(lambda: _scan(args.features, **kwargs), args.repeat)
+        mark = "✓" if rows == scanned else "✗"
+        print(
+            f"  {mark} {label:<26} {rows:>9,} rows  query {statistics.median(runs) * 1000:8.1f} ms  "
+            f"scan {statistics.median(scan_runs) * 1000:8.1f} ms  "
+            f"({statistics.median(scan_runs) / statistics.median(runs):5.1f}×)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# benchmarks/bench_suite.py
+"""
+End-to-end throughput benchmark on a synthetic dump, with regression checks.
+
+A synthetic RC_*.zst (see benchmarks/synthetic_dump.py) is pushed through the
+pipeline stages in one process: ingest, cleaning, each NLP stage, embedding,
+index build and API search. The models are replaced by lightweight local
+stand-ins (a blank spaCy pipeline, hash-based classifiers and a hashing
+encoder), so the numbers measure the pipeline code — batching, caching,
+Arrow/Parquet I/O, FAISS — and run anywhere without downloads or a GPU. The
+topic stage needs BERTopic and is not part of the suite.
+
+Per stage, rows/sec, CPU time and the peak process RSS are recorded; RSS is
+sampled throughout the run. Each run is appended to ``--history`` (JSONL). A
+stage regresses when its rows/sec falls more than ``--threshold`` below, or its
+peak RSS rises more than ``--memory-threshold`` above, the median of the last
+``--baseline-runs`` passing runs with the same configuration; the script then
+exits non-zero.
+
+Run:
+    python -m benchmarks.bench_suite --rows 20000
+    python -m benchmarks.bench_suite --rows 50000 --threshold 0.2 --history data/bench/history.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+import dask.dataframe as dd
+import numpy as np
+import psutil
+
+from benchmarks.synthetic_dump import write_dump
+from run_pipeline import _parquet_schema, _spacy_batch, _stance_batch, _update_index
+from nlp_core.batching import DEFAULT_BATCH_SIZE, DEFAULT_TOKEN_BUDGET
+from nlp_core.cleaning import clean_texts
+from nlp_core.embedding_cache import EmbeddingCache
+from nlp_core.emotion import detect_emotions_batch
+from nlp_core.io import MANIFEST_FILE, zst_to_parquet
+from nlp_core.models import register_model
+from nlp_core.sarcasm import detect_sarcasm_batch
+from nlp_core.sentiment import fused_sentiment_batch
+
+STAGES = (
+    "ingest", "clean", "spacy", "sentiment", "emotion", "stance", "sarcasm", "embed", "index", "search",
+)
+STAND_IN_ENCODER = "bench-hashing-encoder"
+_EMOTIONS = ("anger", "approval", "disapproval", "joy", "neutral", "sadness", "surprise")
+_QUERIES = (
+    "election fraud claims", "mail-in ballots", "inflation and prices", "border security",
+    "abortion rights", "polling in swing states", "war in ukraine", "supreme court",
+)
+
+
+# ─── stand-in models ─────────────────────────────────────────────────
+def _unit(text: str, salt: str = "") -> float:
+    """Deterministic pseudo-score in [0, 1) derived from the text."""
+    digest = hashlib.blake2b((salt + text).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") / 2**64
+
+
+class _StandInClassifier:
+    """Callable with the output shape of a transformers text-classification pipeline."""
+
+    def __init__(self, labels, top_k=1):
+        self.labels, self.top_k = labels, top_k
+
+    def __call__(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        outputs = []
+        for text in [texts] if single else texts:
+            scores = [_unit(text, label) for label in self.labels]
+            ranked = sorted(zip(self.labels, scores), key=lambda pair: -pair[1])[: self.top_k]
+            hits = [{"label": label, "score": score} for label, score in ranked]
+            outputs.append(hits if self.top_k > 1 else hits[0])
+        return outputs
+
+
+class _HashingEncoder:
+    """Bag-of-words hashing encoder with the ``encode`` signature of sentence-transformers."""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            buckets = [zlib.crc32(token.encode("utf-8")) % self.dim for token in text.lower().split()]
+            out[row] = np.bincount(buckets, minlength=self.dim) if buckets else 0
+        out[:, 0] += 1e-3   # keeps empty texts off the zero vector
+        if normalize_embeddings:
+            out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+
+def register_stand_ins(dim: int = 64) -> None:
+    """Replace the heavy models of the registry with the local stand-ins."""
+    import spacy
+
+    register_model("spacy.en", lambda: spacy.blank("en"), replace=True)
+    register_model(
+        "sentiment.roberta", lambda: _StandInClassifier(("negative", "neutral", "positive")), replace=True
+    )
+    register_model("emotion.goemotions", lambda: _StandInClassifier(_EMOTIONS, top_k=3), replace=True)
+    register_model("sarcasm.t5", lambda: _StandInClassifier(("SARCASM", "NOT_SARCASM")), replace=True)
+    register_model(f"embeddings.{STAND_IN_ENCODER}", lambda: _HashingEncoder(dim), replace=True)
+
+
+# ─── measurement ─────────────────────────────────────────────────────
+class _MemorySampler(threading.Thread):
+    """Samples this process's RSS every ``interval`` seconds."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start_time = time.perf_counter()
+        self.samples = []   # (seconds since start, RSS MiB)
+        self._done = threading.Event()
+
+    def sample(self):
+        rss = self.process.memory_info().rss / 2**20
+        self.samples.append((time.perf_counter() - self.start_time, rss))
+        return rss
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def peak(self, since):
+        now = self.sample()
+        return max([rss for t, rss in self.samples if t >= since] + [now])
+
+
+@contextmanager
+def _timed(results, sampler, name):
+    """Time one stage; the block sets ``rec["rows"]``."""
+    rec = {"rows": 0}
+    since = time.perf_counter() - sampler.start_time
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    yield rec
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    rec.update(
+        wall_s=round(wall, 4),
+        cpu_s=round(cpu, 4),
+        rows_per_s=round(rec["rows"] / wall, 1) if wall > 0 else None,
+        peak_rss_mb=round(sampler.peak(since), 1),
+    )
+    results[name] = rec
+    print(
+        f"  {name:<10} {rec['rows']:>9,} rows {wall:8.2f}s {rec['rows_per_s'] or 0:>12,.0f} rows/s  "
+        f"peak RSS {rec['peak_rss_mb']:7.0f} MiB"
+    )
+
+
+# ─── stages ──────────────────────────────────────────────────────────
+def run_stages(args, work: Path, sampler) -> dict:
+    """Run every stage in ``args.stages`` order on the dump and return per-stage results."""
+    raw_dir, clean_dir = work / "parquet_raw", work / "parquet_clean"
+    embed_root, index_dir = work / "embeddings", work / "embeddings" / "index"
+    wanted = set(args.stages)
+    results = {}
+    texts = ids = None
+
+    with _timed(results, sampler, "ingest") as rec:
+        zst_to_parquet(str(args.dump), str(raw_dir), chunk_size=args.chunk, resume=False)
+        with open(raw_dir / MANIFEST_FILE, "r", encoding="utf-8") as fh:
+            rec["rows"] = json.load(fh)["lines"]
+    if "ingest" not in wanted:
+        results.pop("ingest")
+
+    # Every later stage needs the cleaned comments
+    with _timed(results, sampler, "clean") as rec:
+        raw = dd.read_parquet(str(raw_dir), columns=["id", "subreddit", "created_utc", "body", "_date"])
+        df = raw.compute(scheduler="sync").reset_index(drop=True)
+        df["clean_body"] = clean_texts(df["body"])
+        rec["rows"] = len(df)
+        df = df[df["clean_body"] != ""].reset_index(drop=True).drop(columns=["body"])
+        clean_dir.mkdir(parents=True, exist_ok=True)
+        # The schema run_pipeline derives from the ingest output (manifest included)
+        df.to_parquet(clean_dir / "part.0.parquet", index=False, schema=_parquet_schema(raw_dir, df.iloc[:0]))
+    if "clean" not in wanted:
+        results.pop("clean")
+    texts, ids = df["clean_body"].tolist(), df["id"].tolist()
+
+    batched = {
+        "spacy": lambda: _spacy_batch(texts, args.spacy_batch, 1),
+        "sentiment": lambda: fused_sentiment_batch(texts, args.batch_size, args.token_budget),
+        "emotion": lambda: detect_emotions_batch(texts, args.batch_size, args.token_budget),
+        "stance": lambda: _stance_batch(texts),
+        "sarcasm": lambda: detect_sarcasm_batch(texts, args.batch_size, args.token_budget),
+    }
+    for name, run in batched.items():
+        if name in wanted:
+            with _timed(results, sampler, name) as rec:
+                rec["rows"] = len(run())
+
+    if wanted & {"embed", "index", "search"}:
+        with _timed(results, sampler, "embed") as rec:
+            rec["rows"] = EmbeddingCache(str(embed_root), STAND_IN_ENCODER).update(ids, texts)
+        if "embed" not in wanted:
+            results.pop("embed")
+    if wanted & {"index", "search"}:
+        with _timed(results, sampler, "index") as rec:
+            rec["rows"] = _update_index(
+                str(clean_dir), str(embed_root), STAND_IN_ENCODER, str(index_dir), args.index_type
+            )["added"]
+        if "index" not in wanted:
+            results.pop("index")
+    if "search" in wanted:
+        with _timed(results, sampler, "search") as rec:
+            rec["rows"] = _search(index_dir, args.queries)
+    return results
+
+
+def _search(index_dir: Path, n_queries: int) -> int:
+    """Serve ``n_queries`` distinct searches (every fourth one filtered) through the API."""
+    from fastapi.testclient import TestClient
+
+    os.environ["EMBEDDINGS_DIR"] = str(index_dir)
+    api = importlib.reload(sys.modules["api.main"]) if "api.main" in sys.modules else importlib.import_module("api.main")
+    served = 0
+    with TestClient(api.app) as client:
+        for i in range(n_queries):
+            payload = {"query": f"{_QUERIES[i % len(_QUERIES)]} {i}", "top_k": 10}
+            if i % 4 == 3:
+                payload.update(subreddits=["politics", "news"], start="2024-11-03", end="2024-11-10")
+            response = client.post("/api/search", json=payload)
+            response.raise_for_status()
+            served += 1
+    return served
+
+
+# ─── history and regression check ────────────────────────────────────
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _load_history(path: Path):
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def _baseline(history, config, runs):
+    """Median rows/sec and peak RSS per stage over the last passing runs with ``config``."""
+    previous = [h for h in history if h.get("config") == config and not h.get("regressed")][-runs:]
+    baseline = {}
+    for name in STAGES:
+        rates = [h["stages"][name]["rows_per_s"] for h in previous if h["stages"].get(name, {}).get("rows_per_s")]
+        peaks = [h["stages"][name]["peak_rss_mb"] for h in previous if name in h["stages"]]
+        if rates:
+            baseline[name] = {
+                "rows_per_s": statistics.median(rates),
+                "peak_rss_mb": statistics.median(peaks),
+                "runs": len(rates),
+            }
+    return baseline
+
+
+def compare(results, baseline, threshold, memory_threshold, min_wall):
+    """
+    Print each stage against its baseline; returns the names of regressed stages.
+
+    Rates of stages shorter than ``min_wall`` seconds are shown but not checked:
+    timer noise dominates them.
+    """
+    regressed = []
+    if not baseline:
+        print("  (no baseline yet for this configuration)")
+        return regressed
+    print(f"  {'stage':<10} {'rows/s':>12} {'baseline':>12} {'Δ':>8}   {'peak MiB':>9} {'baseline':>9}")
+    for name, rec in results.items():
+        base = baseline.get(name)
+        if base is None or not rec["rows_per_s"]:
+            continue
+        change = rec["rows_per_s"] / base["rows_per_s"] - 1
+        slow = change < -threshold and rec["wall_s"] >= min_wall
+        heavy = rec["peak_rss_mb"] > base["peak_rss_mb"] * (1 + memory_threshold)
+        flag = "  ✗ slower" if slow else ""
+        flag += "  ✗ more memory" if heavy else ""
+        print(
+            f"  {name:<10} {rec['rows_per_s']:>12,.0f} {base['rows_per_s']:>12,.0f} {change:>+8.1%}   "
+            f"{rec['peak_rss_mb']:>9,.0f} {base['peak_rss_mb']:>9,.0f}{flag}"
+        )
+        if slow or heavy:
+            regressed.append(name)
+    return regressed
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=20_000, help="Comments in the synthetic dump")
+    p.add_argument("--seed", type=int, default=0, help="Seed of the synthetic dump")
+    p.add_argument("--dump", default=None, help="Use this .zst instead of generating one")
+    p.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES, help="Stages to report")
+    p.add_argument("--chunk", type=int, default=10_000, help="Rows per ingest chunk")
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Texts per forward pass")
+    p.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="Padded tokens per pass")
+    p.add_argument("--spacy-batch", type=int, default=64, help="Texts per spaCy batch")
+    p.add_argument("--index-type", default="hnsw", help="FAISS index type of the index stage")
+    p.add_argument("--queries", type=int, default=500, help="Searches sent to the API")
+    p.add_argument("--interval", type=float, default=0.05, help="RSS sampling interval (s)")
+    p.add_argument("--history", default="data/bench/history.jsonl", help="Run history (JSONL)")
+    p.add_argument("--baseline-runs", type=int, default=5, help="Previous runs the baseline is the median of")
+    p.add_argument("--threshold", type=float, default=0.25, help="Tolerated rows/sec drop (fraction)")
+    p.add_argument("--memory-threshold", type=float, default=0.25, help="Tolerated peak RSS rise (fraction)")
+    p.add_argument("--min-wall", type=float, default=0.5, help="Stages faster than this (s) are not rate-checked")
+    p.add_argument("--no-record", action="store_true", help="Do not append this run to the history")
+    p.add_argument("--keep", action="store_true", help="Keep the working directory")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    register_stand_ins()
+    work = Path(tempfile.mkdtemp(prefix="bench_suite_"))
+    config = {
+        "rows": args.rows, "seed": args.seed, "dump": args.dump, "chunk": args.chunk,
+        "batch_size": args.batch_size, "token_budget": args.token_budget,
+        "spacy_batch": args.spacy_batch, "index_type": args.index_type, "queries": args.queries,
+    }
+    sampler = _MemorySampler(args.interval)
+    sampler.start()
+    try:
+        if args.dump is None:
+            args.dump = work / "RC_synthetic.zst"
+            stats = write_dump(str(args.dump), args.rows, seed=args.seed)
+            print(f"▪ Synthetic dump: {stats['rows']:,} comments, {stats['bytes'] / 2**20:,.1f} MiB")
+        else:
+            print(f"▪ Dump: {args.dump}")
+        results = run_stages(args, work, sampler)
+    finally:
+        sampler.stop()
+        if args.keep:
+            print(f"  working directory kept at {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    history_path = Path(args.history)
+    baseline = _baseline(_load_history(history_path), config, args.baseline_runs)
+    regressed = compare(results, baseline, args.threshold, args.memory_threshold, args.min_wall)
+    if not args.no_record:
+        step = max(1, len(sampler.samples) // 500)
+        entry = {
+            "run_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "config": config,
+            "stages": results,
+            "regressed": regressed,
+            "memory": [[round(t, 2), round(rss, 1)] for t, rss in sampler.samples[::step]],
+        }
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(history_path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry) + "\n")
+        print(f"  run appended to {history_path}")
+    if regressed:
+        raise SystemExit(f"✗ Regression in {', '.join(regressed)}.")
+    print("✓ No stage regressed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/load_test_api.py
+"""
+Concurrent load test for the search API (stdlib only).
+
+Starts ``--concurrency`` client threads that send ``--requests`` searches in
+total and reports throughput and latency percentiles. Run it once against a
+server with batching on and once with ``SEARCH_BATCH_MAX=1`` to compare.
+
+Run:
+    EMBEDDINGS_DIR=data/embeddings/index uvicorn api.main:app --port 8000
+    python -m benchmarks.load_test_api --url http://127.0.0.1:8000 \
+        --concurrency 32 --requests 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_QUERIES = [
+    "election fraud claims",
+    "mail-in ballots",
+    "inflation and grocery prices",
+    "border security",
+    "abortion rights referendum",
+    "polling numbers in swing states",
+    "foreign policy and ukraine",
+    "supreme court decisions",
+]
+
+
+def _post(url: str, payload: dict, timeout: float) -> float:
+    data = json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default="http://127.0.0.1:8000", help="API base URL")
+    p.add_argument("--concurrency", type=int, default=32, help="Client threads")
+    p.add_argument("--requests", type=int, default=2_000, help="Total searches")
+    p.add_argument("--top-k", type=int, default=10, help="Hits per search")
+    p.add_argument("--queries", default=None, help="File with one query per line")
+    p.add_argument(
+        "--unique", action="store_true",
+        help="Make every query distinct so server-side caches never hit",
+    )
+    p.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout (s)")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as fh:
+            queries = [line.strip() for line in fh if line.strip()]
+    url = args.url.rstrip("/") + "/api/search"
+
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int):
+        nonlocal errors
+        query = queries[i % len(queries)] + (f" #{i}" if args.unique else "")
+        try:
+            elapsed = _post(url, {"query": query, "top_k": args.top_k}, args.timeout)
+        except (urllib.error.URLError, OSError):
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    print(f"▪ {args.requests:,} searches, {args.concurrency} clients, {wall:.1f}s")
+    if latencies:
+        ms = [1000 * t for t in latencies]
+        print(f"  throughput : {len(latencies) / wall:,.1f} req/s")
+        print(
+            f"  latency ms : p50 {_percentile(ms, 0.50):.1f}  p95 {_percentile(ms, 0.95):.1f}  "
+            f"p99 {_percentile(ms, 0.99):.1f}  mean {statistics.mean(ms):.1f}"
+        )
+    print(f"  errors     : {errors}")
+    try:
+        with urllib.request.urlopen(args.url.rstrip("/") + "/api/search/stats", timeout=args.timeout) as r:
+            print(f"  server     : {r.read().decode('utf-8')}")
+    except (urllib.error.URLError, OSError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
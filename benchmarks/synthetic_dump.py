@@ -0,0 +1,272 @@
+# benchmarks/synthetic_dump.py
+"""
+Synthetic Reddit comment dumps (RC_*.zst) for benchmarks and CI.
+
+Lines have the field set and JSON shapes of the Pushshift comment dumps
+(COMMENT_SCHEMA plus the usual unused extras), comments are spread over
+``--days`` in time order, subreddits follow a Zipf-like skew and body lengths
+a log-normal word count with a long tail. The dump quirks the pipeline has to
+handle are included at configurable rates: ``[deleted]``/``[removed]`` bodies
+and authors, ``"edited": false`` or an edit timestamp, repeated bodies (short
+replies, bot templates, copypasta), URLs, emoji and non-English comments.
+
+The output is a pure function of the arguments, so the same ``--seed`` and
+``--rows`` always produce the same dump.
+
+Run:
+    python -m benchmarks.synthetic_dump --out data/synthetic/RC_2024-11.zst --rows 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import calendar
+import datetime
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import zstandard as zstd
+
+SUBREDDITS = [
+    "politics", "worldnews", "news", "PoliticalDiscussion", "conservative",
+    "moderatepolitics", "AskALiberal", "PoliticalHumor", "PoliticalCompassMemes",
+    "neutralpolitics", "libertarian", "Progressive", "uspolitics", "ukpolitics",
+    "canada", "europe", "ukraine", "conspiracy", "AskTrumpSupporters", "Ask_Politics",
+]
+
+_WORDS = (
+    "the people vote voters election ballot ballots campaign candidate president senate house "
+    "congress court policy policies economy inflation prices jobs tax taxes border immigration "
+    "healthcare abortion rights climate energy war ukraine russia china media news poll polls "
+    "polling swing state states county district turnout fraud count counting mail early debate "
+    "party democrats republicans left right liberal conservative moderate independent support "
+    "think really just like know would could should never always actually literally probably "
+    "because but and or if when while so not no yes very more most less good bad worse better "
+    "wrong true false fact facts source evidence claim claims argument point reason problem "
+    "government federal local law laws bill bills pass passed vote voted win won lose lost "
+    "this that these those they them their we our you your he she his her it its what why how"
+).split()
+
+_FOREIGN = [
+    "no creo que esto sea verdad pero bueno así es la política",
+    "das ist doch völlig absurd und niemand glaubt das wirklich",
+    "c'est exactement ce que je disais depuis le début de la campagne",
+    "isso não faz sentido nenhum para quem acompanha as eleições",
+]
+
+# Bodies that recur verbatim across a real dump
+_REPEATED = [
+    "lol", "This.", "Source?", "Thank you!", "Exactly.", "lmao", "Yep.", "Good bot", "[citation needed]",
+    "I am a bot, and this action was performed automatically. Please contact the moderators of this "
+    "subreddit if you have any questions or concerns.",
+    "Your comment has been removed for violating rule 2: be civil. Please review the sidebar.",
+    "As a reminder, this subreddit is for civil discussion. In general, be courteous to others. "
+    "Debate/discuss/argue the merits of ideas, don't attack people.",
+    "Everyone is entitled to their own opinion, but not their own facts. The data here is pretty "
+    "clear if you bother to read past the headline, which apparently nobody in this thread did.",
+]
+
+_EMOJI = ["😂", "🤣", "🙄", "👍", "🔥", "🇺🇸", "💀", "🤡"]
+_URLS = ["https://www.reuters.com/world/us/", "https://apnews.com/article/", "https://fivethirtyeight.com/polls/"]
+
+
+def _base36(n: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+def _body(rng: np.random.Generator, words: np.ndarray, n_words: int) -> str:
+    tokens = list(words[rng.integers(len(words), size=n_words)])
+    if rng.random() < 0.05:
+        url = _URLS[int(rng.integers(len(_URLS)))] + _base36(int(rng.integers(1 << 40)))
+        tokens.insert(int(rng.integers(len(tokens) + 1)), url)
+    if rng.random() < 0.08:
+        tokens.append(_EMOJI[int(rng.integers(len(_EMOJI)))])
+    text = " ".join(tokens)
+    if n_words > 60 and rng.random() < 0.5:
+        # Long comments come in paragraphs
+        cut = len(text) // 2
+        cut = text.find(" ", cut)
+        if cut > 0:
+            text = text[:cut] + "\n\n" + text[cut + 1:]
+    return text[:1].upper() + text[1:] + "."
+
+
+def generate_comments(
+    rows: int,
+    seed: int = 0,
+    start: datetime.date = datetime.date(2024, 11, 1),
+    days: int = 15,
+    subreddits: Optional[List[str]] = None,
+    skew: float = 1.1,
+    median_words: float = 18.0,
+    repeated_rate: float = 0.08,
+    deleted_rate: float = 0.04,
+    removed_rate: float = 0.03,
+    edited_rate: float = 0.05,
+    foreign_rate: float = 0.02,
+) -> Iterator[Dict]:
+    """
+    Yield synthetic comments in ``created_utc`` order.
+
+    Args:
+        rows (int): Comments to generate.
+        seed (int): Random seed; equal arguments give equal output.
+        start (datetime.date): First day (UTC).
+        days (int): Days the comments are spread over.
+        subreddits (List[str], optional): Subreddit names, most active first.
+        skew (float): Zipf exponent of the subreddit activity.
+        median_words (float): Median body length in words (log-normal, long tail).
+        repeated_rate (float): Share of bodies taken from a small pool of repeats.
+        deleted_rate (float): Share of ``[deleted]`` comments (body and author).
+        removed_rate (float): Share of ``[removed]`` bodies.
+        edited_rate (float): Share of comments with an edit timestamp.
+        foreign_rate (float): Share of non-English bodies.
+
+    Yields:
+        Dict: One comment in dump format.
+    """
+    rng = np.random.default_rng(seed)
+    subs = list(subreddits or SUBREDDITS)
+    weights = 1.0 / np.arange(1, len(subs) + 1) ** skew
+    weights /= weights.sum()
+    words = np.array(_WORDS)
+    t0 = calendar.timegm(start.timetuple())
+    span = days * 86400
+    authors = [f"user_{_base36(i)}" for i in range(max(10, rows // 20))]
+    threads = max(10, rows // 200)
+    block = 10_000
+    for offset in range(0, rows, block):
+        n = min(block, rows - offset)
+        created = np.sort(rng.integers(t0 + span * offset // rows, t0 + span * (offset + n) // rows + 1, size=n))
+        sub_idx = rng.choice(len(subs), size=n, p=weights)
+        n_words = np.clip(rng.lognormal(np.log(median_words), 1.0, size=n), 1, 2000).astype(int)
+        kind = rng.random(n)
+        author_idx = rng.zipf(1.5, size=n) % len(authors)
+        scores = np.clip(np.round(rng.standard_t(2, size=n) * 5 + 3), -500, 50_000).astype(int)
+        thread_idx = rng.integers(threads, size=n)
+        edit_delay = rng.integers(60, 86400, size=n)
+        for i in range(n):
+            k = float(kind[i])
+            author = authors[author_idx[i]]
+            if k < deleted_rate:
+                body, author = "[deleted]", "[deleted]"
+            elif k < deleted_rate + removed_rate:
+                body = "[removed]"
+            elif k < deleted_rate + removed_rate + repeated_rate:
+                body = _REPEATED[(int(rng.zipf(1.6)) - 1) % len(_REPEATED)]
+            elif k < deleted_rate + removed_rate + repeated_rate + foreign_rate:
+                body = _FOREIGN[int(rng.integers(len(_FOREIGN)))]
+            else:
+                body = _body(rng, words, int(n_words[i]))
+            cid = _base36(36**6 + offset + i)
+            link = "t3_" + _base36(36**5 + int(thread_idx[i]))
+            parent = link if rng.random() < 0.4 else "t1_" + _base36(36**6 + max(0, offset + i - int(rng.integers(1, 500))))
+            sub = subs[sub_idx[i]]
+            ts = int(created[i])
+            yield {
+                "all_awardings": [],
+                "archived": False,
+                "associated_award": None,
+                "author": author,
+                "author_flair_richtext": [],
+                "author_flair_text": None,
+                "author_fullname": None if author == "[deleted]" else "t2_" + _base36(int(author_idx[i]) + 36**4),
+                "body": body,
+                "collapsed": False,
+                "controversiality": int(rng.random() < 0.04),
+                "created_utc": ts,
+                "distinguished": "moderator" if body.startswith("I am a bot") else None,
+                "downs": 0,
+                "edited": ts + int(edit_delay[i]) if k > 1 - edited_rate else False,
+                "gilded": 0,
+                "id": cid,
+                "is_submitter": bool(rng.random() < 0.05),
+                "link_id": link,
+                "locked": False,
+                "name": "t1_" + cid,
+                "parent_id": parent,
+                "permalink": f"/r/{sub}/comments/{link[3:]}/_/{cid}/",
+                "retrieved_on": ts + 86400 * 30,
+                "score": int(scores[i]),
+                "score_hidden": False,
+                "stickied": False,
+                "subreddit": sub,
+                "subreddit_id": "t5_" + _base36(int(sub_idx[i]) + 36**3),
+                "subreddit_type": "public",
+                "total_awards_received": 0,
+                "ups": int(scores[i]),
+            }
+
+
+def write_dump(path: str, rows: int, level: int = 3, **kwargs) -> Dict[str, int]:
+    """
+    Write ``rows`` synthetic comments as a zstd-compressed NDJSON dump.
+
+    Args:
+        path (str): Output file, e.g. ``RC_2024-11.zst``.
+        rows (int): Comments to write.
+        level (int): zstd compression level.
+        **kwargs: Passed to :func:`generate_comments`.
+
+    Returns:
+        Dict[str, int]: rows, decompressed bytes and compressed bytes.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    raw = 0
+    with open(path, "wb") as fh:
+        with zstd.ZstdCompressor(level=level).stream_writer(fh) as writer:
+            for comment in generate_comments(rows, **kwargs):
+                line = (json.dumps(comment, ensure_ascii=False) + "\n").encode("utf-8")
+                writer.write(line)
+                raw += len(line)
+    return {"rows": rows, "bytes": raw, "compressed_bytes": os.path.getsize(path)}
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--out", required=True, help="Output .zst path (e.g. data/synthetic/RC_2024-11.zst)")
+    p.add_argument("--rows", type=int, default=100_000, help="Comments to generate")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--start", default="2024-11-01", help="First day, YYYY-MM-DD")
+    p.add_argument("--days", type=int, default=15, help="Days the comments span")
+    p.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of subreddit activity")
+    p.add_argument("--median-words", type=float, default=18.0, help="Median body length in words")
+    p.add_argument("--repeated-rate", type=float, default=0.08, help="Share of repeated bodies")
+    p.add_argument("--deleted-rate", type=float, default=0.04, help="Share of [deleted] comments")
+    p.add_argument("--removed-rate", type=float, default=0.03, help="Share of [removed] bodies")
+    p.add_argument("--edited-rate", type=float, default=0.05, help="Share of edited comments")
+    p.add_argument("--foreign-rate", type=float, default=0.02, help="Share of non-English bodies")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    stats = write_dump(
+        args.out,
+        args.rows,
+        seed=args.seed,
+        start=datetime.date.fromisoformat(args.start),
+        days=args.days,
+        skew=args.skew,
+        median_words=args.median_words,
+        repeated_rate=args.repeated_rate,
+        deleted_rate=args.deleted_rate,
+        removed_rate=args.removed_rate,
+        edited_rate=args.edited_rate,
+        foreign_rate=args.foreign_rate,
+    )
+    print(
+        f"✓ {stats['rows']:,} comments, {stats['bytes'] / 2**20:,.1f} MiB "
+        f"({stats['compressed_bytes'] / 2**20:,.1f} MiB compressed) ➜ {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
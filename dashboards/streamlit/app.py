@@ -1,55 +1,188 @@
 # dashboards/streamlit_app/app.py
 
+import os
+from datetime import datetime, time, timezone
+import numpy as np
+import pandas as pd
 import streamlit as st
 from streamlit_option_menu import option_menu
 
+from nlp_core.query import dataset_version, open_features
+from nlp_core.polarization import histograms_from_rollup, mean_polarization, pairwise_js
+from nlp_core.rollup import (
+    BIN_MINUTES,
+    filter_rollup,
+    fill_bins,
+    group_means,
+    load_rollup,
+    rebin,
+    smooth,
+    to_datetime_index,
+    weighted_series,
+)
+
+# Written by run_pipeline (<out-root>/rollup/cube.parquet)
+ROLLUP_PATH = os.environ.get("ROLLUP_PATH", "data/rollup/cube.parquet")
+# Comment-level features (<out-root>/features), for the comment samples
+FEATURES_PATH = os.environ.get("FEATURES_PATH", "data/features")
+SAMPLE_COLUMNS = ["created_utc", "subreddit", "clean_body", "sentiment", "dominant_emotion", "stance", "sarcasm_score", "topic"]
+
 def load_image(path):
     from PIL import Image
     return Image.open(path)
 
+# ─── cached cube queries ─────────────────────────────────────────────
+# The cube is read once per file version; every control change below only
+# re-aggregates the in-memory cube, and repeated settings are cache hits.
+@st.cache_data(show_spinner="Loading rollup cube …")
+def get_cube(path: str, mtime: float) -> pd.DataFrame:
+    return load_rollup(path)
+
+@st.cache_data(max_entries=8)
+def get_projection(path, mtime, dims):
+    # Cube summed over every dimension not in dims, still at the finest bin;
+    # a few thousand rows per subreddit, so the re-bins below stay fast
+    return rebin(get_cube(path, mtime), BIN_MINUTES, dims)
+
+@st.cache_data(max_entries=64)
+def get_binned(path, mtime, subs, start_ts, end_ts, bin_win, by):
+    dims = tuple(dict.fromkeys(("subreddit",) + by))
+    cube = filter_rollup(get_projection(path, mtime, dims), list(subs), start_ts, end_ts)
+    return rebin(cube, bin_win, by)
+
+@st.cache_data(max_entries=64)
+def get_timeline(path, mtime, subs, start_ts, end_ts, bin_win, weight_mode, smoothing, window):
+    binned = get_binned(path, mtime, subs, start_ts, end_ts, bin_win, ("subreddit",))
+    overall = fill_bins(weighted_series(binned, weight_mode), bin_win)
+    per_sub = fill_bins(group_means(binned, "sentiment"), bin_win)
+    return (
+        to_datetime_index(smooth(overall, smoothing, window)),
+        to_datetime_index(smooth(per_sub, smoothing, window)),
+    )
+
+@st.cache_data(max_entries=64)
+def get_polarization(path, mtime, subs, start_ts, end_ts, bin_win, smoothing, window):
+    # Topic-mix JS divergence between subreddits: pooled matrix and per-bin mean
+    binned = get_binned(path, mtime, subs, start_ts, end_ts, bin_win, ("subreddit", "topic"))
+    groups, bins, _, counts = histograms_from_rollup(binned, "subreddit", "topic")
+    pooled = pd.DataFrame(pairwise_js(counts.sum(axis=1, keepdims=True))[0], index=groups, columns=groups)
+    series = pd.DataFrame({"polarization": mean_polarization(pairwise_js(counts))}, index=bins)
+    return pooled, to_datetime_index(smooth(fill_bins(series, bin_win), smoothing, window))
+
+@st.cache_data(max_entries=32)
+def get_samples(path, version, subs, start_ts, end_ts, min_sarcasm, limit):
+    # Partition-pruned read of the matching comments; version changes with each pipeline run
+    dataset = open_features(path)
+    filters = [("sarcasm_score", ">=", min_sarcasm)] if min_sarcasm > 0 else None
+    samples = dataset.query(
+        columns=SAMPLE_COLUMNS, subreddits=list(subs), start_ts=start_ts, end_ts=end_ts, filters=filters, limit=limit
+    ).to_pandas()
+    total = dataset.count(subreddits=list(subs), start_ts=start_ts, end_ts=end_ts, filters=filters)
+    samples["created_utc"] = pd.to_datetime(samples["created_utc"], unit="s", utc=True)
+    return samples, total
+
+def _day_bounds(start, end):
+    start_ts = int(datetime.combine(start, time.min, tzinfo=timezone.utc).timestamp())
+    end_ts = int(datetime.combine(end, time.max, tzinfo=timezone.utc).timestamp())
+    return start_ts, end_ts
+
 st.set_page_config(page_title="Election NLP Dashboard", layout="wide")
-st.title("Election NLP Dashboard (Demo)")
+st.title("Election NLP Dashboard")
+
+try:
+    mtime = os.path.getmtime(ROLLUP_PATH)
+    cube = get_cube(ROLLUP_PATH, mtime)
+except FileNotFoundError as e:
+    st.error(str(e))
+    st.stop()
+
+all_subs = sorted(cube["subreddit"].cat.categories)
+first_day = pd.to_datetime(cube["bin_ts"].min(), unit="s", utc=True).date()
+last_day = pd.to_datetime(cube["bin_ts"].max(), unit="s", utc=True).date()
 
 # Sidebar controls
 with st.sidebar:
     st.header("Controls")
-    subs = st.multiselect("Subreddits", ["politics", "conservative", "moderatepolitics", "politicaldiscussion"], default=["politics"])
-    bin_win = st.slider("Bin Size (minutes)", 5, 240, 60)
+    subs = st.multiselect("Subreddits", all_subs, default=all_subs[:1])
+    days = st.date_input("Date Range", (first_day, last_day), min_value=first_day, max_value=last_day)
+    bin_win = st.slider("Bin Size (minutes)", 5, 240, 60, step=BIN_MINUTES)
     smoothing = st.selectbox("Smoothing Method", ["EWMA", "LOESS"])
+    window = st.slider("Smoothing Window (bins)", 1, 48, 6)
     weight_mode = st.radio("Weighting Mode", ["Raw", "Equalized", "Inverse Frequency"])
 
+if not subs:
+    st.info("Select at least one subreddit.")
+    st.stop()
+subs = tuple(sorted(subs))
+start_day, end_day = days if isinstance(days, tuple) and len(days) == 2 else (first_day, last_day)
+start_ts, end_ts = _day_bounds(start_day, end_day)
+
 # Navigation
-tab = option_menu("Menu", ["Overview", "Timeline", "Semantic Explorer", "Topics & Chords", "Stance vs Emotion"], 
+tab = option_menu("Menu", ["Overview", "Timeline", "Semantic Explorer", "Topics & Chords", "Stance vs Emotion"],
                   icons=["house", "line-chart", "search", "bar-chart-2", "flow-chart"], menu_icon="cast", default_index=0)
 
 if tab == "Overview":
     st.header("Overview")
-    # Key metrics cards (static values for demo)
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Avg Sentiment", "0.15")
-    col2.metric("% Sarcastic", "2.5%")
-    col3.metric("Polarization (JS)", "0.123")
+    daily = get_binned(ROLLUP_PATH, mtime, subs, start_ts, end_ts, 1440, ("subreddit",))
+    # One bin spanning the whole window
+    totals = daily.groupby("subreddit", as_index=False).sum().assign(bin_ts=0)
+    overall = weighted_series(totals, weight_mode)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Comments", f"{int(overall['volume'].sum()):,}")
+    col2.metric("Avg Sentiment", f"{overall['sentiment'].iloc[0]:.3f}" if len(overall) else "–")
+    col3.metric("% Sarcastic", f"{overall['sarcasm'].iloc[0]:.1%}" if len(overall) else "–")
+    pooled, over_time = get_polarization(ROLLUP_PATH, mtime, subs, start_ts, end_ts, bin_win, smoothing, window)
+    pooled_mean = mean_polarization(pooled.to_numpy()[None])[0]
+    col4.metric("Polarization (JS)", f"{pooled_mean:.3f}" if np.isfinite(pooled_mean) else "–")
+    if len(pooled) > 1:
+        st.subheader("Topic polarization between subreddits")
+        st.dataframe(pooled.style.format("{:.3f}"))
+        st.line_chart(over_time)
 
 elif tab == "Timeline":
     st.header("Sentiment & Sarcasm Timeline")
     st.write("Click legend items to toggle series.")
-    timeline_chart = load_image("dashboards/assets/timeline.png")
-    st.image(timeline_chart, use_column_width=True)
+    overall, per_sub = get_timeline(
+        ROLLUP_PATH, mtime, subs, start_ts, end_ts, bin_win, weight_mode, smoothing, window
+    )
+    st.subheader(f"Combined ({weight_mode})")
+    st.line_chart(overall[["sentiment", "sarcasm"]])
+    st.subheader("Sentiment by subreddit")
+    st.line_chart(per_sub)
+    st.subheader("Comment volume")
+    st.area_chart(overall[["volume"]])
 
 elif tab == "Semantic Explorer":
     st.header("Semantic UMAP Explorer")
     st.write("Lasso-select points to read comment samples.")
     umap_chart = load_image("dashboards/assets/umap.png")
     st.image(umap_chart, use_column_width=True)
+    st.subheader("Comment samples")
+    min_sarcasm = st.slider("Minimum sarcasm score", 0.0, 1.0, 0.0, step=0.05)
+    try:
+        samples, total = get_samples(
+            FEATURES_PATH, dataset_version(FEATURES_PATH), subs, start_ts, end_ts, min_sarcasm, 200
+        )
+    except FileNotFoundError as e:
+        st.info(str(e))
+    else:
+        st.caption(f"{len(samples):,} of {total:,} matching comments")
+        st.dataframe(samples, use_container_width=True)
 
 elif tab == "Topics & Chords":
-    st.header("Topics and Sentiment Chord Diagram")
-    chord_chart = load_image("dashboards/assets/chord.png")
-    race_chart = load_image("dashboards/assets/topic_race.png")
-    st.image(chord_chart, width=600)
-    st.image(race_chart, width=600)
+    st.header("Topic Volume")
+    binned = get_binned(ROLLUP_PATH, mtime, subs, start_ts, end_ts, bin_win, ("topic",))
+    volume = binned.pivot_table(index="bin_ts", columns="topic", values="n", aggfunc="sum", fill_value=0)
+    top = volume.sum().nlargest(10).index
+    st.area_chart(to_datetime_index(smooth(fill_bins(volume[top], bin_win).fillna(0), smoothing, window)))
+    st.header("Sentiment by Topic and Subreddit")
+    by_topic = get_binned(ROLLUP_PATH, mtime, subs, start_ts, end_ts, 1440, ("subreddit", "topic"))
+    by_topic = by_topic.groupby(["topic", "subreddit"], observed=True)[["sentiment_sum", "sentiment_n"]].sum()
+    st.dataframe((by_topic["sentiment_sum"] / by_topic["sentiment_n"]).unstack().loc[top])
 
 elif tab == "Stance vs Emotion":
-    st.header("Stance vs. Dominant Emotion Sankey")
-    sankey_chart = load_image("dashboards/assets/sankey.png")
-    st.image(sankey_chart, width=800)
+    st.header("Stance vs. Dominant Emotion")
+    flows = get_binned(ROLLUP_PATH, mtime, subs, start_ts, end_ts, 1440, ("stance", "emotion"))
+    table = flows.pivot_table(index="stance", columns="emotion", values="n", aggfunc="sum", fill_value=0, observed=True)
+    st.dataframe(table.div(table.sum(axis=1), axis=0).style.format("{:.1%}"))
+    st.bar_chart(table.T)
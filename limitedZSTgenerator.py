@@ -1,8 +1,10 @@
-import zstandard as zstd
-import io
-import json
-from datetime import datetime
+import logging
+from datetime import date
 
+from nlp_core.extract import FilterSpec, extract
+
+# Kept for the election slice used in development; other or additional slices
+# can be written in the same pass with ``python -m nlp_core.extract``
 INPUT_ZST = "comments/RC_2024-11.zst"   # Path to your input file
 OUTPUT_ZST = "tests/data/election_subs_nov1-15.zst"  # Path to new output file
 
@@ -16,33 +18,12 @@ TARGET_SUBS = set([
     "PoliticalHumor", "PoliticalCompassMemes", "Ask_Politics", "PopheadsGetsPolitical"
 ])
 
-DATE_START = datetime(2024, 11, 1)
-DATE_END = datetime(2024, 11, 15, 23, 59, 59)
-
-kept = 0
-with open(INPUT_ZST, "rb") as infile, open(OUTPUT_ZST, "wb") as outfile:
-    dctx = zstd.ZstdDecompressor()
-    stream = dctx.stream_reader(infile)
-    text_stream = io.TextIOWrapper(stream, encoding="utf-8")
-    cctx = zstd.ZstdCompressor()
-    with cctx.stream_writer(outfile) as writer:
-        for line in text_stream:
-            try:
-                data = json.loads(line)
-                subreddit = data.get("subreddit")
-                if subreddit not in TARGET_SUBS:
-                    continue
-                created = data.get("created_utc")
-                if created is None:
-                    continue
-                dt = datetime.utcfromtimestamp(int(created))
-                if not (DATE_START <= dt <= DATE_END):
-                    continue
-                writer.write((json.dumps(data) + "\n").encode("utf-8"))
-                kept += 1
-                if kept % 10000 == 0:
-                    print(f"{kept} comments written...")
-            except Exception:
-                continue
+DATE_START = date(2024, 11, 1)
+DATE_END = date(2024, 11, 15)   # inclusive
 
-print(f"Done! {kept} comments extracted to {OUTPUT_ZST}")
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")   # progress and ETA
+    spec = FilterSpec("election_subs_nov1-15", OUTPUT_ZST, TARGET_SUBS, DATE_START, DATE_END)
+    report = extract(INPUT_ZST, [spec])
+    kept = report["slices"][spec.name]["lines"]
+    print(f"Done! {kept} comments extracted to {OUTPUT_ZST}")
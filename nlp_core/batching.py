@@ -0,0 +1,114 @@
+# nlp_core/batching.py
+
+import logging
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+# Texts per forward pass
+DEFAULT_BATCH_SIZE = 32
+# Upper bound on (batch size × longest sequence) tokens per forward pass
+DEFAULT_TOKEN_BUDGET = 8192
+# Inputs are truncated to the model limit, so longer texts cost no more than this
+MAX_TOKENS = 512
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap sub-word token estimate (~4 characters per token), capped at MAX_TOKENS.
+
+    Args:
+        text (str): Input text.
+
+    Returns:
+        int: Estimated number of tokens after truncation.
+    """
+    return min(MAX_TOKENS, len(text) // 4 + 2)
+
+
+def length_buckets(
+    texts: Sequence[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> Iterator[List[int]]:
+    """
+    Group text positions into length-sorted batches.
+
+    Sorting by length keeps padding inside a batch small; a batch is closed when
+    it reaches ``batch_size`` texts or when padding every text to the longest
+    one would exceed ``token_budget`` tokens.
+
+    Args:
+        texts (Sequence[str]): Input texts.
+        batch_size (int): Maximum texts per batch.
+        token_budget (int): Maximum padded tokens per batch.
+
+    Yields:
+        List[int]: Positions into ``texts`` for one batch.
+    """
+    if batch_size < 1 or token_budget < 1:
+        raise ValueError("batch_size and token_budget must be >= 1.")
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    batch: List[int] = []
+    longest = 0
+    for i in order:
+        n_tokens = estimate_tokens(texts[i])
+        padded = max(longest, n_tokens) * (len(batch) + 1)
+        if batch and (len(batch) >= batch_size or padded > token_budget):
+            yield batch
+            batch, longest = [], 0
+        batch.append(i)
+        longest = max(longest, n_tokens)
+    if batch:
+        yield batch
+
+
+def run_batched(
+    pipe: Callable[..., Any],
+    texts: Sequence[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    default: Any = None,
+    **pipe_kwargs: Any,
+) -> List[Any]:
+    """
+    Run a Hugging Face pipeline over texts in length-bucketed, padded batches.
+
+    Empty texts are not sent to the model and get ``default``. If a batch fails,
+    its texts are retried one by one so a single bad input only loses itself.
+
+    Args:
+        pipe (Callable): A transformers pipeline (or any callable taking a list of texts).
+        texts (Sequence[str]): Input texts.
+        batch_size (int): Maximum texts per forward pass.
+        token_budget (int): Maximum padded tokens per forward pass.
+        default (Any): Result for empty texts and failed inputs.
+        **pipe_kwargs: Extra keyword arguments for the pipeline call.
+
+    Returns:
+        List[Any]: One raw pipeline output per input text, in input order.
+    """
+    results: List[Any] = [default] * len(texts)
+    positions = [i for i, text in enumerate(texts) if text]
+    todo = [texts[i] for i in positions]
+    pipe_kwargs.setdefault("truncation", True)
+    for bucket in length_buckets(todo, batch_size, token_budget):
+        batch = [todo[j] for j in bucket]
+        outputs: Optional[List[Any]]
+        try:
+            outputs = list(pipe(batch, batch_size=len(batch), **pipe_kwargs))
+        except Exception as e:
+            logging.warning(f"Batch of {len(batch)} failed, retrying one by one: {e}")
+            outputs = [_run_single(pipe, text, default, pipe_kwargs) for text in batch]
+        for j, output in zip(bucket, outputs):
+            results[positions[j]] = output
+    return results
+
+
+def _run_single(pipe: Callable[..., Any], text: str, default: Any, pipe_kwargs: dict) -> Any:
+    try:
+        output = pipe(text, **pipe_kwargs)
+    except Exception:
+        return default
+    # A single string returns a one-element list; unwrap to match batch outputs
+    if isinstance(output, list) and len(output) == 1:
+        return output[0]
+    return output
@@ -1,15 +1,57 @@
 # nlp_core/cleaning.py
 
+import os
 import re
+import logging
 import emoji
-from typing import Optional
-from langdetect import detect, DetectorFactory
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from langdetect import detect, detect_langs, DetectorFactory
+
+from nlp_core.metrics import instrument
+
+try:
+    import fasttext
+except ImportError:
+    fasttext = None
+
+logger = logging.getLogger(__name__)
 
 # Fix random seed for langdetect for consistency
 DetectorFactory.seed = 0
 
 URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
 
+# fastText language-ID model (lid.176.ftz/.bin); langdetect is used if it is
+# unavailable. Fetch it with `python -m nlp_core.cleaning fetch-lid-model`
+LID_MODEL_PATH = os.environ.get("LID_MODEL_PATH", "models/lid.176.ftz")
+LID_MODEL_URL = "https://dl.fbaipublicfiles.com/fasttext/supported-models/lid.176.ftz"
+# Texts shorter than this are kept without running language identification
+MIN_LID_CHARS = 20
+# A text is dropped only if the identifier is at least this sure it is not English
+LID_THRESHOLD = 0.8
+
+# Everything str.isspace() accepts, spelled out so the pattern means the same in
+# Python's re and in the RE2 engine behind Arrow string kernels
+_WS = "\t\n\x0b\x0c\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000"
+_URL_RE = rf"https?://[^{_WS}]+|www\.[^{_WS}]+"
+_WS_RE = rf"[{_WS}]+"
+
+# Frequent English function words; a high share of them marks a text as English
+# without calling the language identifier
+_EN_FUNCTION_WORDS = (
+    "the", "a", "an", "and", "or", "but", "of", "to", "in", "on", "for", "with", "at",
+    "by", "from", "is", "are", "was", "were", "be", "been", "it", "this", "that",
+    "i", "you", "he", "she", "we", "they", "not", "no", "have", "has", "do", "does",
+    "did", "will", "would", "can", "if", "so", "what", "just", "like", "about", "my",
+    "your", "his", "her", "their",
+)
+_EN_WORDS_RE = r"\b(?:" + "|".join(_EN_FUNCTION_WORDS) + r")\b"
+
+
 def clean_text(text: Optional[str]) -> str:
     """
     Clean Reddit comment text by removing URLs, emojis, and non-English posts.
@@ -41,3 +83,172 @@ def clean_text(text: Optional[str]) -> str:
         pass
 
     return text
+
+
+@instrument("clean")
+def clean_texts(texts: pd.Series) -> pd.Series:
+    """
+    Vectorised :func:`clean_text` for a whole partition.
+
+    URL, emoji and whitespace stripping run as Arrow string kernels over the
+    column; language identification runs once per batch (see :func:`is_english`).
+
+    Args:
+        texts (pd.Series): Comment bodies (object or string dtype, may hold nulls).
+
+    Returns:
+        pd.Series: Cleaned ``string[pyarrow]`` series with the same index; filtered
+        rows (deleted, removed, empty or non-English) are empty strings.
+    """
+    s = texts.astype("string[pyarrow]")
+    dropped = s.isna() | s.str.strip().str.lower().isin(["", "[deleted]", "[removed]"])
+
+    s = s.str.lower()
+    s = s.str.replace(_URL_RE, "", regex=True)
+    s = s.str.replace(_emoji_pattern(), "", regex=True)
+    s = s.str.replace(_WS_RE, " ", regex=True).str.strip()
+
+    s = s.mask(dropped, "").fillna("")
+    candidates = s != ""
+    if candidates.any():
+        # Positional: partitions read from several files can repeat index labels
+        mask = candidates.to_numpy(dtype=bool)
+        keep = np.ones(len(s), dtype=bool)
+        keep[mask] = is_english(s[mask]).to_numpy(dtype=bool)
+        s = s.mask(~keep, "")
+    return s
+
+
+def is_english(texts: pd.Series) -> pd.Series:
+    """
+    Batched English identification for already-cleaned texts.
+
+    Short texts are kept (language ID is unreliable on them), texts dense in
+    English function words are accepted without a model call, and the rest go
+    through fastText (or langdetect as a fallback) in one batch. A text is only
+    rejected when the identifier names another language with probability of at
+    least ``LID_THRESHOLD``.
+
+    Args:
+        texts (pd.Series): Cleaned, whitespace-normalised texts.
+
+    Returns:
+        pd.Series: Boolean series with the same index, True for texts to keep.
+    """
+    s = texts.astype("string[pyarrow]").fillna("")
+    keep = s.str.len() < MIN_LID_CHARS
+
+    tokens = s.str.count(r"[^ ]+")
+    hits = s.str.count(_EN_WORDS_RE)
+    keep |= (hits >= 2) & (hits >= 0.2 * tokens)
+
+    keep = keep.to_numpy(dtype=bool)
+    undecided = s[~keep]
+    if len(undecided):
+        langs = _identify_languages(undecided.tolist())
+        keep[~keep] = [lang == "en" or prob < LID_THRESHOLD for lang, prob in langs]
+    return pd.Series(keep, index=s.index)
+
+
+def _identify_languages(texts: List[str]) -> List[Tuple[str, float]]:
+    """(language, probability) of the top guess for each text."""
+    model = _fasttext_model()
+    if model is not None:
+        try:
+            labels, probs = model.predict(texts, k=1)
+            return [
+                (label[0].replace("__label__", ""), float(prob[0]))
+                for label, prob in zip(labels, probs)
+            ]
+        except Exception as e:
+            _warn_fallback(f"fastText prediction failed ({e})")
+    results = []
+    for text in texts:
+        try:
+            top = detect_langs(text)[0]
+            results.append((top.lang, float(top.prob)))
+        except Exception:
+            # If detection fails, keep text by default
+            results.append(("en", 0.0))
+    return results
+
+
+@lru_cache(maxsize=1)
+def _fasttext_model():
+    if fasttext is None:
+        _warn_fallback("fasttext is not installed (pip install fasttext-wheel)")
+        return None
+    if not os.path.exists(LID_MODEL_PATH):
+        _warn_fallback(f"no model at {LID_MODEL_PATH} (python -m nlp_core.cleaning fetch-lid-model)")
+        return None
+    try:
+        return fasttext.load_model(LID_MODEL_PATH)
+    except Exception as e:
+        _warn_fallback(f"could not load {LID_MODEL_PATH} ({e})")
+        return None
+
+
+@lru_cache(maxsize=None)
+def _warn_fallback(reason: str) -> None:
+    # Once per process and reason: langdetect is about two orders of magnitude slower
+    logger.warning(f"Language identification falls back to per-text langdetect: {reason}")
+
+
+def fetch_lid_model(path: str = LID_MODEL_PATH, url: str = LID_MODEL_URL) -> str:
+    """
+    Download the fastText language-ID model used by :func:`is_english`.
+
+    Args:
+        path (str): Destination file.
+        url (str): Model URL.
+
+    Returns:
+        str: ``path``.
+    """
+    import urllib.request
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.part"
+    urllib.request.urlretrieve(url, tmp)
+    os.replace(tmp, path)
+    _fasttext_model.cache_clear()
+    return path
+
+
+@lru_cache(maxsize=1)
+def _emoji_pattern() -> str:
+    """Regex for emoji: keycap sequences plus a class of every non-ASCII emoji code point."""
+    codepoints = sorted({ord(ch) for key in emoji.EMOJI_DATA for ch in key if ord(ch) > 0x7F})
+    ranges: List[List[int]] = []
+    for cp in codepoints:
+        if ranges and cp == ranges[-1][1] + 1:
+            ranges[-1][1] = cp
+        else:
+            ranges.append([cp, cp])
+    char_class = "".join(
+        chr(lo) if lo == hi else f"{chr(lo)}-{chr(hi)}" for lo, hi in ranges
+    )
+    return f"[#*0-9]\ufe0f?\u20e3|[{char_class}]"
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────
+def _parse_args(argv: Optional[List[str]] = None):
+    import argparse
+
+    p = argparse.ArgumentParser(prog="python -m nlp_core.cleaning")
+    sub = p.add_subparsers(dest="command", required=True)
+    f = sub.add_parser("fetch-lid-model", help="Download the fastText language-ID model")
+    f.add_argument("--path", default=LID_MODEL_PATH)
+    f.add_argument("--url", default=LID_MODEL_URL)
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    if args.command == "fetch-lid-model":
+        path = fetch_lid_model(args.path, args.url)
+        print(f"✓ {path} ({os.path.getsize(path) / 2**20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
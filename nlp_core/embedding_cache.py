@@ -0,0 +1,411 @@
+# nlp_core/embedding_cache.py
+"""
+On-disk embedding cache, one directory per encoder model.
+
+Vectors live in append-only segments: ``segment-<stamp>.npy`` holds a float16 or
+float32 matrix that is read back memory-mapped, and ``segment-<stamp>.parquet``
+holds the comment ``id``, a blake2b hash of the encoded text and the matrix row.
+An update only encodes ids that are new or whose text hash changed; the newest
+segment wins when an id appears more than once. Segments are committed by
+writing their Parquet file last, so concurrent writers (one per Dask partition)
+never see half-written data.
+
+Every lookup reads the index of every segment, so segments of similar size are
+merged (size-tiered, as in ``index_segments``) to keep their number
+logarithmic in the cache size. Merging is not safe alongside other writers;
+run_pipeline merges once after the embed stage.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from nlp_core.models import get_model
+
+META_FILE = "_cache.json"
+# Texts sent to the encoder per call; bounds memory while filling a segment
+ENCODE_CHUNK = 4096
+# Segments merge once this many of them share a size tier
+DEFAULT_MERGE_FACTOR = 4
+# Upper bound of the smallest size tier
+DEFAULT_MIN_SEGMENT_ROWS = 10_000
+
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def _sentence_transformer_loader(model_name: str):
+    def load() -> Optional[Any]:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            return None
+        try:
+            return SentenceTransformer(model_name)
+        except Exception:
+            return None
+    return load
+
+
+def sentence_encoder(model_name: str, batch_size: int = 64) -> Encoder:
+    """
+    Encoder for ``model_name`` backed by the model registry.
+
+    Embeddings are L2-normalised, so inner product equals cosine similarity.
+
+    Args:
+        model_name (str): sentence-transformers model name.
+        batch_size (int): Texts per forward pass.
+
+    Returns:
+        Encoder: Callable mapping a list of texts to an (n, dim) array.
+    """
+    def encode(texts: List[str]) -> np.ndarray:
+        model = get_model(f"embeddings.{model_name}", _sentence_transformer_loader(model_name))
+        if model is None:
+            raise RuntimeError(f"Embedding model '{model_name}' is not available.")
+        return model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+    return encode
+
+
+def text_hash(text: str) -> bytes:
+    """16-byte blake2b digest of ``text``."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent id → embedding store for one encoder model.
+
+    Args:
+        root (str): Cache root; the model gets its own subdirectory.
+        model_name (str): Encoder model name.
+        dtype (str): "float16" (half the disk and page cache) or "float32".
+        encoder (Encoder, optional): Overrides the default sentence-transformers encoder.
+        merge_factor (int): Segments per size tier that trigger a merge.
+        min_segment_rows (int): Upper bound of the smallest size tier.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        model_name: str,
+        dtype: str = "float16",
+        encoder: Optional[Encoder] = None,
+        merge_factor: int = DEFAULT_MERGE_FACTOR,
+        min_segment_rows: int = DEFAULT_MIN_SEGMENT_ROWS,
+    ):
+        if dtype not in ("float16", "float32"):
+            raise ValueError("dtype must be 'float16' or 'float32'.")
+        if merge_factor < 2:
+            raise ValueError("merge_factor must be >= 2.")
+        self.model_name = model_name
+        self.merge_factor = merge_factor
+        self.min_segment_rows = min_segment_rows
+        self.path = os.path.join(root, model_name.replace("/", "__"))
+        self.encoder = encoder or sentence_encoder(model_name)
+        os.makedirs(self.path, exist_ok=True)
+        self.meta = self._load_meta(dtype)
+        self.dtype = self.meta["dtype"]
+
+    # ─── public API ──────────────────────────────────────────────────────
+    @property
+    def dimension(self) -> Optional[int]:
+        if self.meta.get("dim") is None:
+            # Another process may have written the first segment since we opened
+            self.meta = self._load_meta(self.dtype)
+        return self.meta.get("dim")
+
+    def __len__(self) -> int:
+        return len(self._read_index())
+
+    def update(self, ids: Sequence[str], texts: Sequence[str]) -> int:
+        """
+        Encode and store the texts whose id is new or whose text changed.
+
+        Args:
+            ids (Sequence[str]): Comment ids.
+            texts (Sequence[str]): Texts to embed, aligned with ``ids``.
+
+        Returns:
+            int: Number of texts encoded.
+        """
+        if len(ids) != len(texts):
+            raise ValueError("ids and texts must have the same length.")
+        hashes = [text_hash(t) for t in texts]
+        known = self._lookup(ids)
+        todo: Dict[str, Tuple[str, bytes]] = {}
+        for id_, text, h in zip(ids, texts, hashes):
+            entry = known.get(id_)
+            if entry is None or entry[2] != h:
+                todo[id_] = (text, h)
+        if todo:
+            self._write_segment(list(todo), [t for t, _ in todo.values()], [h for _, h in todo.values()])
+        return len(todo)
+
+    def get(self, ids: Sequence[str]) -> np.ndarray:
+        """
+        Embeddings for ``ids`` in the given order.
+
+        Args:
+            ids (Sequence[str]): Comment ids.
+
+        Returns:
+            np.ndarray: float32 array of shape (len(ids), dim).
+
+        Raises:
+            KeyError: If an id is not cached.
+        """
+        known = self._lookup(ids)
+        missing = [i for i in ids if i not in known]
+        if missing:
+            raise KeyError(f"{len(missing)} ids not in the embedding cache, e.g. {missing[:3]}")
+        out = np.empty((len(ids), self.dimension or 0), dtype="float32")
+        by_segment: Dict[str, List[Tuple[int, int]]] = {}
+        for pos, id_ in enumerate(ids):
+            segment, row, _ = known[id_]
+            by_segment.setdefault(segment, []).append((pos, row))
+        for segment, pairs in by_segment.items():
+            vectors = self._vectors(segment)
+            positions, rows = zip(*pairs)
+            out[list(positions)] = vectors[list(rows)]
+        return out
+
+    def iter_batches(self, batch_size: int = 65536) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """
+        Stream every live (latest) embedding, segment by segment.
+
+        Args:
+            batch_size (int): Maximum rows per batch.
+
+        Yields:
+            Tuple[List[str], np.ndarray]: Ids and their float32 vectors.
+        """
+        live = self._read_index()
+        for segment, group in live.groupby("segment", sort=True):
+            vectors = self._vectors(segment)
+            group = group.sort_values("row")
+            for start in range(0, len(group), batch_size):
+                part = group.iloc[start:start + batch_size]
+                yield part["id"].tolist(), np.asarray(vectors[part["row"].to_numpy()], dtype="float32")
+
+    def sample(self, n: int, seed: int = 0) -> np.ndarray:
+        """
+        Uniform random sample of up to ``n`` live vectors (e.g. to train an index).
+
+        Args:
+            n (int): Sample size.
+            seed (int): Random seed.
+
+        Returns:
+            np.ndarray: float32 array of shape (min(n, len(self)), dim).
+        """
+        live = self._read_index()
+        if len(live) > n:
+            live = live.sample(n=n, random_state=seed)
+        parts = [
+            np.asarray(self._vectors(segment)[np.sort(group["row"].to_numpy())], dtype="float32")
+            for segment, group in live.groupby("segment", sort=True)
+        ]
+        if not parts:
+            return np.empty((0, self.dimension or 0), dtype="float32")
+        return np.vstack(parts)
+
+    def ids(self) -> List[str]:
+        """Every cached id."""
+        return self._read_index()["id"].tolist()
+
+    # ─── merging ─────────────────────────────────────────────────────────
+    def segments(self) -> List[Tuple[str, int]]:
+        """(name, rows) of every segment, oldest first."""
+        return [
+            (os.path.basename(path)[: -len(".parquet")], pq.read_metadata(path).num_rows)
+            for path in self._index_files()
+        ]
+
+    def merge_candidates(self) -> List[List[str]]:
+        """
+        Groups of segments to merge under the size-tiered policy.
+
+        Segments are bucketed by size into tiers that grow by ``merge_factor``;
+        any tier holding ``merge_factor`` segments yields its oldest
+        ``merge_factor`` segments as one group.
+        """
+        tiers: Dict[int, List[str]] = {}
+        for name, rows in self.segments():
+            rows = max(rows, 1)
+            tier = 0 if rows <= self.min_segment_rows else \
+                1 + int(math.log(rows / self.min_segment_rows, self.merge_factor))
+            tiers.setdefault(tier, []).append(name)
+        return [names[:self.merge_factor] for _, names in sorted(tiers.items())
+                if len(names) >= self.merge_factor]
+
+    def maybe_merge(self) -> int:
+        """
+        Merge until no size tier is full.
+
+        Returns:
+            int: Number of merges performed.
+        """
+        merges = 0
+        while True:
+            groups = self.merge_candidates()
+            if not groups:
+                return merges
+            self.merge(groups[0])
+            merges += 1
+
+    def merge(self, names: Sequence[str]) -> str:
+        """
+        Replace segments ``names`` by one segment holding their live rows.
+
+        Rows superseded by any newer segment are dropped, and the merged segment
+        sorts where the newest of ``names`` did, so the newest-wins order of
+        every id is unchanged.
+
+        Args:
+            names (Sequence[str]): Segments to merge.
+
+        Returns:
+            str: Name of the merged segment.
+        """
+        live = self._read_index()
+        group = live[live["segment"].isin(list(names))].sort_values(["segment", "row"], kind="stable")
+        # segment-<ns>-<hex> of the newest member plus a suffix: after every
+        # member, before every later segment
+        newest = max(names)
+        segment = "-".join(newest.split("-")[:3]) + f"-m{uuid.uuid4().hex[:8]}"
+        npy_tmp = os.path.join(self.path, f".{segment}.npy")
+        vectors = np.lib.format.open_memmap(
+            npy_tmp, mode="w+", dtype=self.dtype, shape=(len(group), self.dimension or 0)
+        )
+        start = 0
+        for name, part in group.groupby("segment", sort=False):
+            vectors[start:start + len(part)] = self._vectors(name)[part["row"].to_numpy()]
+            start += len(part)
+        vectors.flush()
+        del vectors
+        os.replace(npy_tmp, os.path.join(self.path, f"{segment}.npy"))
+        self._commit_index(segment, group["id"].tolist(), group["hash"].tolist())
+
+        # Committed: the merged segment shadows its members, which can go now.
+        # Readers that still map an old .npy keep working until they reopen it
+        for name in names:
+            for ext in (".parquet", ".npy"):
+                path = os.path.join(self.path, name + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+        logging.info(f"Embedding cache {self.model_name}: merged {len(names)} segments into {segment} "
+                     f"({len(group):,} vectors)")
+        return segment
+
+    # ─── internals ───────────────────────────────────────────────────────
+    def _load_meta(self, dtype: str) -> Dict[str, Any]:
+        path = os.path.join(self.path, META_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            if meta["model"] != self.model_name:
+                raise ValueError(f"Cache at {self.path} belongs to model '{meta['model']}'.")
+            return meta
+        meta = {"model": self.model_name, "dtype": dtype, "dim": None}
+        self._save_meta(meta)
+        return meta
+
+    def _save_meta(self, meta: Dict[str, Any]) -> None:
+        tmp = os.path.join(self.path, f".{META_FILE}.{uuid.uuid4().hex}")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+    def _index_files(self) -> List[str]:
+        return sorted(
+            os.path.join(self.path, name)
+            for name in os.listdir(self.path)
+            if name.startswith("segment-") and name.endswith(".parquet")
+        )
+
+    def _read_index(self, ids: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        files = self._index_files()
+        columns = ["id", "hash", "row", "segment"]
+        if not files:
+            return pd.DataFrame(columns=columns)
+        dataset = ds.dataset(files, format="parquet")
+        flt = ds.field("id").isin(pa.array(list(ids), type=pa.string())) if ids is not None else None
+        frames = []
+        # Read per file so every row can be tagged with its segment
+        for fragment in dataset.get_fragments(filter=flt):
+            table = fragment.to_table(columns=["id", "hash", "row"], filter=flt)
+            if table.num_rows:
+                frame = table.to_pandas()
+                frame["segment"] = os.path.basename(fragment.path)[: -len(".parquet")]
+                frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        # Segment names sort by creation time, so the last duplicate is the newest
+        index = pd.concat(frames, ignore_index=True).sort_values("segment", kind="stable")
+        return index.drop_duplicates("id", keep="last")
+
+    def _lookup(self, ids: Sequence[str]) -> Dict[str, Tuple[str, int, bytes]]:
+        index = self._read_index(ids)
+        return {
+            id_: (segment, int(row), h)
+            for id_, segment, row, h in zip(index["id"], index["segment"], index["row"], index["hash"])
+        }
+
+    def _vectors(self, segment: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{segment}.npy"), mmap_mode="r")
+
+    def _write_segment(self, ids: List[str], texts: List[str], hashes: List[bytes]) -> None:
+        segment = f"segment-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        npy_tmp = os.path.join(self.path, f".{segment}.npy")
+        vectors = None
+        for start in range(0, len(texts), ENCODE_CHUNK):
+            batch = np.asarray(self.encoder(texts[start:start + ENCODE_CHUNK]))
+            if vectors is None:
+                self._check_dimension(batch.shape[1])
+                vectors = np.lib.format.open_memmap(
+                    npy_tmp, mode="w+", dtype=self.dtype, shape=(len(texts), batch.shape[1])
+                )
+            vectors[start:start + len(batch)] = batch
+        assert vectors is not None
+        vectors.flush()
+        del vectors
+        os.replace(npy_tmp, os.path.join(self.path, f"{segment}.npy"))
+
+        self._commit_index(segment, ids, hashes)
+        logging.info(f"Embedding cache {self.model_name}: wrote {len(ids):,} vectors to {segment}")
+
+    def _commit_index(self, segment: str, ids: List[str], hashes: List[bytes]) -> None:
+        """Write the segment's index (row i of its .npy is ids[i]); this commits the segment."""
+        table = pa.table({
+            "id": pa.array(ids, type=pa.string()),
+            "hash": pa.array(hashes, type=pa.binary(16)),
+            "row": pa.array(np.arange(len(ids), dtype="int32")),
+        })
+        pq_tmp = os.path.join(self.path, f".{segment}.parquet")
+        pq.write_table(table, pq_tmp)
+        os.replace(pq_tmp, os.path.join(self.path, f"{segment}.parquet"))
+
+    def _check_dimension(self, dim: int) -> None:
+        if self.meta.get("dim") is None:
+            self.meta["dim"] = int(dim)
+            self._save_meta(self.meta)
+        elif self.meta["dim"] != dim:
+            raise ValueError(f"Encoder returned dim {dim}, cache holds dim {self.meta['dim']}.")
@@ -1,58 +1,583 @@
 # nlp_core/embeddings.py
 
+import json
+import logging
+import os
+import math
 import numpy as np
-from typing import List
-try:
-    from sentence_transformers import SentenceTransformer
-except ImportError:
-    SentenceTransformer = None
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 import faiss
 
+from nlp_core.models import get_model
+from nlp_core.embedding_cache import ENCODE_CHUNK, EmbeddingCache, _sentence_transformer_loader
+
+INDEX_FILE = "index.faiss"
+META_FILE = "meta.parquet"
+STORE_FILE = "store.json"
+# Row metadata returned with every hit, besides the comment id
+META_COLUMNS = ("subreddit", "created_utc")
+
+# ─── Index types ─────────────────────────────────────────────────────────
+# hnsw:     graph over full vectors; best recall/latency, ~4·d bytes + graph per vector
+# ivf_flat: inverted lists of full vectors; cheaper to build, recall set by nprobe
+# ivf_pq:   (OPQ-rotated) product-quantised inverted lists; pq_m bytes per vector
+INDEX_TYPES = ("hnsw", "ivf_flat", "ivf_pq")
+# Vectors used to train IVF centroids / PQ codebooks
+DEFAULT_TRAIN_SIZE = 100_000
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+# Filtered searches with at most this many candidates are answered exactly
+EXACT_SEARCH_MAX = 2048
+# Upper bound for efSearch when a filter makes HNSW walk past rejected nodes
+MAX_EF_SEARCH = 1024
+
+
+def index_description(
+    index_type: str,
+    dimension: int,
+    n_vectors: Optional[int] = None,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    pq_m: Optional[int] = None,
+    opq: bool = True,
+) -> str:
+    """
+    FAISS ``index_factory`` string for an index type.
+
+    Args:
+        index_type (str): One of INDEX_TYPES.
+        dimension (int): Vector dimension.
+        n_vectors (int, optional): Expected index size; sets the default ``nlist``.
+        nlist (int, optional): IVF lists (default ≈ 4·√n_vectors).
+        hnsw_m (int): HNSW neighbours per node.
+        pq_m (int, optional): PQ sub-quantisers (bytes per vector); must divide ``dimension``.
+        opq (bool): Rotate vectors with OPQ before PQ.
+
+    Returns:
+        str: Factory description, e.g. "OPQ64,IVF4096,PQ64".
+
+    Raises:
+        ValueError: For unknown index types or a ``pq_m`` that does not divide ``dimension``.
+    """
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'; available: {INDEX_TYPES}")
+    if nlist is None:
+        nlist = max(1, int(4 * math.sqrt(n_vectors))) if n_vectors else 1024
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if pq_m is None:
+        pq_m = next((m for m in (64, 48, 32, 16, 8, 4) if dimension % m == 0 and dimension // m >= 4), 1)
+    if dimension % pq_m:
+        raise ValueError(f"pq_m={pq_m} does not divide dimension {dimension}.")
+    return f"{f'OPQ{pq_m},' if opq else ''}IVF{nlist},PQ{pq_m}"
+
+
+def comment_key(comment_id: str) -> int:
+    """
+    int64 FAISS label of a Reddit comment id.
+
+    Reddit ids are base36 (optionally with a ``t1_`` prefix), so the id itself
+    is the label and no separate id table is needed to translate hits.
+
+    Raises:
+        ValueError: If the id is not base36 or does not fit in int64.
+    """
+    key = int(comment_id.rsplit("_", 1)[-1], 36)
+    if key >= 2**63:
+        raise ValueError(f"Comment id '{comment_id}' does not fit in int64.")
+    return key
+
+
+def comment_keys(ids: Sequence[str]) -> np.ndarray:
+    """Vectorised :func:`comment_key`."""
+    return np.fromiter((comment_key(i) for i in ids), dtype="int64", count=len(ids))
+
+
+def _base_index(index):
+    """Innermost index below OPQ transforms and id maps."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexPreTransform, faiss.IndexIDMap)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
 class EmbeddingStore:
     """
     Stores embeddings in a FAISS index for nearest-neighbor search.
+
+    Vectors are L2-normalised and searched by inner product, so scores are cosine
+    similarities. Row ``i`` of the index belongs to row ``i`` of ``meta`` (comment
+    id, subreddit, created_utc). The encoder is loaded through nlp_core.models on
+    first use, so creating or loading a store (e.g. at API start-up) does not
+    load the model.
     """
     def __init__(self, model_name: str = "hkunlp/instructor-xl"):
-        if SentenceTransformer:
-            try:
-                self.model = SentenceTransformer(model_name)
-            except Exception:
-                self.model = None
-        else:
-            self.model = None
+        self.model_name = model_name
         self.index = None
         self.dimension = None
+        # Comment id and metadata per index row
+        self.meta: Optional[pa.Table] = None
+        self.config: Dict[str, Any] = {}
+        # Label → metadata row for id-mapped indexes (built on first use)
+        self._key_index: Optional[pd.Index] = None
+        # Filter columns as arrays (built on first filtered search)
+        self._filter_columns: Optional[Tuple[pa.Array, np.ndarray]] = None
+
+    @property
+    def ids(self) -> List[str]:
+        return self.meta.column("id").to_pylist() if self.meta is not None else []
+
+    @property
+    def model(self) -> Optional[Any]:
+        return get_model(
+            f"embeddings.{self.model_name}", _sentence_transformer_loader(self.model_name)
+        )
+
+    def build_from_batches(
+        self,
+        batches: Iterable[Tuple[List[str], np.ndarray]],
+        index_type: str = "hnsw",
+        n_vectors: Optional[int] = None,
+        train_vectors: Optional[np.ndarray] = None,
+        train_size: int = DEFAULT_TRAIN_SIZE,
+        meta: Optional[pd.DataFrame] = None,
+        base_index: Optional["faiss.Index"] = None,
+        description: Optional[str] = None,
+        id_map: bool = False,
+        **index_options: Any,
+    ):
+        """
+        Build the index from a stream of (ids, vectors) batches.
+
+        Vectors are added batch by batch, so only the index itself grows with the
+        corpus. Index types that need training use ``train_vectors`` or, if not
+        given, the first ``train_size`` streamed vectors (buffered until trained).
+
+        Args:
+            batches (Iterable[Tuple[List[str], np.ndarray]]): Ids and vectors per batch.
+            index_type (str): One of INDEX_TYPES.
+            n_vectors (int, optional): Expected total, used to size IVF lists.
+            train_vectors (np.ndarray, optional): Representative training sample.
+            train_size (int): Vectors to buffer for training when no sample is given.
+            meta (pd.DataFrame, optional): Row metadata indexed by comment id
+                (e.g. subreddit, created_utc); ids without metadata get nulls.
+            base_index (faiss.Index, optional): Trained, empty index to clone instead of
+                building (and training) a new one, e.g. to share IVF centroids across segments.
+            description (str, optional): Factory string of ``base_index``, kept in the config.
+            id_map (bool): Label vectors with :func:`comment_key` instead of row positions.
+            **index_options: ``nlist``, ``hnsw_m``, ``pq_m``, ``opq`` (see :func:`index_description`).
+        """
+        stream = iter(batches)
+        pending: List[Tuple[List[str], np.ndarray]] = []
+        ids: List[str] = []
+
+        def prepared(vectors: np.ndarray) -> np.ndarray:
+            vectors = np.ascontiguousarray(vectors, dtype="float32")
+            faiss.normalize_L2(vectors)
+            return vectors
 
-    def build_index(self, texts: List[str]):
+        # Peek (and, for training, buffer) until the dimension and sample are known
+        buffered = 0
+        for batch_ids, vectors in stream:
+            pending.append((batch_ids, prepared(vectors)))
+            buffered += len(batch_ids)
+            if train_vectors is not None or base_index is not None or index_type == "hnsw" \
+                    or buffered >= train_size:
+                break
+        if not pending:
+            raise RuntimeError("No vectors to index.")
+        dimension = pending[0][1].shape[1]
+        if base_index is not None:
+            index = faiss.clone_index(base_index)
+            description = description or ""
+        else:
+            description = index_description(index_type, dimension, n_vectors, **index_options)
+            index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            sample = prepared(train_vectors) if train_vectors is not None else np.vstack([v for _, v in pending])
+            logging.info(f"Training {description} on {len(sample):,} vectors")
+            index.train(sample)
+        hnsw = _base_index(index)
+        if isinstance(hnsw, faiss.IndexHNSW):
+            hnsw.hnsw.efConstruction = 200
+        if id_map and not isinstance(hnsw, faiss.IndexIVF):
+            # IVF lists store labels natively; other types need an id map
+            index = faiss.IndexIDMap2(index)
+
+        def all_batches() -> Iterator[Tuple[List[str], np.ndarray]]:
+            yield from pending
+            for batch_ids, vectors in stream:
+                yield batch_ids, prepared(vectors)
+
+        for batch_ids, vectors in all_batches():
+            if id_map:
+                index.add_with_ids(vectors, comment_keys(batch_ids))  # type: ignore
+            else:
+                index.add(vectors)  # type: ignore
+            ids.extend(batch_ids)
+        pending.clear()
+
+        self.index = index
+        self.dimension = dimension
+        self.config = {"index_type": index_type, "description": description, "id_map": id_map}
+        self._key_index = None
+        self._filter_columns = None
+        frame = pd.DataFrame({"id": pd.Series(ids, dtype="string")})
+        if id_map:
+            frame["key"] = comment_keys(ids)
+        if meta is not None:
+            frame = frame.join(meta, on="id")
+        self.meta = pa.Table.from_pandas(frame, preserve_index=False)
+
+    def build_index(
+        self,
+        texts: List[str],
+        ids: Optional[Sequence[str]] = None,
+        index_type: str = "hnsw",
+        **index_options: Any,
+    ):
         """
-        Build FAISS index from a list of texts.
+        Build FAISS index from a list of texts, encoding them in chunks.
 
         Args:
             texts (List[str]): Texts to index.
+            ids (Sequence[str], optional): Comment id per text; defaults to positions.
+            index_type (str): One of INDEX_TYPES.
+            **index_options: See :meth:`build_from_batches`.
         """
         if not self.model:
             raise RuntimeError("No embedding model available.")
-        embeddings = self.model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-        embeddings = np.array(embeddings, dtype='float32')
-        self.dimension = embeddings.shape[1]
-        # Create HNSW index
-        self.index = faiss.IndexHNSWFlat(self.dimension, 32)
-        self.index.hnsw.efConstruction = 200
-        self.index.add(embeddings)  # type: ignore
+        ids = [str(i) for i in range(len(texts))] if ids is None else list(ids)
+
+        def batches() -> Iterator[Tuple[List[str], np.ndarray]]:
+            for start in range(0, len(texts), ENCODE_CHUNK):
+                chunk = texts[start:start + ENCODE_CHUNK]
+                vectors = self.model.encode(chunk, show_progress_bar=False, convert_to_numpy=True)
+                yield ids[start:start + ENCODE_CHUNK], vectors
+
+        self.build_from_batches(batches(), index_type, n_vectors=len(texts), **index_options)
+
+    def build_from_cache(
+        self,
+        cache: EmbeddingCache,
+        meta: Optional[pd.DataFrame] = None,
+        index_type: str = "hnsw",
+        train_size: int = DEFAULT_TRAIN_SIZE,
+        batch_size: int = 65536,
+        **index_options: Any,
+    ):
+        """
+        Build the FAISS index from precomputed embeddings without re-encoding.
+
+        Trainable index types are trained on a random sample of the cache.
+
+        Args:
+            cache (EmbeddingCache): Cache filled with this store's model.
+            meta (pd.DataFrame, optional): Row metadata indexed by comment id.
+            index_type (str): One of INDEX_TYPES.
+            train_size (int): Training sample size.
+            batch_size (int): Vectors added per call.
+            **index_options: See :func:`index_description`.
+
+        Raises:
+            ValueError: If the cache was built with a different model.
+        """
+        if cache.model_name != self.model_name:
+            raise ValueError(f"Cache holds '{cache.model_name}' embeddings, store uses '{self.model_name}'.")
+        if cache.dimension is None:
+            raise RuntimeError("Embedding cache is empty.")
+        n_vectors = len(cache)
+        train = cache.sample(train_size) if index_type != "hnsw" else None
+        self.build_from_batches(
+            cache.iter_batches(batch_size), index_type, n_vectors=n_vectors,
+            train_vectors=train, meta=meta, **index_options,
+        )
+
+    # ─── persistence ─────────────────────────────────────────────────────
+    def save(self, path: str):
+        """
+        Write the index, its row metadata and the model name to ``path``.
+
+        Args:
+            path (str): Output directory.
+        """
+        if self.index is None or self.meta is None:
+            raise RuntimeError("Index not initialized.")
+        os.makedirs(path, exist_ok=True)
+        # Write to temporary names first so running readers never see a mix
+        faiss.write_index(self.index, os.path.join(path, f".{INDEX_FILE}"))
+        pq.write_table(self.meta, os.path.join(path, f".{META_FILE}"))
+        with open(os.path.join(path, f".{STORE_FILE}"), "w", encoding="utf-8") as fh:
+            json.dump({"model": self.model_name, "dim": self.dimension, "rows": self.index.ntotal,
+                       **self.config}, fh)
+        for name in (INDEX_FILE, META_FILE, STORE_FILE):
+            os.replace(os.path.join(path, f".{name}"), os.path.join(path, name))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "EmbeddingStore":
+        """
+        Open a store written by :meth:`save`.
+
+        With ``mmap`` the index is memory-mapped read-only, so start-up is fast
+        and several processes (e.g. uvicorn workers) share one copy in the page
+        cache. Index types that cannot be mapped are read into memory instead.
+
+        Args:
+            path (str): Directory written by :meth:`save`.
+            mmap (bool): Memory-map the index file.
+
+        Returns:
+            EmbeddingStore: Store ready for :meth:`search`.
+        """
+        with open(os.path.join(path, STORE_FILE), "r", encoding="utf-8") as fh:
+            info = json.load(fh)
+        store = cls(info["model"])
+        index_path = os.path.join(path, INDEX_FILE)
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logging.warning(f"Cannot memory-map {index_path}, reading it into memory: {e}")
+        store.index = index if index is not None else faiss.read_index(index_path)
+        store.dimension = store.index.d
+        store.config = {k: info[k] for k in ("index_type", "description", "id_map") if k in info}
+        store.meta = pq.read_table(os.path.join(path, META_FILE), memory_map=True)
+        if store.meta.num_rows != store.index.ntotal:
+            raise RuntimeError(
+                f"{path}: index has {store.index.ntotal} rows but metadata has {store.meta.num_rows}."
+            )
+        return store
+
+    # ─── search ──────────────────────────────────────────────────────────
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Normalised float32 query vectors."""
+        if self.model is None:
+            raise RuntimeError("Index or model not initialized.")
+        vectors = self.model.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+        return np.ascontiguousarray(vectors, dtype="float32")
+
+    def search_params(
+        self,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        sel: Optional["faiss.IDSelector"] = None,
+    ) -> Optional["faiss.SearchParameters"]:
+        """
+        Per-query search parameters for the loaded index type.
+
+        Passing parameters per call (instead of setting ``index.nprobe``) keeps
+        concurrent searches with different settings independent.
+
+        Args:
+            nprobe (int, optional): IVF lists to visit (default DEFAULT_NPROBE).
+            ef_search (int, optional): HNSW candidate list size (default DEFAULT_EF_SEARCH).
+            sel (faiss.IDSelector, optional): Restricts the search to matching labels.
+
+        Returns:
+            faiss.SearchParameters or None for indexes without knobs.
+        """
+        base = _base_index(self.index)
+        if isinstance(base, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(nprobe=nprobe or DEFAULT_NPROBE)
+        elif isinstance(base, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=ef_search or DEFAULT_EF_SEARCH)
+        elif sel is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        if sel is not None:
+            params.sel = sel
+        if isinstance(faiss.downcast_index(self.index), faiss.IndexPreTransform):
+            wrapped = faiss.SearchParametersPreTransform()
+            wrapped.index_params = params
+            # Keep the inner parameters alive as long as the wrapper
+            wrapped.referenced_objects = [params, sel]
+            return wrapped
+        params.referenced_objects = [sel]
+        return params
+
+    def search_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        sel: Optional["faiss.IDSelector"] = None,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        exclude: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Raw FAISS search: (scores, labels), -1 where fewer than k hits.
+
+        Labels are row positions, or comment keys for stores built with ``id_map``.
+        With a subreddit or time filter the matching labels become a FAISS
+        ``IDSelectorBatch``, so only matching vectors are scored; when few rows
+        match they are scored exactly instead of walking the index.
+
+        Args:
+            vectors (np.ndarray): Normalised query vectors.
+            k (int): Hits per query.
+            nprobe (int, optional): IVF lists to visit.
+            ef_search (int, optional): HNSW search depth.
+            sel (faiss.IDSelector, optional): Label selector for unfiltered searches.
+            subreddits (Sequence[str], optional): Keep only these subreddits (case-insensitive).
+            start_ts (int, optional): Keep comments created at or after this epoch second.
+            end_ts (int, optional): Keep comments created at or before this epoch second.
+            exclude (np.ndarray, optional): Labels to leave out of filtered searches
+                (e.g. tombstones; unfiltered searches use ``sel`` for that).
+        """
+        if self.index is None:
+            raise RuntimeError("Index or model not initialized.")
+        if subreddits is None and start_ts is None and end_ts is None:
+            params = self.search_params(nprobe, ef_search, sel)
+            return self.index.search(vectors, k, params=params)  # type: ignore
+
+        allowed = self.matching_labels(subreddits, start_ts, end_ts)
+        if exclude is not None and len(exclude):
+            allowed = allowed[~np.isin(allowed, exclude)]
+        if len(allowed) <= EXACT_SEARCH_MAX:
+            return self._exact_search(vectors, allowed, k)
+        # Fewer matches hide more of the index behind the selector; widen the search to compensate
+        selectivity = len(allowed) / max(self.index.ntotal, 1)
+        nprobe = math.ceil((nprobe or DEFAULT_NPROBE) / selectivity)
+        base = _base_index(self.index)
+        if isinstance(base, faiss.IndexIVF):
+            nprobe = min(nprobe, base.nlist)
+        ef_search = min(MAX_EF_SEARCH, math.ceil((ef_search or DEFAULT_EF_SEARCH) / selectivity))
+        allowed = np.ascontiguousarray(allowed, dtype="int64")
+        batch = faiss.IDSelectorBatch(len(allowed), faiss.swig_ptr(allowed))
+        params = self.search_params(nprobe, ef_search, batch)
+        return self.index.search(vectors, k, params=params)  # type: ignore
+
+    def matching_labels(
+        self,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> np.ndarray:
+        """Labels of the rows whose metadata passes the filter."""
+        if self.meta is None:
+            raise RuntimeError("Index metadata not loaded.")
+        if self._filter_columns is None:
+            subs = self.meta.column("subreddit") if "subreddit" in self.meta.column_names else None
+            if subs is not None:
+                # Metadata written from a categorical column is dictionary-encoded
+                subs = subs.combine_chunks()
+                if pa.types.is_dictionary(subs.type):
+                    subs = subs.dictionary_decode()
+                subs = pc.utf8_lower(subs)
+            created = self.meta.column("created_utc").to_numpy() \
+                if "created_utc" in self.meta.column_names else None
+            self._filter_columns = (subs, created)
+        subs, created = self._filter_columns
+        mask = np.ones(self.meta.num_rows, dtype=bool)
+        if subreddits is not None:
+            if subs is None:
+                raise RuntimeError("Index has no subreddit metadata.")
+            wanted = pa.array([s.lower() for s in subreddits], type=pa.string())
+            mask &= pc.is_in(subs, value_set=wanted).to_numpy(zero_copy_only=False)
+        if start_ts is not None or end_ts is not None:
+            if created is None:
+                raise RuntimeError("Index has no created_utc metadata.")
+            if start_ts is not None:
+                mask &= created >= start_ts
+            if end_ts is not None:
+                mask &= created <= end_ts
+        rows = np.flatnonzero(mask)
+        if self.config.get("id_map"):
+            return self.meta.column("key").to_numpy()[rows]
+        return rows.astype("int64")
+
+    def _exact_search(self, vectors: np.ndarray, labels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score ``labels`` exhaustively (inner product on reconstructed vectors)."""
+        D = np.full((len(vectors), k), -np.inf, dtype="float32")
+        L = np.full((len(vectors), k), -1, dtype="int64")
+        if not len(labels):
+            return D, L
+        scores = vectors @ self.vectors_for(labels).T
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        n = top.shape[1]
+        D[:, :n] = np.take_along_axis(scores, top, axis=1)
+        L[:, :n] = labels[top]
+        return D, L
+
+    def rows_for(self, labels: np.ndarray) -> np.ndarray:
+        """Metadata rows of FAISS labels (-1 for unknown labels)."""
+        labels = np.asarray(labels, dtype="int64")
+        if not self.config.get("id_map"):
+            return labels
+        if self._key_index is None:
+            self._key_index = pd.Index(self.meta.column("key").to_numpy())
+        return self._key_index.get_indexer(labels)
+
+    def vectors_for(self, labels: np.ndarray) -> np.ndarray:
+        """
+        Stored vectors of FAISS labels, reconstructed from the index.
+
+        Product-quantised indexes only return approximations; prefer the
+        embedding cache when exact vectors are needed.
+        """
+        ivf = _base_index(self.index)
+        if isinstance(ivf, faiss.IndexIVF) and ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.set_direct_map_type(
+                faiss.DirectMap.Hashtable if self.config.get("id_map") else faiss.DirectMap.Array
+            )
+        labels = np.asarray(labels, dtype="int64")
+        return np.vstack([self.index.reconstruct(int(label)) for label in labels]) \
+            if len(labels) else np.empty((0, self.dimension or 0), dtype="float32")
+
+    def resolve(self, scores: np.ndarray, labels: np.ndarray) -> List[Dict]:
+        """Turn one row of FAISS results into hit dicts (id, score, metadata)."""
+        hits = []
+        rows = self.rows_for(labels) if self.meta is not None else labels
+        valid = [(float(s), int(r)) for s, r, l in zip(scores, rows, labels) if l >= 0 and r >= 0]
+        if not valid or self.meta is None:
+            return hits
+        table = self.meta.take(pa.array([r for _, r in valid])).to_pylist()
+        for (score, _), record in zip(valid, table):
+            hits.append({"id": record.get("id"), "score": score,
+                         **{c: record.get(c) for c in META_COLUMNS}})
+        return hits
 
-    def search(self, query: str, k: int = 5) -> List[int]:
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> List[Dict]:
         """
         Search the index for nearest neighbors to the query text.
 
         Args:
             query (str): Input query string.
             k (int): Number of neighbors to return.
+            nprobe (int, optional): IVF lists to visit.
+            ef_search (int, optional): HNSW search depth.
+            subreddits (Sequence[str], optional): Only return comments from these subreddits.
+            start_ts (int, optional): Only return comments created at or after this epoch second.
+            end_ts (int, optional): Only return comments created at or before this epoch second.
 
         Returns:
-            List[int]: Indices of nearest neighbors.
+            List[Dict]: Hits with comment id, cosine score, subreddit and created_utc,
+            best first.
         """
         if self.index is None or self.model is None:
             raise RuntimeError("Index or model not initialized.")
-        query_vec = self.model.encode([query], convert_to_numpy=True).astype('float32')
-        D, I = self.index.search(query_vec, k)  # type: ignore
-        return I[0].tolist()
+        D, I = self.search_vectors(
+            self.encode_queries([query]), k, nprobe, ef_search,
+            subreddits=subreddits, start_ts=start_ts, end_ts=end_ts,
+        )
+        return self.resolve(D[0], I[0])
@@ -1,16 +1,40 @@
 # nlp_core/emotion.py
 
-from transformers import pipeline
-from typing import Dict
-
-try:
-    _emotion_pipeline = pipeline(
-        "text-classification",
-        model="joeddav/bert-base-go-emotions",
-        return_all_scores=False
-    )
-except Exception:
-    _emotion_pipeline = None
+from itertools import chain
+from typing import Any, Dict, List, Mapping, Sequence
+
+import numpy as np
+
+from nlp_core.batching import DEFAULT_BATCH_SIZE, DEFAULT_TOKEN_BUDGET, run_batched
+from nlp_core.metrics import instrument
+from nlp_core.models import get_model, register_model
+
+EMOTION_MODEL = "joeddav/bert-base-go-emotions"
+# Feature-cache identity of detect_emotions_batch
+MODEL_NAME = EMOTION_MODEL
+MODEL_VERSION = "1"
+# GoEmotions label set, in the dataset's order; one fixed-width column each
+EMOTION_LABELS = (
+    "admiration", "amusement", "anger", "annoyance", "approval", "caring", "confusion",
+    "curiosity", "desire", "disappointment", "disapproval", "disgust", "embarrassment",
+    "excitement", "fear", "gratitude", "grief", "joy", "love", "nervousness", "optimism",
+    "pride", "realization", "relief", "remorse", "sadness", "surprise", "neutral",
+)
+
+
+def _load_emotion_pipeline():
+    try:
+        from transformers import pipeline
+        return pipeline(
+            "text-classification",
+            model=EMOTION_MODEL,
+            return_all_scores=False
+        )
+    except Exception:
+        return None
+
+
+register_model("emotion.goemotions", _load_emotion_pipeline)
 
 def detect_emotions(text: str) -> Dict[str, float]:
     """
@@ -22,17 +46,77 @@ def detect_emotions(text: str) -> Dict[str, float]:
     Returns:
         Dict[str, float]: Mapping from emotion label to confidence score.
     """
-    if not text or not _emotion_pipeline:
+    if not text:
+        return {}
+    emotion_pipeline = get_model("emotion.goemotions")
+    if not emotion_pipeline:
         return {}
     try:
         # Some emotion models output multiple labels with scores
-        results = _emotion_pipeline(text, truncation=True)
-        if isinstance(results, list):
-            # Convert list of dicts to label:score mapping
-            return {res["label"]: res["score"] for res in results}
-        elif isinstance(results, dict):
-            return {results["label"]: results["score"]}
-        else:
-            return {}
+        results = emotion_pipeline(text, truncation=True)
+        return _to_mapping(results)
     except Exception:
         return {}
+
+
+@instrument("emotion")
+def detect_emotions_batch(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> List[Dict[str, float]]:
+    """
+    Batched :func:`detect_emotions` over length-bucketed, padded batches.
+
+    Args:
+        texts (List[str]): Input texts.
+        batch_size (int): Maximum texts per forward pass.
+        token_budget (int): Maximum padded tokens per forward pass.
+
+    Returns:
+        List[Dict[str, float]]: Emotion label → score mapping per text ({} if empty).
+    """
+    emotion_pipeline = get_model("emotion.goemotions")
+    if not emotion_pipeline:
+        return [{} for _ in texts]
+    outputs = run_batched(emotion_pipeline, texts, batch_size, token_budget)
+    return [_to_mapping(out) if out is not None else {} for out in outputs]
+
+
+def _to_mapping(results: Any) -> Dict[str, float]:
+    if isinstance(results, list):
+        # Convert list of dicts to label:score mapping
+        return {res["label"]: res["score"] for res in results}
+    elif isinstance(results, dict):
+        return {results["label"]: results["score"]}
+    else:
+        return {}
+
+
+def emotion_matrix(
+    emotions: Sequence[Mapping[str, float]],
+    labels: Sequence[str] = EMOTION_LABELS,
+) -> np.ndarray:
+    """
+    Dense score matrix for label → score mappings.
+
+    Args:
+        emotions (Sequence[Mapping[str, float]]): Output of :func:`detect_emotions_batch`.
+        labels (Sequence[str]): Column order; labels outside it are dropped.
+
+    Returns:
+        np.ndarray: float32 array of shape ``(len(emotions), len(labels))``, 0.0
+        where a label has no score.
+    """
+    column = {label: j for j, label in enumerate(labels)}
+    lengths = np.fromiter(map(len, emotions), dtype=np.int64, count=len(emotions))
+    total = int(lengths.sum())
+    cols = np.fromiter(
+        (column.get(label, -1) for label in chain.from_iterable(emotions)), dtype=np.int64, count=total
+    )
+    scores = np.fromiter(chain.from_iterable(e.values() for e in emotions), dtype=np.float32, count=total)
+    rows = np.repeat(np.arange(len(emotions)), lengths)
+    keep = cols >= 0
+    out = np.zeros((len(emotions), len(labels)), dtype=np.float32)
+    out[rows[keep], cols[keep]] = scores[keep]
+    return out
@@ -0,0 +1,398 @@
+# nlp_core/extract.py
+"""
+Fan-out extraction of dump slices.
+
+One decompression pass over a Reddit dump writes any number of filtered
+``.zst`` slices, one per :class:`FilterSpec`. Kept lines are copied through
+byte for byte (no ``json.loads``/``json.dumps`` round trip), each slice is
+compressed by its own multi-threaded zstd writer, and progress is reported as
+compressed/decompressed bytes per second with an ETA.
+
+Run:
+    python -m nlp_core.extract comments/RC_2024-11.zst \
+        --spec name=election,out=slices/election.zst,subs=politics+news,start=2024-11-01,end=2024-11-15 \
+        --spec name=canada,out=slices/canada.zst,subs=canada \
+        --level 10 --threads 4
+    python -m nlp_core.extract comments/RC_2024-11.zst --specs slices.json
+"""
+
+import datetime
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import zstandard as zstd
+
+from nlp_core import metrics
+from nlp_core.io import DEFAULT_BLOCK_SIZE, LinePrefilter, _BlockReader, _CREATED_UTC_RE, _SUBREDDIT_RE
+
+DEFAULT_LEVEL = 3
+# Kept bytes buffered per slice before they are handed to its compressor
+FLUSH_BYTES = 4 * 1024 * 1024
+# Seconds between progress reports
+PROGRESS_EVERY = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class FilterSpec:
+    """
+    One output slice: the comments of some subreddits in an inclusive UTC date window.
+
+    Args:
+        name (str): Slice name used in reports.
+        output (str): Output ``.zst`` path.
+        subreddits (Iterable[str], optional): Subreddit names as written in the dump
+            (case-sensitive). None keeps every subreddit.
+        start (datetime.date, optional): First day kept.
+        end (datetime.date, optional): Last day kept.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        output: str,
+        subreddits: Optional[Iterable[str]] = None,
+        start: Optional[datetime.date] = None,
+        end: Optional[datetime.date] = None,
+    ):
+        if start is not None and end is not None and start > end:
+            raise ValueError(f"Spec '{name}': start {start} is after end {end}.")
+        self.name = name
+        self.output = output
+        self.subreddits = sorted(subreddits) if subreddits else None
+        self.start = start
+        self.end = end
+        prefilter = LinePrefilter.for_dates(self.subreddits, start, end)
+        self._subs = prefilter.subs
+        self.ts_min, self.ts_max = prefilter.ts_min, prefilter.ts_max
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> "FilterSpec":
+        """Build a spec from ``{"name", "output", "subreddits", "start", "end"}`` (dates as YYYY-MM-DD)."""
+        unknown = set(spec) - {"name", "output", "subreddits", "start", "end"}
+        if unknown or not {"name", "output"} <= set(spec):
+            raise ValueError(f"Invalid filter spec {spec}: needs name and output, got extra keys {sorted(unknown)}.")
+        dates = {
+            key: datetime.date.fromisoformat(spec[key]) if spec.get(key) else None for key in ("start", "end")
+        }
+        return cls(spec["name"], spec["output"], spec.get("subreddits"), **dates)
+
+    @classmethod
+    def parse(cls, text: str) -> "FilterSpec":
+        """
+        Build a spec from ``name=…,out=…[,subs=a+b][,start=YYYY-MM-DD][,end=YYYY-MM-DD]``.
+
+        Raises:
+            ValueError: On unknown or missing keys.
+        """
+        fields = dict(part.split("=", 1) for part in text.split(",") if part)
+        spec = {
+            "name": fields.pop("name", None),
+            "output": fields.pop("out", None),
+            "subreddits": fields.pop("subs").split("+") if "subs" in fields else None,
+            "start": fields.pop("start", None),
+            "end": fields.pop("end", None),
+        }
+        if fields or spec["name"] is None or spec["output"] is None:
+            raise ValueError(f"Invalid --spec '{text}': expected name=…,out=…[,subs=a+b][,start=…][,end=…]")
+        return cls.from_dict(spec)
+
+    def matches(self, subreddit: Optional[bytes], ts: int) -> bool:
+        """True if a comment of ``subreddit`` created at ``ts`` belongs to the slice."""
+        if self._subs is not None and subreddit not in self._subs:
+            return False
+        if self.ts_min is not None and ts < self.ts_min:
+            return False
+        if self.ts_max is not None and ts > self.ts_max:
+            return False
+        return True
+
+    def __repr__(self) -> str:
+        return f"FilterSpec({self.name!r}, {self.output!r}, {self.subreddits}, {self.start}, {self.end})"
+
+
+def line_fields(line: bytes) -> Optional[Tuple[Optional[bytes], int]]:
+    """
+    Subreddit (raw UTF-8 bytes) and ``created_utc`` of a dump line.
+
+    Read straight from the bytes when the line holds exactly one unescaped
+    ``"subreddit"`` and one ``"created_utc"`` field (inside JSON strings quotes
+    are escaped, so such a match can only be the key itself); anything else
+    falls back to ``json.loads``.
+
+    Returns:
+        Optional[Tuple[Optional[bytes], int]]: None for malformed lines or lines
+        without a usable timestamp.
+    """
+    subs = _SUBREDDIT_RE.findall(line)
+    stamps = _CREATED_UTC_RE.findall(line)
+    if len(subs) == 1 and len(stamps) == 1 and b"\\" not in subs[0]:
+        return subs[0], int(stamps[0])
+    try:
+        data = json.loads(line)
+        ts = int(float(data["created_utc"]))
+    except (ValueError, TypeError, KeyError):
+        return None
+    subreddit = data.get("subreddit")
+    return (subreddit.encode("utf-8") if isinstance(subreddit, str) else None), ts
+
+
+def _filter_block(block: bytes, specs: Sequence[FilterSpec]) -> Tuple[List[bytes], List[int], int]:
+    """
+    Worker entry point: split one newline-aligned block among the specs.
+
+    Returns:
+        The kept lines of each spec joined (newline-terminated), the kept line
+        count per spec, and the number of lines in the block.
+    """
+    kept: List[List[bytes]] = [[] for _ in specs]
+    lines = 0
+    for line in block.split(b"\n"):
+        if not line:
+            continue
+        lines += 1
+        fields = line_fields(line)
+        if fields is None:
+            continue
+        for out, spec in zip(kept, specs):
+            if spec.matches(*fields):
+                out.append(line)
+    joined = [b"\n".join(out) + b"\n" if out else b"" for out in kept]
+    return joined, [len(out) for out in kept], lines
+
+
+class _SliceWriter:
+    """Buffered multi-threaded zstd writer of one slice; the file appears under its final name on close."""
+
+    def __init__(self, spec: FilterSpec, level: int, threads: int):
+        self.spec = spec
+        self.lines = 0
+        self.bytes = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        directory = os.path.dirname(os.path.abspath(spec.output))
+        os.makedirs(directory, exist_ok=True)
+        self._tmp = spec.output + ".tmp"
+        self._fh = open(self._tmp, "wb")
+        self._writer = zstd.ZstdCompressor(level=level, threads=threads).stream_writer(self._fh, closefd=False)
+
+    def write(self, data: bytes, lines: int) -> None:
+        if not data:
+            return
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.lines += lines
+        self.bytes += len(data)
+        if self._buffered >= FLUSH_BYTES:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._writer.write(b"".join(self._buffer))
+        self._buffer, self._buffered = [], 0
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+        self._fh.close()
+        os.replace(self._tmp, self.spec.output)
+
+    def abort(self) -> None:
+        try:
+            self._writer.close()
+        finally:
+            self._fh.close()
+            if os.path.exists(self._tmp):
+                os.remove(self._tmp)
+
+
+def _eta_text(eta: Optional[float]) -> str:
+    return f"ETA {eta / 60:5.1f} min" if eta is not None else "ETA    ?    "
+
+
+def _log_progress(progress: Dict[str, Any]) -> None:
+    logger.info(
+        f"{progress['fraction']:6.1%}  {progress['compressed_rate'] / 2**20:,.1f} MiB/s compressed, "
+        f"{progress['rate'] / 2**20:,.1f} MiB/s decompressed, {progress['lines']:,} lines, "
+        f"{_eta_text(progress['eta_s'])}"
+    )
+
+
+def extract(
+    zst_path: str,
+    specs: Sequence[FilterSpec],
+    level: int = DEFAULT_LEVEL,
+    threads: int = -1,
+    workers: int = 1,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = _log_progress,
+    progress_every: float = PROGRESS_EVERY,
+) -> Dict[str, Any]:
+    """
+    Write every spec's slice of a dump in a single decompression pass.
+
+    Args:
+        zst_path (str): Source dump (e.g. ``RC_2024-11.zst``).
+        specs (Sequence[FilterSpec]): Slices to write; output paths must differ.
+        level (int): zstd compression level of the slices.
+        threads (int): Compression threads per slice (-1: one per CPU, 0: single-threaded).
+        workers (int): Processes filtering blocks; 1 filters in the calling process.
+        block_size (int): Decompressed bytes per block.
+        progress (Callable, optional): Called every ``progress_every`` seconds and at
+            the end with bytes read, fraction done, byte rates and ``eta_s``.
+        progress_every (float): Seconds between progress calls.
+
+    Returns:
+        Dict[str, Any]: Lines and bytes read, seconds, and per slice name the
+        output path, kept lines and (decompressed) bytes written.
+
+    Raises:
+        ValueError: If no spec is given or two specs share an output path.
+    """
+    if not specs:
+        raise ValueError("At least one filter spec is required.")
+    outputs = [os.path.abspath(spec.output) for spec in specs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Filter specs must write to distinct output paths.")
+    if os.path.abspath(zst_path) in outputs:
+        raise ValueError("A filter spec would overwrite the source dump.")
+
+    total = os.path.getsize(zst_path)
+    writers = [_SliceWriter(spec, level, threads) for spec in specs]
+    reader = _BlockReader(zst_path, block_size, max_pending=2 * max(1, workers))
+    state = {"lines": 0, "offset": 0, "compressed": 0}
+    start = last_report = time.perf_counter()
+
+    def report(final: bool = False) -> None:
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        compressed_rate = state["compressed"] / elapsed
+        remaining = total - state["compressed"]
+        progress({
+            "read_bytes": state["compressed"],
+            "total_bytes": total,
+            "fraction": 1.0 if final else state["compressed"] / total if total else 0.0,
+            "decompressed_bytes": state["offset"],
+            "lines": state["lines"],
+            "rate": state["offset"] / elapsed,
+            "compressed_rate": compressed_rate,
+            "eta_s": 0.0 if final else remaining / compressed_rate if compressed_rate > 0 else None,
+            "kept": {w.spec.name: w.lines for w in writers},
+        })
+
+    def consume(result, block_end: int, compressed: int) -> None:
+        nonlocal last_report
+        joined, counts, lines = result
+        for writer, data, count in zip(writers, joined, counts):
+            writer.write(data, count)
+        state.update(lines=state["lines"] + lines, offset=block_end, compressed=compressed)
+        if progress is not None and time.perf_counter() - last_report >= progress_every:
+            last_report = time.perf_counter()
+            report()
+
+    reader.start()
+    try:
+        if workers <= 1:
+            for block, block_offset, _, compressed in reader.blocks():
+                consume(_filter_block(block, specs), block_offset + len(block), compressed)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending: deque = deque()
+                blocks = reader.blocks()
+                exhausted = False
+                while pending or not exhausted:
+                    # Bounded number of blocks in flight; slices are written in stream order
+                    while not exhausted and len(pending) < 2 * workers:
+                        item = next(blocks, None)
+                        if item is None:
+                            exhausted = True
+                        else:
+                            block, block_offset, _, compressed = item
+                            end = block_offset + len(block)
+                            pending.append((end, compressed, pool.submit(_filter_block, block, specs)))
+                    if pending:
+                        end, compressed, future = pending.popleft()
+                        consume(future.result(), end, compressed)
+        for writer in writers:
+            writer.close()
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    finally:
+        reader.stop()
+
+    elapsed = time.perf_counter() - start
+    if progress is not None:
+        report(final=True)
+    metrics.record(
+        "extract", wall_s=elapsed, rows=state["lines"], bytes=state["offset"], compressed_bytes=total,
+    )
+    return {
+        "lines": state["lines"],
+        "bytes": state["offset"],
+        "compressed_bytes": total,
+        "seconds": round(elapsed, 3),
+        "slices": {
+            w.spec.name: {"output": w.spec.output, "lines": w.lines, "bytes": w.bytes} for w in writers
+        },
+    }
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────
+def _parse_args(argv: Optional[List[str]] = None):
+    import argparse
+
+    p = argparse.ArgumentParser(prog="python -m nlp_core.extract")
+    p.add_argument("zst", help="Source dump, e.g. comments/RC_2024-11.zst")
+    p.add_argument(
+        "--spec", action="append", default=[], metavar="SPEC",
+        help="name=…,out=…[,subs=a+b][,start=YYYY-MM-DD][,end=YYYY-MM-DD]; repeat for more slices",
+    )
+    p.add_argument(
+        "--specs", default=None,
+        help='JSON file with a list of {"name", "output", "subreddits", "start", "end"}',
+    )
+    p.add_argument("--level", type=int, default=DEFAULT_LEVEL, help="zstd level of the slices")
+    p.add_argument("--threads", type=int, default=-1, help="Compression threads per slice (-1: all CPUs)")
+    p.add_argument("--workers", type=int, default=1, help="Filter processes")
+    p.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="Decompressed bytes per block")
+    return p.parse_args(argv)
+
+
+def _print_progress(progress: Dict[str, Any]) -> None:
+    print(
+        f"\r  {progress['fraction']:6.1%}  {progress['compressed_rate'] / 2**20:7.1f} MiB/s "
+        f"({progress['rate'] / 2**20:7.1f} MiB/s decompressed)  {progress['lines']:>13,} lines  "
+        f"{_eta_text(progress['eta_s'])}",
+        end="", flush=True,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    specs = [FilterSpec.parse(text) for text in args.spec]
+    if args.specs:
+        with open(args.specs, "r", encoding="utf-8") as fh:
+            specs += [FilterSpec.from_dict(spec) for spec in json.load(fh)]
+    if not specs:
+        raise SystemExit("Give at least one --spec or --specs file.")
+    print(f"▪ Extracting {len(specs)} slice(s) from {args.zst}")
+    report = extract(
+        args.zst, specs, level=args.level, threads=args.threads, workers=args.workers,
+        block_size=args.block_size, progress=_print_progress,
+    )
+    print()
+    print(
+        f"✓ {report['lines']:,} lines, {report['bytes'] / 2**30:,.2f} GiB decompressed "
+        f"in {report['seconds']:,.0f}s"
+    )
+    for name, info in report["slices"].items():
+        print(f"  {name:<24} {info['lines']:>12,} lines ➜ {info['output']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# nlp_core/feature_cache.py
+"""
+Persistent per-stage cache of NLP results, keyed by content.
+
+A result is stored under (stage, model name, model version, hash of the
+normalised text), so identical bodies — "lol", bot templates, copypasta — are
+computed once per model, and re-running the pipeline after changing one stage
+only recomputes the stages whose model name or version changed. Each module
+exposes ``MODEL_NAME`` and ``MODEL_VERSION``; bump the version when the
+post-processing of a model's output changes.
+
+The cache is one SQLite file in WAL mode, shared by every Dask worker process
+on the machine. Entries are evicted least-recently-used once the table grows
+past ``max_entries``. Per-run counters (rows, unique texts, hits, computed)
+are kept in the same file so the driver can report hit rates.
+"""
+
+import logging
+import os
+import pickle
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from nlp_core.embedding_cache import text_hash
+
+DEFAULT_MAX_ENTRIES = 5_000_000
+# Rows inserted by one process between size checks (COUNT(*) scans the index)
+EVICT_EVERY = 50_000
+# Bound on host parameters per statement (SQLite's compile-time limit can be 999)
+_CHUNK = 900
+_WS_RE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    stage     TEXT    NOT NULL,
+    model     TEXT    NOT NULL,
+    version   TEXT    NOT NULL,
+    hash      BLOB    NOT NULL,
+    value     BLOB    NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (stage, model, version, hash)
+);
+CREATE INDEX IF NOT EXISTS features_last_used ON features (last_used);
+CREATE TABLE IF NOT EXISTS run_stats (
+    run_id       TEXT    NOT NULL,
+    stage        TEXT    NOT NULL,
+    n_rows       INTEGER NOT NULL,
+    unique_texts INTEGER NOT NULL,
+    hits         INTEGER NOT NULL,
+    computed     INTEGER NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC with whitespace runs collapsed and trimmed (the cache key text)."""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def content_key(text: str) -> bytes:
+    """16-byte hash of :func:`normalize_text`."""
+    return text_hash(normalize_text(text))
+
+
+class FeatureCache:
+    """
+    SQLite-backed (stage, model, version, text hash) → result store.
+
+    Values are pickled; the file is a private, locally written cache.
+
+    Args:
+        path (str): SQLite file (created if missing).
+        max_entries (int): Entries kept before least-recently-used eviction.
+        timeout (float): Seconds to wait for another process's write lock.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, timeout: float = 60.0):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._since_evict = 0
+
+    def __enter__(self) -> "FeatureCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    # ─── lookups and writes ──────────────────────────────────────────────
+    def get_many(self, stage: str, model: str, version: str, keys: Sequence[bytes]) -> Dict[bytes, Any]:
+        """
+        Cached values for ``keys``; hits are marked as recently used.
+
+        Args:
+            stage (str): Stage name (e.g. "sentiment").
+            model (str): Model name.
+            version (str): Model version.
+            keys (Sequence[bytes]): Content keys from :func:`content_key`.
+
+        Returns:
+            Dict[bytes, Any]: Key → value for the keys that are cached.
+        """
+        found: Dict[bytes, Any] = {}
+        now = int(time.time())
+        for start in range(0, len(keys), _CHUNK):
+            chunk = list(keys[start:start + _CHUNK])
+            marks = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT hash, value FROM features WHERE stage = ? AND model = ? AND version = ? "
+                f"AND hash IN ({marks})",
+                (stage, model, version, *chunk),
+            ).fetchall()
+            for h, value in rows:
+                found[bytes(h)] = pickle.loads(value)
+            if rows:
+                hit = [h for h, _ in rows]
+                self._write(
+                    f"UPDATE features SET last_used = ? WHERE stage = ? AND model = ? AND version = ? "
+                    f"AND hash IN ({','.join('?' * len(hit))})",
+                    [(now, stage, model, version, *hit)],
+                )
+        return found
+
+    def put_many(self, stage: str, model: str, version: str, items: Dict[bytes, Any]) -> None:
+        """
+        Store values, then evict if the cache has outgrown ``max_entries``.
+
+        Args:
+            stage (str): Stage name.
+            model (str): Model name.
+            version (str): Model version.
+            items (Dict[bytes, Any]): Content key → value.
+        """
+        if not items:
+            return
+        now = int(time.time())
+        self._write(
+            "INSERT OR REPLACE INTO features (stage, model, version, hash, value, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (stage, model, version, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now)
+                for key, value in items.items()
+            ],
+        )
+        self._since_evict += len(items)
+        if self._since_evict >= EVICT_EVERY:
+            self._since_evict = 0
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drop least-recently-used entries down to 90% of ``max_entries``.
+
+        Returns:
+            int: Entries removed.
+        """
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        target = excess + self.max_entries // 10
+        cursor = self._write(
+            "DELETE FROM features WHERE rowid IN "
+            "(SELECT rowid FROM features ORDER BY last_used LIMIT ?)",
+            [(target,)],
+        )
+        logging.info(f"Feature cache {self.path}: evicted {cursor.rowcount:,} entries")
+        return cursor.rowcount
+
+    def invalidate(self, stage: str, keep_version: Optional[str] = None) -> int:
+        """
+        Remove a stage's entries, optionally keeping one version.
+
+        Args:
+            stage (str): Stage name.
+            keep_version (str, optional): Version to keep.
+
+        Returns:
+            int: Entries removed.
+        """
+        if keep_version is None:
+            cursor = self._write("DELETE FROM features WHERE stage = ?", [(stage,)])
+        else:
+            cursor = self._write(
+                "DELETE FROM features WHERE stage = ? AND version != ?", [(stage, keep_version)]
+            )
+        return cursor.rowcount
+
+    # ─── run metrics ─────────────────────────────────────────────────────
+    def record(self, run_id: str, stage: str, rows: int, unique: int, hits: int, computed: int) -> None:
+        """Add one partition's counters to ``run_id``'s totals for ``stage``."""
+        self._write(
+            "INSERT INTO run_stats (run_id, stage, n_rows, unique_texts, hits, computed) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (run_id, stage) DO UPDATE SET "
+            "n_rows = n_rows + excluded.n_rows, unique_texts = unique_texts + excluded.unique_texts, "
+            "hits = hits + excluded.hits, computed = computed + excluded.computed",
+            [(run_id, stage, rows, unique, hits, computed)],
+        )
+
+    def run_stats(self, run_id: str) -> Dict[str, Dict[str, float]]:
+        """
+        Counters and hit rates of one run.
+
+        Args:
+            run_id (str): Run identifier passed to :func:`cached_map`.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Stage → rows, unique_texts, hits, computed,
+            dedup_rate (rows served by an in-partition duplicate) and hit_rate
+            (unique texts served from the cache).
+        """
+        stats = {}
+        for stage, rows, unique, hits, computed in self._conn.execute(
+            "SELECT stage, n_rows, unique_texts, hits, computed FROM run_stats WHERE run_id = ? ORDER BY stage",
+            (run_id,),
+        ):
+            stats[stage] = {
+                "rows": rows,
+                "unique_texts": unique,
+                "hits": hits,
+                "computed": computed,
+                "dedup_rate": round(1 - unique / rows, 4) if rows else 0.0,
+                "hit_rate": round(hits / unique, 4) if unique else 0.0,
+            }
+        return stats
+
+    def _write(self, sql: str, params: List[Tuple]) -> sqlite3.Cursor:
+        # One short IMMEDIATE transaction per call keeps other workers' waits bounded
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self._conn.executemany(sql, params)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return cursor
+
+
+def cached_map(
+    texts: Sequence[str],
+    compute: Callable[[List[str]], Sequence[Any]],
+    stage: str,
+    model: str,
+    version: str,
+    cache: Optional[FeatureCache] = None,
+    run_id: Optional[str] = None,
+) -> List[Any]:
+    """
+    Apply a batch function once per distinct text, reusing cached results.
+
+    Texts are deduplicated on their normalised content before the cache is
+    consulted, so each distinct text costs at most one computation.
+
+    Args:
+        texts (Sequence[str]): Inputs, e.g. a partition's cleaned bodies.
+        compute (Callable): Batch function mapping a list of texts to one result each.
+        stage (str): Stage name used in the key and the metrics.
+        model (str): Model name (the module's ``MODEL_NAME``).
+        version (str): Model version (the module's ``MODEL_VERSION``).
+        cache (FeatureCache, optional): Persistent cache; None only deduplicates.
+        run_id (str, optional): Records the counters under this run when given.
+
+    Returns:
+        List[Any]: One result per input text, in order.
+    """
+    keys = [content_key(t) for t in texts]
+    first: Dict[bytes, int] = {}
+    for i, key in enumerate(keys):
+        first.setdefault(key, i)
+    results = cache.get_many(stage, model, version, list(first)) if cache is not None else {}
+    hits = len(results)
+    todo = [key for key in first if key not in results]
+    if todo:
+        computed = compute([texts[first[key]] for key in todo])
+        fresh = dict(zip(todo, computed))
+        results.update(fresh)
+        if cache is not None:
+            cache.put_many(stage, model, version, fresh)
+    if cache is not None and run_id is not None:
+        cache.record(run_id, stage, len(texts), len(first), hits, len(todo))
+    return [results[key] for key in keys]
@@ -0,0 +1,587 @@
+# nlp_core/index_segments.py
+"""
+Segmented search index that grows without rebuilds.
+
+Every :meth:`SegmentedEmbeddingStore.add` writes a small, immutable segment
+(an id-mapped :class:`EmbeddingStore` labelled with comment keys), typically one
+per day of data. Deletions are tombstones per segment that searches skip with a
+FAISS ``IDSelectorNot``. Segments of similar size are merged (size-tiered) into
+one, dropping tombstoned vectors, either on demand or from a background thread.
+
+Layout under ``root``::
+
+    manifest.json          live segments (replaced atomically on every change)
+    trained.faiss          trained empty index shared by IVF segments
+    segments/seg-000001/   EmbeddingStore.save output + deleted.npy
+
+Readers in other processes (e.g. API workers) pick up new manifests on their
+next search; segment directories are never modified after they are written,
+apart from their tombstone file.
+"""
+
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from nlp_core.embedding_cache import EmbeddingCache
+from nlp_core.embeddings import (
+    INDEX_TYPES,
+    EmbeddingStore,
+    comment_keys,
+    index_description,
+)
+
+MANIFEST_FILE = "manifest.json"
+TEMPLATE_FILE = "trained.faiss"
+DELETED_FILE = "deleted.npy"
+# Segments merge once this many of them share a size tier
+DEFAULT_MERGE_FACTOR = 4
+# Upper bound of the smallest size tier
+DEFAULT_MIN_SEGMENT_ROWS = 10_000
+
+
+class _Segment:
+    """A loaded segment plus its tombstones."""
+
+    def __init__(self, path: str, info: Dict[str, Any]):
+        self.path = path
+        self.info = info
+        self.store = EmbeddingStore.load(path)
+        self.set_deleted(_read_deleted(path))
+
+    @property
+    def name(self) -> str:
+        return self.info["name"]
+
+    @property
+    def live_rows(self) -> int:
+        return self.store.index.ntotal - len(self.deleted)
+
+    def set_deleted(self, deleted: np.ndarray) -> None:
+        self.deleted = deleted
+        if len(deleted):
+            # Keep the inner selector alive as long as the outer one
+            self._batch = faiss.IDSelectorBatch(len(deleted), faiss.swig_ptr(deleted))
+            self.selector: Optional["faiss.IDSelector"] = faiss.IDSelectorNot(self._batch)
+        else:
+            self._batch = None
+            self.selector = None
+
+    def keys(self) -> np.ndarray:
+        return self.store.meta.column("key").to_numpy()
+
+    def live_mask(self) -> np.ndarray:
+        return ~np.isin(self.keys(), self.deleted)
+
+
+def _segment_stats(meta: Optional[pd.DataFrame]) -> Dict[str, Any]:
+    """Subreddits and time range of a segment, used to skip it for filtered searches."""
+    stats: Dict[str, Any] = {"subreddits": None, "min_ts": None, "max_ts": None}
+    if meta is None or not len(meta):
+        return stats
+    if "subreddit" in meta.columns:
+        stats["subreddits"] = sorted({str(s).lower() for s in meta["subreddit"].dropna().unique()})
+    if "created_utc" in meta.columns and meta["created_utc"].notna().any():
+        stats["min_ts"] = int(meta["created_utc"].min())
+        stats["max_ts"] = int(meta["created_utc"].max())
+    return stats
+
+
+def _may_match(
+    info: Dict[str, Any],
+    subreddits: Optional[Sequence[str]],
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+) -> bool:
+    """False only if the segment's stats prove that no row passes the filter."""
+    if subreddits is not None and info.get("subreddits") is not None:
+        if not {s.lower() for s in subreddits} & set(info["subreddits"]):
+            return False
+    if start_ts is not None and info.get("max_ts") is not None and info["max_ts"] < start_ts:
+        return False
+    if end_ts is not None and info.get("min_ts") is not None and info["min_ts"] > end_ts:
+        return False
+    return True
+
+
+def _read_deleted(path: str) -> np.ndarray:
+    file = os.path.join(path, DELETED_FILE)
+    if not os.path.exists(file):
+        return np.empty(0, dtype="int64")
+    return np.load(file)
+
+
+def _write_deleted(path: str, deleted: np.ndarray) -> None:
+    tmp = os.path.join(path, f".{DELETED_FILE}")
+    with open(tmp, "wb") as fh:
+        np.save(fh, deleted)
+    os.replace(tmp, os.path.join(path, DELETED_FILE))
+
+
+class SegmentedEmbeddingStore:
+    """
+    Append-only, segment-per-batch embedding index with deletes and merges.
+
+    Args:
+        root (str): Index directory.
+        model_name (str, optional): Encoder model; required when creating a new index.
+        index_type (str): One of INDEX_TYPES, fixed when the index is created.
+        merge_factor (int): Segments per size tier that trigger a merge.
+        min_segment_rows (int): Upper bound of the smallest size tier.
+        **index_options: See :func:`nlp_core.embeddings.index_description`.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        model_name: Optional[str] = None,
+        index_type: str = "hnsw",
+        merge_factor: int = DEFAULT_MERGE_FACTOR,
+        min_segment_rows: int = DEFAULT_MIN_SEGMENT_ROWS,
+        **index_options: Any,
+    ):
+        self.root = root
+        self.merge_factor = merge_factor
+        self.min_segment_rows = min_segment_rows
+        self._lock = threading.RLock()
+        self._segments: Dict[str, _Segment] = {}
+        self._manifest_mtime = 0.0
+        self._template: Optional["faiss.Index"] = None
+        self._merge_stop: Optional[threading.Event] = None
+        self._merge_thread: Optional[threading.Thread] = None
+
+        if os.path.exists(os.path.join(root, MANIFEST_FILE)):
+            self._load_manifest()
+            if model_name is not None and model_name != self.manifest["model"]:
+                raise ValueError(f"Index at {root} uses model '{self.manifest['model']}'.")
+        else:
+            if model_name is None:
+                raise FileNotFoundError(f"No index at {root}; pass model_name to create one.")
+            if index_type not in INDEX_TYPES:
+                raise ValueError(f"Unknown index type '{index_type}'; available: {INDEX_TYPES}")
+            os.makedirs(os.path.join(root, "segments"), exist_ok=True)
+            self.manifest = {
+                "model": model_name,
+                "index_type": index_type,
+                "index_options": index_options,
+                "description": None,
+                "next_seq": 1,
+                "segments": [],
+            }
+            self._save_manifest()
+        self._query_store = EmbeddingStore(self.manifest["model"])
+
+    # ─── properties ──────────────────────────────────────────────────────
+    @property
+    def model_name(self) -> str:
+        return self.manifest["model"]
+
+    @property
+    def index_type(self) -> str:
+        return self.manifest["index_type"]
+
+    @property
+    def is_trained(self) -> bool:
+        return self.index_type == "hnsw" or os.path.exists(os.path.join(self.root, TEMPLATE_FILE))
+
+    @property
+    def generation(self) -> float:
+        """Changes whenever the live segments or tombstones change (for result caches)."""
+        self.refresh()
+        return self._manifest_mtime
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Manifest entries of the live segments, oldest first."""
+        self.refresh()
+        return [dict(info) for info in self.manifest["segments"]]
+
+    def __len__(self) -> int:
+        return sum(seg.live_rows for seg in self._loaded())
+
+    # ─── writes ──────────────────────────────────────────────────────────
+    def train(self, vectors: np.ndarray) -> None:
+        """
+        Train the shared IVF quantiser once; every segment clones it. No-op for HNSW.
+
+        Args:
+            vectors (np.ndarray): Representative sample of the corpus.
+        """
+        if self.index_type == "hnsw":
+            return
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        faiss.normalize_L2(vectors)
+        options = dict(self.manifest["index_options"])
+        n_expected = options.pop("n_vectors", None) or 50 * len(vectors)
+        description = index_description(self.index_type, vectors.shape[1], n_expected, **options)
+        template = faiss.index_factory(vectors.shape[1], description, faiss.METRIC_INNER_PRODUCT)
+        logging.info(f"Training {description} on {len(vectors):,} vectors")
+        template.train(vectors)
+        faiss.write_index(template, os.path.join(self.root, TEMPLATE_FILE))
+        with self._lock:
+            self._template = template
+            self.manifest["description"] = description
+            self._save_manifest()
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        meta: Optional[pd.DataFrame] = None,
+        label: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Make ``ids`` searchable as a new segment.
+
+        Older copies of the same ids are tombstoned, so re-adding an id replaces it.
+
+        Args:
+            ids (Sequence[str]): Comment ids.
+            vectors (np.ndarray): Their embeddings.
+            meta (pd.DataFrame, optional): Row metadata indexed by comment id.
+            label (str, optional): Free-form segment label, e.g. the day it holds.
+
+        Returns:
+            str: Name of the new segment, or None if ``ids`` is empty.
+
+        Raises:
+            RuntimeError: If an IVF index has not been trained yet.
+        """
+        if not len(ids):
+            return None
+        if not self.is_trained:
+            raise RuntimeError("Call train() before adding to an IVF index.")
+        with self._lock:
+            name = f"seg-{self.manifest['next_seq']:06d}"
+            self.manifest["next_seq"] += 1
+        path = os.path.join(self.root, "segments", name)
+        self._build_segment(path, list(ids), vectors, meta)
+        with self._lock:
+            self.remove(ids)
+            info = {"name": name, "label": label, "rows": len(ids), "deleted": 0, "created": time.time(),
+                    **_segment_stats(meta)}
+            self.manifest["segments"].append(info)
+            self._save_manifest()
+        logging.info(f"Index segment {name} ({label}): {len(ids):,} vectors")
+        return name
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """
+        Tombstone ``ids`` in every segment holding them.
+
+        Args:
+            ids (Sequence[str]): Comment ids.
+
+        Returns:
+            int: Number of vectors removed.
+        """
+        keys = np.unique(comment_keys(list(ids)))
+        removed = 0
+        with self._lock:
+            for seg in self._loaded():
+                hits = keys[seg.store.rows_for(keys) >= 0]
+                hits = hits[~np.isin(hits, seg.deleted)]
+                if not len(hits):
+                    continue
+                deleted = np.union1d(seg.deleted, hits).astype("int64")
+                _write_deleted(seg.path, deleted)
+                seg.set_deleted(deleted)
+                seg.info["deleted"] = len(deleted)
+                removed += len(hits)
+            if removed:
+                self._save_manifest()
+        return removed
+
+    def contains(self, ids: Sequence[str]) -> np.ndarray:
+        """Boolean mask of the ids that are live in the index."""
+        keys = comment_keys(list(ids))
+        found = np.zeros(len(keys), dtype=bool)
+        for seg in self._loaded():
+            found |= (seg.store.rows_for(keys) >= 0) & ~np.isin(keys, seg.deleted)
+        return found
+
+    def ids(self) -> List[str]:
+        """Every live comment id."""
+        out: List[str] = []
+        for seg in self._loaded():
+            ids = seg.store.meta.column("id").to_numpy(zero_copy_only=False)
+            out.extend(ids[seg.live_mask()].tolist())
+        return out
+
+    # ─── merging ─────────────────────────────────────────────────────────
+    def merge_candidates(self) -> List[List[str]]:
+        """
+        Groups of segments to merge under the size-tiered policy.
+
+        Segments are bucketed by live size into tiers that grow by
+        ``merge_factor``; any tier holding ``merge_factor`` segments yields its
+        oldest ``merge_factor`` segments as one group.
+        """
+        tiers: Dict[int, List[str]] = {}
+        for seg in self._loaded():
+            rows = max(seg.live_rows, 1)
+            tier = 0 if rows <= self.min_segment_rows else \
+                1 + int(math.log(rows / self.min_segment_rows, self.merge_factor))
+            tiers.setdefault(tier, []).append(seg.name)
+        return [names[:self.merge_factor] for _, names in sorted(tiers.items())
+                if len(names) >= self.merge_factor]
+
+    def maybe_merge(self, cache: Optional[EmbeddingCache] = None) -> int:
+        """
+        Merge until no size tier is full.
+
+        Args:
+            cache (EmbeddingCache, optional): Source of exact vectors; without it
+                vectors are reconstructed from the segments (approximate for PQ).
+
+        Returns:
+            int: Number of merges performed.
+        """
+        merges = 0
+        while True:
+            groups = self.merge_candidates()
+            if not groups:
+                return merges
+            self.merge(groups[0], cache)
+            merges += 1
+
+    def merge(self, names: Sequence[str], cache: Optional[EmbeddingCache] = None) -> str:
+        """
+        Replace segments ``names`` by one segment holding their live vectors.
+
+        Args:
+            names (Sequence[str]): Segments to merge.
+            cache (EmbeddingCache, optional): Source of exact vectors.
+
+        Returns:
+            str: Name of the merged segment.
+        """
+        with self._lock:
+            segs = [self._segment(info) for info in self.manifest["segments"] if info["name"] in names]
+            snapshot = {seg.name: seg.deleted for seg in segs}
+            name = f"seg-{self.manifest['next_seq']:06d}"
+            self.manifest["next_seq"] += 1
+
+        # Build outside the lock so adds, removes and searches carry on meanwhile
+        frames, vectors = [], []
+        for seg in segs:
+            mask = seg.live_mask()
+            meta = seg.store.meta.filter(pa.array(mask)).to_pandas()
+            frames.append(meta)
+            if cache is not None:
+                vectors.append(cache.get(meta["id"].tolist()))
+            else:
+                vectors.append(seg.store.vectors_for(meta["key"].to_numpy()))
+        meta = pd.concat(frames, ignore_index=True).drop(columns=["key"]).set_index("id")
+        path = os.path.join(self.root, "segments", name)
+        self._build_segment(path, meta.index.tolist(), np.vstack(vectors), meta)
+        labels = [seg.info.get("label") for seg in segs]
+        label = labels[0] if len(set(labels)) == 1 else f"{min(map(str, labels))}..{max(map(str, labels))}"
+
+        with self._lock:
+            # Carry over tombstones written while the merge was running
+            late = [np.setdiff1d(seg.deleted, snapshot[seg.name]) for seg in segs]
+            late_keys = np.unique(np.concatenate(late)) if late else np.empty(0, dtype="int64")
+            if len(late_keys):
+                _write_deleted(path, late_keys.astype("int64"))
+            position = min(i for i, info in enumerate(self.manifest["segments"]) if info["name"] in names)
+            info = {"name": name, "label": label, "rows": len(meta), "deleted": int(len(late_keys)),
+                    "created": time.time(), **_segment_stats(meta)}
+            kept = [i for i in self.manifest["segments"] if i["name"] not in names]
+            kept.insert(position, info)
+            self.manifest["segments"] = kept
+            self._save_manifest()
+            for seg in segs:
+                self._segments.pop(seg.name, None)
+                # Readers that still map the old files keep working until they refresh
+                shutil.rmtree(seg.path, ignore_errors=True)
+        logging.info(f"Merged {len(segs)} index segments into {name} ({len(meta):,} vectors)")
+        return name
+
+    def start_background_merges(
+        self,
+        interval_s: float = 30.0,
+        cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        """Run :meth:`maybe_merge` every ``interval_s`` seconds in a daemon thread."""
+        if self._merge_thread is not None:
+            return
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval_s):
+                try:
+                    self.maybe_merge(cache)
+                except Exception as e:
+                    logging.warning(f"Background index merge failed: {e}")
+
+        self._merge_stop = stop
+        self._merge_thread = threading.Thread(target=loop, name="index-merger", daemon=True)
+        self._merge_thread.start()
+
+    def stop_background_merges(self) -> None:
+        if self._merge_thread is None:
+            return
+        self._merge_stop.set()
+        self._merge_thread.join()
+        self._merge_thread = self._merge_stop = None
+
+    # ─── search ──────────────────────────────────────────────────────────
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        return self._query_store.encode_queries(queries)
+
+    def search_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search every segment and keep the global top ``k``.
+
+        With a filter, segments whose subreddits or time range cannot match are
+        skipped, and the rest are searched with an id selector built from their
+        metadata (see :meth:`EmbeddingStore.search_vectors`).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Scores and comment keys, -1 where fewer than k hits.
+        """
+        n = len(vectors)
+        scores = [np.full((n, k), -np.inf, dtype="float32")]
+        labels = [np.full((n, k), -1, dtype="int64")]
+        filtered = subreddits is not None or start_ts is not None or end_ts is not None
+        for seg in self._loaded():
+            if filtered and not _may_match(seg.info, subreddits, start_ts, end_ts):
+                continue
+            D, L = seg.store.search_vectors(
+                vectors, k, nprobe, ef_search, sel=seg.selector,
+                subreddits=subreddits, start_ts=start_ts, end_ts=end_ts, exclude=seg.deleted,
+            )
+            scores.append(np.where(L >= 0, D, -np.inf).astype("float32"))
+            labels.append(L)
+        D, L = np.hstack(scores), np.hstack(labels)
+        top = np.argsort(-D, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(D, top, axis=1), np.take_along_axis(L, top, axis=1)
+
+    def resolve(self, scores: np.ndarray, labels: np.ndarray) -> List[Dict]:
+        """Turn one row of results into hit dicts (id, score, metadata)."""
+        labels = np.asarray(labels, dtype="int64")
+        hits: List[Optional[Dict]] = [None] * len(labels)
+        for seg in reversed(self._loaded()):
+            todo = [i for i, hit in enumerate(hits) if hit is None and labels[i] >= 0]
+            if not todo:
+                break
+            keys = labels[todo]
+            rows = seg.store.rows_for(keys)
+            for i, row, key in zip(todo, rows, keys):
+                if row >= 0 and key not in seg.deleted:
+                    hits[i] = seg.store.resolve(scores[i:i + 1], labels[i:i + 1])[0]
+        return [hit for hit in hits if hit is not None]
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> List[Dict]:
+        """See :meth:`EmbeddingStore.search`."""
+        D, L = self.search_vectors(
+            self.encode_queries([query]), k, nprobe, ef_search,
+            subreddits=subreddits, start_ts=start_ts, end_ts=end_ts,
+        )
+        return self.resolve(D[0], L[0])
+
+    # ─── internals ───────────────────────────────────────────────────────
+    def refresh(self) -> None:
+        """Reload the manifest if another process changed it."""
+        try:
+            mtime = os.stat(os.path.join(self.root, MANIFEST_FILE)).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._manifest_mtime:
+            with self._lock:
+                self._load_manifest()
+
+    def _loaded(self) -> List[_Segment]:
+        self.refresh()
+        with self._lock:
+            return [self._segment(info) for info in self.manifest["segments"]]
+
+    def _segment(self, info: Dict[str, Any]) -> _Segment:
+        seg = self._segments.get(info["name"])
+        if seg is None:
+            seg = _Segment(os.path.join(self.root, "segments", info["name"]), info)
+            self._segments[info["name"]] = seg
+        elif seg.info.get("deleted") != info.get("deleted"):
+            seg.set_deleted(_read_deleted(seg.path))
+        seg.info = info
+        return seg
+
+    def _template_index(self) -> Optional["faiss.Index"]:
+        if self.index_type == "hnsw":
+            return None
+        if self._template is None:
+            self._template = faiss.read_index(os.path.join(self.root, TEMPLATE_FILE))
+        return self._template
+
+    def _build_segment(
+        self,
+        path: str,
+        ids: List[str],
+        vectors: np.ndarray,
+        meta: Optional[pd.DataFrame],
+    ) -> None:
+        store = EmbeddingStore(self.model_name)
+        options = {k: v for k, v in self.manifest["index_options"].items() if k != "n_vectors"}
+        store.build_from_batches(
+            [(ids, vectors)],
+            self.index_type,
+            meta=meta,
+            base_index=self._template_index(),
+            id_map=True,
+            description=self.manifest.get("description"),
+            **({} if self.index_type != "hnsw" else options),
+        )
+        store.save(path)
+
+    def _load_manifest(self) -> None:
+        path = os.path.join(self.root, MANIFEST_FILE)
+        self._manifest_mtime = os.stat(path).st_mtime
+        with open(path, "r", encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        live = {info["name"] for info in self.manifest["segments"]}
+        for name in list(self._segments):
+            if name not in live:
+                del self._segments[name]
+
+    def _save_manifest(self) -> None:
+        path = os.path.join(self.root, MANIFEST_FILE)
+        tmp = os.path.join(self.root, f".{MANIFEST_FILE}.{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.manifest, fh, indent=1)
+        os.replace(tmp, path)
+        self._manifest_mtime = os.stat(path).st_mtime
+
+
+def load_store(path: str) -> Union[EmbeddingStore, SegmentedEmbeddingStore]:
+    """Open a segmented index, or a single :meth:`EmbeddingStore.save` directory."""
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        return SegmentedEmbeddingStore(path)
+    return EmbeddingStore.load(path)
@@ -2,24 +2,203 @@
 
 import os
 import io
+import re
 import json
+import time
+import queue
+import logging
+import calendar
 import datetime
-from typing import List, Optional
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import zstandard as zstd
 import pyarrow as pa
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 
+from nlp_core import metrics
+
+# Decompressed bytes handed to a worker per task in parallel mode
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Rows per compacted file; each compacted file is written as a single row group
+DEFAULT_COMPACT_ROWS = 1_000_000
+
+# Dataset summary file written by compact_dataset()
+METADATA_FILE = "_metadata"
+
+# Per-partition record of an in-progress compaction: staged files and the
+# originals they replace, so an interrupted compaction can be finished
+COMPACT_JOURNAL = ".compacting.json"
+
+# Ingest checkpoint kept next to the chunks in the output directory
+MANIFEST_FILE = "_ingest_manifest.json"
+
+logger = logging.getLogger(__name__)
+
+# ─── Raw comment schema ──────────────────────────────────────────────────
+# Bump COMMENT_SCHEMA_VERSION whenever a field is added, removed or retyped.
+COMMENT_SCHEMA_VERSION = 1
+COMMENT_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("name", pa.string()),
+        ("link_id", pa.string()),
+        ("parent_id", pa.string()),
+        ("author", pa.string()),
+        ("author_fullname", pa.string()),
+        ("author_flair_text", pa.string()),
+        ("subreddit", pa.string()),
+        ("subreddit_id", pa.string()),
+        ("subreddit_type", pa.string()),
+        ("body", pa.string()),
+        ("score", pa.int64()),
+        ("ups", pa.int64()),
+        ("downs", pa.int64()),
+        ("controversiality", pa.int64()),
+        ("gilded", pa.int64()),
+        ("total_awards_received", pa.int64()),
+        ("created_utc", pa.int64()),
+        ("retrieved_on", pa.int64()),
+        ("edited", pa.int64()),
+        ("distinguished", pa.string()),
+        ("stickied", pa.bool_()),
+        ("is_submitter", pa.bool_()),
+        ("locked", pa.bool_()),
+        ("archived", pa.bool_()),
+        ("collapsed", pa.bool_()),
+        ("score_hidden", pa.bool_()),
+        ("permalink", pa.string()),
+    ],
+    metadata={"comment_schema_version": str(COMMENT_SCHEMA_VERSION)},
+)
+
+# Fields kept when no explicit allow-list is given
+DEFAULT_COLUMNS: Tuple[str, ...] = (
+    "id",
+    "link_id",
+    "parent_id",
+    "author",
+    "subreddit",
+    "body",
+    "score",
+    "controversiality",
+    "created_utc",
+    "edited",
+    "distinguished",
+    "stickied",
+    "is_submitter",
+    "permalink",
+)
+
+# Always written: needed for partitioning and the date filter
+REQUIRED_COLUMNS: Tuple[str, ...] = ("subreddit", "created_utc")
+
+# Raw-byte field scanners used by LinePrefilter. Escaped subreddit values are
+# captured too so the filter can fall back to a full parse for them.
+_SUBREDDIT_RE = re.compile(rb'"subreddit"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_CREATED_UTC_RE = re.compile(rb'"created_utc"\s*:\s*"?(-?\d+)(?:\.\d*)?(?![\d.eE])')
+
+
+class LinePrefilter:
+    """
+    Cheap byte-level rejection test run on raw dump lines before ``json.loads``.
+
+    The filter only ever rejects lines that the full subreddit/date filter would
+    also drop: a line is kept whenever a field is missing, escaped or written in
+    an unexpected shape, and the full parse then decides.
+
+    Args:
+        subs (Iterable[str], optional): Subreddit names to keep. If None, no subreddit check.
+        ts_min (int, optional): Minimum ``created_utc`` (epoch seconds, inclusive).
+        ts_max (int, optional): Maximum ``created_utc`` (epoch seconds, inclusive).
+    """
+
+    def __init__(
+        self,
+        subs: Optional[Iterable[str]] = None,
+        ts_min: Optional[int] = None,
+        ts_max: Optional[int] = None,
+    ):
+        self.subs = frozenset(s.encode("utf-8") for s in subs) if subs else None
+        self.ts_min = ts_min
+        self.ts_max = ts_max
+
+    @classmethod
+    def for_dates(
+        cls,
+        subs: Optional[Iterable[str]] = None,
+        dt_min: Optional[datetime.date] = None,
+        dt_max: Optional[datetime.date] = None,
+    ) -> "LinePrefilter":
+        """Build a prefilter for an inclusive UTC calendar-date window."""
+        ts_min = calendar.timegm(dt_min.timetuple()) if dt_min else None
+        ts_max = (
+            calendar.timegm((dt_max + datetime.timedelta(days=1)).timetuple()) - 1
+            if dt_max else None
+        )
+        return cls(subs, ts_min, ts_max)
+
+    @property
+    def active(self) -> bool:
+        return self.subs is not None or self.ts_min is not None or self.ts_max is not None
+
+    def __call__(self, line: bytes) -> bool:
+        """Return False if the line can be skipped without decoding it."""
+        if self.subs is not None:
+            values = _SUBREDDIT_RE.findall(line)
+            if values and not any(v in self.subs or b"\\" in v for v in values):
+                return False
+        if self.ts_min is not None or self.ts_max is not None:
+            stamps = _CREATED_UTC_RE.findall(line)
+            if stamps and not any(self._in_window(int(ts)) for ts in stamps):
+                return False
+        return True
+
+    def _in_window(self, ts: int) -> bool:
+        if self.ts_min is not None and ts < self.ts_min:
+            return False
+        if self.ts_max is not None and ts > self.ts_max:
+            return False
+        return True
+
+
 def zst_to_parquet(
     zst_path: str,
     output_dir: str,
     subs: Optional[List[str]] = None,
     date_min: Optional[str] = None,   # format: "YYYY-MM-DD"
     date_max: Optional[str] = None,   # format: "YYYY-MM-DD"
-    chunk_size: int = 10000
-) -> None:
+    chunk_size: int = 10000,
+    workers: int = 1,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    prefilter: bool = True,
+    columns: Optional[Sequence[str]] = None,
+    compact: bool = False,
+    resume: bool = True,
+) -> Optional[Dict[str, Any]]:
     """
     Decompress a Zstandard .zst Reddit comments dump and write to partitioned Parquet dataset.
 
+    With ``workers > 1`` a reader thread splits the decompressed stream into
+    newline-aligned blocks and a process pool parses, filters and converts them
+    to Arrow tables. Blocks are written back in stream order and re-sliced into
+    ``chunk_size`` rows, so the dataset matches the single-process output.
+
+    Unless ``prefilter`` is False, lines are first screened with a
+    :class:`LinePrefilter` so only candidate comments are JSON-decoded.
+
+    Records are projected onto :data:`COMMENT_SCHEMA` column by column, so every
+    chunk is written with the same declared types and no schema inference.
+
+    Progress is checkpointed in ``output_dir/_ingest_manifest.json`` after every
+    chunk. Chunk files have deterministic names, so a re-run after a failure
+    resumes after the last committed chunk and overwrites any partial one, and a
+    re-run of a finished ingest with the same inputs is skipped.
+
     Args:
         zst_path (str): Path to the input .zst file.
         output_dir (str): Root directory for output Parquet files.
@@ -27,80 +206,829 @@ def zst_to_parquet(
         date_min (str, optional): Minimum date ("YYYY-MM-DD") to include.
         date_max (str, optional): Maximum date ("YYYY-MM-DD") to include.
         chunk_size (int): Number of records to process per chunk.
+        workers (int): Number of parser processes. 1 keeps everything in-process.
+        block_size (int): Approximate decompressed bytes per block in parallel mode.
+        prefilter (bool): Skip lines on a raw-byte subreddit/created_utc scan before decoding.
+        columns (Sequence[str], optional): Fields of COMMENT_SCHEMA to keep. Defaults to
+            DEFAULT_COLUMNS; REQUIRED_COLUMNS are always added.
+        compact (bool): Run :func:`compact_dataset` on output_dir once all chunks are written.
+        resume (bool): Continue from an existing manifest. If False, remove the
+            dataset files of an earlier ingest into output_dir and start from byte zero.
+    Returns:
+        Optional[Dict[str, Any]]: The compaction report if ``compact`` is set, else None.
     Raises:
         FileNotFoundError: If the input file does not exist.
-        ValueError: If output_dir is empty or not writable.
+        ValueError: If output_dir is empty or not writable, columns names unknown fields,
+            or the manifest in output_dir belongs to a different dump or filter.
+        IngestError: If conversion fails; completed chunks stay committed for a resume.
     """
     if not os.path.isfile(zst_path):
         raise FileNotFoundError(f"Input file not found: {zst_path}")
     if not output_dir:
         raise ValueError("Output directory must be a non-empty string.")
+    if workers < 1:
+        raise ValueError("workers must be >= 1.")
+    columns = resolve_columns(columns)
     os.makedirs(output_dir, exist_ok=True)
+    if not resume:
+        # Chunks written from byte zero must not land next to an earlier
+        # ingest's (possibly compacted) files, or every row would be read twice
+        _clear_dataset(output_dir)
+
+    checkpoint = IngestCheckpoint.open(
+        output_dir,
+        zst_path,
+        params={
+            "subs": sorted(subs) if subs else None,
+            "date_min": date_min,
+            "date_max": date_max,
+            "columns": columns,
+            "chunk_size": chunk_size,
+            "schema_version": COMMENT_SCHEMA_VERSION,
+        },
+        resume=resume,
+    )
+    if checkpoint.complete:
+        logger.info(f"{zst_path} already ingested into {output_dir}; skipping.")
+        if compact and not checkpoint.compacted:
+            report = compact_dataset(output_dir)
+            checkpoint.mark_compacted()
+            return report
+        return None
+    if checkpoint.lines:
+        logger.info(
+            f"Resuming {zst_path} after {checkpoint.lines:,} lines "
+            f"({checkpoint.chunks} chunks committed)"
+        )
 
     # Prepare date boundaries
     dt_min = datetime.date.fromisoformat(date_min) if date_min else None
     dt_max = datetime.date.fromisoformat(date_max) if date_max else None
+    line_filter = LinePrefilter.for_dates(subs, dt_min, dt_max) if prefilter else None
+    if line_filter is not None and not line_filter.active:
+        line_filter = None
+    # A stale summary file would hide the chunks written below from readers
+    metadata_path = os.path.join(output_dir, METADATA_FILE)
+    if os.path.exists(metadata_path):
+        os.remove(metadata_path)
 
-    dctx = zstd.ZstdDecompressor()
-    records = []
     try:
-        with open(zst_path, 'rb') as fh:
-            stream = dctx.stream_reader(fh)
-            text_stream = io.TextIOWrapper(stream, encoding='utf-8')
-            for line in text_stream:
-                try:
-                    data = json.loads(line)
-                    
-                except json.JSONDecodeError:
-                    continue
-                 # ─── QUICK FIX: normalise the “edited” field ──────────────────────
-                edited_val = data.get("edited")
-                if isinstance(edited_val, bool):          # False → never edited
-                    data["edited"] = None                 # use None instead of False
-    # ──────────────────────────────────────────────────────────────────
-
-                subreddit = data.get("subreddit")
-                if subs and subreddit not in subs:
-                    continue
-                created = data.get("created_utc")
-                if created is None:
-                    continue
-                # Convert epoch to date string for partitioning and filtering
-                date_str = datetime.datetime.utcfromtimestamp(created).strftime("%Y-%m-%d")
-                date_obj = datetime.date.fromisoformat(date_str)
-                if (dt_min and date_obj < dt_min) or (dt_max and date_obj > dt_max):
-                    continue
-                data["_date"] = date_str
-                records.append(data)
-
-                if len(records) >= chunk_size:
-                    _write_parquet_chunk(records, output_dir)
-                    records = []
-            if records:
-                _write_parquet_chunk(records, output_dir)
+        if workers > 1:
+            _convert_parallel(
+                zst_path, output_dir, subs, dt_min, dt_max, chunk_size, workers, block_size,
+                line_filter, columns, checkpoint,
+            )
+        else:
+            _convert_sequential(
+                zst_path, output_dir, subs, dt_min, dt_max, chunk_size, line_filter, columns,
+                checkpoint,
+            )
     except Exception as e:
-        raise RuntimeError(f"Error during ZST to Parquet conversion: {e}")
-import pyarrow.types as pat
-def _write_parquet_chunk(records: list[dict], output_dir: str) -> None:
+        raise IngestError(
+            f"Error during ZST to Parquet conversion after {checkpoint.lines:,} committed "
+            f"lines ({checkpoint.path}); re-run to resume: {e}",
+            checkpoint,
+        ) from e
+
+    if compact:
+        report = compact_dataset(output_dir)
+        checkpoint.mark_compacted()
+        return report
+    return None
+
+
+class IngestError(RuntimeError):
+    """Raised when an ingest fails; ``lines``/``offset`` describe the last committed chunk."""
+
+    def __init__(self, message: str, checkpoint: "IngestCheckpoint"):
+        super().__init__(message)
+        self.manifest_path = checkpoint.path
+        self.lines = checkpoint.lines
+        self.offset = checkpoint.offset
+
+
+class IngestCheckpoint:
+    """
+    Manifest of committed ingest progress, stored as ``_ingest_manifest.json`` in the output dir.
+
+    The manifest records the source fingerprint, the filter parameters, and after
+    every flushed chunk the number of chunks, the decompressed byte offset and the
+    line count consumed so far, plus the compressed-file position at that point.
+    Zstd dumps are a single frame and cannot be entered mid-stream, so a resume
+    decompresses up to ``offset`` without parsing and continues from there.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, state: Dict[str, Any]):
+        self.path = path
+        self.state = state
+        self._mark = (time.perf_counter(), state["lines"], state["offset"], state["compressed_offset"])
+
+    @classmethod
+    def open(
+        cls,
+        output_dir: str,
+        zst_path: str,
+        params: Dict[str, Any],
+        resume: bool = True,
+    ) -> "IngestCheckpoint":
+        """
+        Load the manifest for ``zst_path`` or start a new one.
+
+        Raises:
+            ValueError: If an existing manifest was written for another dump or other
+                parameters; its chunk files would otherwise be mixed with new ones.
+        """
+        path = os.path.join(output_dir, MANIFEST_FILE)
+        stat = os.stat(zst_path)
+        source = {
+            "path": os.path.abspath(zst_path),
+            "size": stat.st_size,
+            "mtime": int(stat.st_mtime),
+        }
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                state = json.load(fh)
+            if state.get("version") != cls.VERSION or state.get("params") != params:
+                raise ValueError(
+                    f"{path} was written with different ingest parameters; "
+                    "use an empty output directory or resume=False."
+                )
+            if {k: state["source"].get(k) for k in ("size", "mtime")} != {
+                k: source[k] for k in ("size", "mtime")
+            }:
+                raise ValueError(
+                    f"{path} belongs to a different dump than {zst_path}; "
+                    "use an empty output directory or resume=False."
+                )
+            return cls(path, state)
+
+        checkpoint = cls(path, {
+            "version": cls.VERSION,
+            "source": source,
+            "params": params,
+            "status": "running",
+            "compacted": False,
+            "chunks": 0,
+            "lines": 0,
+            "offset": 0,
+            "compressed_offset": 0,
+        })
+        checkpoint._save()
+        return checkpoint
+
+    @property
+    def complete(self) -> bool:
+        return self.state["status"] == "complete"
+
+    @property
+    def compacted(self) -> bool:
+        return bool(self.state.get("compacted"))
+
+    @property
+    def chunks(self) -> int:
+        return self.state["chunks"]
+
+    @property
+    def lines(self) -> int:
+        return self.state["lines"]
+
+    @property
+    def offset(self) -> int:
+        return self.state["offset"]
+
+    def commit(self, lines: int, offset: int, compressed_offset: int) -> None:
+        """Record that one more chunk, covering input up to ``offset``, is on disk."""
+        self.state.update(
+            chunks=self.chunks + 1,
+            lines=lines,
+            offset=offset,
+            compressed_offset=compressed_offset,
+        )
+        self._save()
+        self._record_throughput(lines, offset, compressed_offset)
+
+    def _record_throughput(self, lines: int, offset: int, compressed_offset: int) -> None:
+        # Lines and bytes consumed since the previous commit, as an "ingest.chunk" metric
+        now = time.perf_counter()
+        then, lines0, offset0, compressed0 = self._mark
+        self._mark = (now, lines, offset, compressed_offset)
+        wall = now - then
+        rec = metrics.record(
+            "ingest.chunk",
+            wall_s=wall,
+            rows=lines - lines0,
+            bytes=offset - offset0,
+            compressed_bytes=compressed_offset - compressed0,
+        )
+        if wall > 0:
+            logger.debug(
+                f"Chunk {self.chunks}: {rec['rows'] / wall:,.0f} lines/s, "
+                f"{rec['bytes'] / wall / 2**20:.1f} MiB/s decompressed, "
+                f"{rec['compressed_bytes'] / wall / 2**20:.1f} MiB/s compressed"
+            )
+
+    def finish(self, lines: int, offset: int, compressed_offset: int) -> None:
+        self.state.update(
+            status="complete", lines=lines, offset=offset, compressed_offset=compressed_offset
+        )
+        self._save()
+
+    def mark_compacted(self) -> None:
+        self.state["compacted"] = True
+        self._save()
+
+    def _save(self) -> None:
+        self.state["updated_at"] = datetime.datetime.utcnow().isoformat(timespec="seconds")
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.state, fh, indent=2)
+        os.replace(tmp, self.path)
+
+
+def resolve_columns(columns: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Validate a column allow-list against COMMENT_SCHEMA.
+
+    Args:
+        columns (Sequence[str], optional): Requested fields. None selects DEFAULT_COLUMNS.
+
+    Returns:
+        List[str]: Fields in schema order, including REQUIRED_COLUMNS.
+
+    Raises:
+        ValueError: If a requested field is not part of COMMENT_SCHEMA.
+    """
+    wanted = set(columns if columns is not None else DEFAULT_COLUMNS) | set(REQUIRED_COLUMNS)
+    unknown = sorted(wanted - set(COMMENT_SCHEMA.names))
+    if unknown:
+        raise ValueError(
+            f"Unknown comment columns {unknown}; available: {COMMENT_SCHEMA.names}"
+        )
+    return [name for name in COMMENT_SCHEMA.names if name in wanted]
+
+
+def _open_stream(fh, offset: int = 0):
+    """Zstd reader positioned at decompressed ``offset`` (skipped bytes are not parsed)."""
+    stream = zstd.ZstdDecompressor().stream_reader(fh)
+    if offset:
+        stream.seek(offset)
+    return stream
+
+
+def _convert_sequential(
+    zst_path: str,
+    output_dir: str,
+    subs: Optional[List[str]],
+    dt_min: Optional[datetime.date],
+    dt_max: Optional[datetime.date],
+    chunk_size: int,
+    line_filter: Optional[LinePrefilter],
+    columns: List[str],
+    checkpoint: "IngestCheckpoint",
+) -> None:
+    builder = _CommentTableBuilder(columns)
+    lines, offset = checkpoint.lines, checkpoint.offset
+    with open(zst_path, 'rb') as fh:
+        line_stream = io.BufferedReader(_open_stream(fh, offset))
+        for line in line_stream:
+            lines += 1
+            offset += len(line)
+            if line_filter is not None and not line_filter(line):
+                continue
+            parsed = _parse_record(line, subs, dt_min, dt_max)
+            if parsed is None:
+                continue
+            builder.append(*parsed)
+
+            if len(builder) >= chunk_size:
+                _write_table(builder.finish(), output_dir, checkpoint.chunks)
+                checkpoint.commit(lines, offset, fh.tell())
+        if len(builder):
+            _write_table(builder.finish(), output_dir, checkpoint.chunks)
+            checkpoint.commit(lines, offset, fh.tell())
+        checkpoint.finish(lines, offset, fh.tell())
+
+
+def _convert_parallel(
+    zst_path: str,
+    output_dir: str,
+    subs: Optional[List[str]],
+    dt_min: Optional[datetime.date],
+    dt_max: Optional[datetime.date],
+    chunk_size: int,
+    workers: int,
+    block_size: int,
+    line_filter: Optional[LinePrefilter],
+    columns: List[str],
+    checkpoint: "IngestCheckpoint",
+) -> None:
+    reader = _BlockReader(
+        zst_path, block_size, max_pending=2 * workers,
+        start_offset=checkpoint.offset, start_line=checkpoint.lines,
+    )
+    reader.start()
+    pending: deque = deque()
+    buffered: List[pa.Table] = []
+    # (lines consumed, stream offset) just past each buffered row's source line
+    positions: List[Tuple[int, int]] = []
+    lines, offset, compressed = checkpoint.lines, checkpoint.offset, 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            blocks = reader.blocks()
+            exhausted = False
+            while pending or not exhausted:
+                # Keep a bounded number of blocks in flight, results stay in stream order
+                while not exhausted and len(pending) < 2 * workers:
+                    item = next(blocks, None)
+                    if item is None:
+                        exhausted = True
+                    else:
+                        block, block_offset, block_line, block_compressed = item
+                        pending.append((block_compressed, pool.submit(
+                            _parse_block, block, block_offset, block_line,
+                            subs, dt_min, dt_max, line_filter, columns,
+                        )))
+                if not pending:
+                    break
+                compressed, future = pending.popleft()
+                table, block_positions, (lines, offset) = future.result()
+                if table is not None:
+                    buffered.append(table)
+                    positions.extend(block_positions)
+                while len(positions) >= chunk_size:
+                    merged = pa.concat_tables(buffered)
+                    _write_table(merged.slice(0, chunk_size), output_dir, checkpoint.chunks)
+                    checkpoint.commit(*positions[chunk_size - 1], compressed)
+                    rest = merged.slice(chunk_size)
+                    buffered = [rest] if rest.num_rows else []
+                    positions = positions[chunk_size:]
+            if positions:
+                _write_table(pa.concat_tables(buffered), output_dir, checkpoint.chunks)
+                checkpoint.commit(lines, offset, compressed)
+            checkpoint.finish(lines, offset, compressed)
+    finally:
+        reader.stop()
+
+
+class _BlockReader(threading.Thread):
+    """
+    Background thread feeding newline-aligned decompressed blocks into a bounded queue.
+
+    Each item is ``(block, stream offset, lines before block, compressed bytes read)``.
+    """
+
+    _DONE = object()
+
+    def __init__(
+        self,
+        zst_path: str,
+        block_size: int,
+        max_pending: int,
+        start_offset: int = 0,
+        start_line: int = 0,
+    ):
+        super().__init__(daemon=True)
+        self.zst_path = zst_path
+        self.block_size = block_size
+        self.start_offset = start_offset
+        self.start_line = start_line
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._stop_event = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            offset, line_no = self.start_offset, self.start_line
+            with open(self.zst_path, 'rb') as fh:
+                for block in _iter_blocks(_open_stream(fh, offset), self.block_size):
+                    if not self._put((block, offset, line_no, fh.tell())):
+                        return
+                    offset += len(block)
+                    line_no += block.count(b"\n") + (0 if block.endswith(b"\n") else 1)
+        except BaseException as e:  # surfaced to the consumer in blocks()
+            self._error = e
+        self._put(self._DONE)
+
+    def _put(self, item) -> bool:
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def blocks(self) -> Iterator[Tuple[bytes, int, int, int]]:
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=5)
+
+
+def _iter_blocks(stream, block_size: int) -> Iterator[bytes]:
+    """Yield decompressed byte blocks that always end on a line boundary."""
+    tail = b""
+    while True:
+        buf = stream.read(block_size)
+        if not buf:
+            break
+        buf = tail + buf
+        cut = buf.rfind(b"\n") + 1
+        if cut == 0:
+            tail = buf
+            continue
+        yield buf[:cut]
+        tail = buf[cut:]
+    if tail:
+        yield tail
+
+
+def _parse_block(
+    block: bytes,
+    block_offset: int,
+    block_line: int,
+    subs: Optional[List[str]],
+    dt_min: Optional[datetime.date],
+    dt_max: Optional[datetime.date],
+    line_filter: Optional[LinePrefilter],
+    columns: List[str],
+) -> Tuple[Optional[pa.Table], List[Tuple[int, int]], Tuple[int, int]]:
+    """
+    Worker entry point: parse and filter one block into an Arrow table.
+
+    Returns:
+        The table (None if nothing matched), the ``(lines, offset)`` position just
+        past each kept row's line, and the position at the end of the block.
+    """
+    builder = _CommentTableBuilder(columns)
+    positions: List[Tuple[int, int]] = []
+    lines, offset = block_line, block_offset
+    for line in block.split(b"\n"):
+        if offset == block_offset + len(block):
+            break  # empty piece after the trailing newline
+        lines += 1
+        offset = min(offset + len(line) + 1, block_offset + len(block))
+        if not line or (line_filter is not None and not line_filter(line)):
+            continue
+        parsed = _parse_record(line, subs, dt_min, dt_max)
+        if parsed is not None:
+            builder.append(*parsed)
+            positions.append((lines, offset))
+    table = builder.finish() if len(builder) else None
+    return table, positions, (lines, offset)
+
+
+def _parse_record(
+    line: Union[str, bytes],
+    subs: Optional[List[str]],
+    dt_min: Optional[datetime.date],
+    dt_max: Optional[datetime.date],
+) -> Optional[Tuple[dict, str]]:
+    """
+    Decode one dump line and apply the subreddit/date filter.
+
+    Returns:
+        Optional[Tuple[dict, str]]: The decoded comment and its "YYYY-MM-DD" date,
+        or None if the line is malformed or filtered out.
+    """
     try:
-        table = pa.Table.from_pylist(records)
+        data = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+    subreddit = data.get("subreddit")
+    if subs and subreddit not in subs:
+        return None
+    created = data.get("created_utc")
+    if created is None:
+        return None
+    # Convert epoch to date string for partitioning and filtering
+    date_str = datetime.datetime.utcfromtimestamp(created).strftime("%Y-%m-%d")
+    date_obj = datetime.date.fromisoformat(date_str)
+    if (dt_min and date_obj < dt_min) or (dt_max and date_obj > dt_max):
+        return None
+    return data, date_str
+
 
-        # ─── Strip struct<> columns (empty dicts) ──────────────────────────
-        empty_struct_cols = [
-            field.name
-            for field in table.schema
-            if pat.is_struct(field.type) and len(field.type) == 0
+# ─── Typed column builders ──────────────────────────────────────────────
+def _to_int(value: Any) -> Optional[int]:
+    # bool is an int subclass: "edited": false means never edited → null
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+
+def _to_str(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+_CONVERTERS: Dict[pa.DataType, Callable[[Any], Any]] = {
+    pa.int64(): _to_int,
+    pa.bool_(): _to_bool,
+    pa.string(): _to_str,
+}
+
+
+class _CommentTableBuilder:
+    """
+    Accumulate projected comment fields column by column and emit typed tables.
+
+    Only the allow-listed values are kept between ``append`` calls; the decoded
+    dict itself is dropped straight away.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.fields = [COMMENT_SCHEMA.field(name) for name in columns]
+        self.schema = pa.schema(
+            self.fields + [pa.field("_date", pa.string())],
+            metadata=COMMENT_SCHEMA.metadata,
+        )
+        self._convert = [_CONVERTERS[field.type] for field in self.fields]
+        self._reset()
+
+    def _reset(self) -> None:
+        self._values: List[List[Any]] = [[] for _ in self.fields]
+        self._dates: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def append(self, data: dict, date_str: str) -> None:
+        for field, convert, values in zip(self.fields, self._convert, self._values):
+            values.append(convert(data.get(field.name)))
+        self._dates.append(date_str)
+
+    def finish(self) -> pa.Table:
+        """Return the buffered rows as a table and start a new one."""
+        arrays = [
+            pa.array(values, type=field.type)
+            for field, values in zip(self.fields, self._values)
         ]
-        if empty_struct_cols:
-            table = table.drop(empty_struct_cols)
+        arrays.append(pa.array(self._dates, type=pa.string()))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        self._reset()
+        return table
+
 
-        # Partition by subreddit and _date
+def _write_table(table: pa.Table, output_dir: str, chunk_index: int) -> None:
+    try:
+        # Partition by subreddit and _date. Names are derived from the chunk index so a
+        # chunk rewritten after a resume replaces its partial files instead of duplicating.
         pq.write_to_dataset(
             table,
             root_path=output_dir,
             partition_cols=["subreddit", "_date"],
+            basename_template=f"chunk-{chunk_index:06d}-{{i}}.parquet",
             use_dictionary=True,
             existing_data_behavior="overwrite_or_ignore",
         )
     except Exception as e:
         raise RuntimeError(f"Failed to write Parquet chunk: {e}")
+
+
+# ─── Compaction ─────────────────────────────────────────────────────────
+def compact_dataset(
+    root: str,
+    rows_per_file: int = DEFAULT_COMPACT_ROWS,
+    sort_by: Optional[str] = "created_utc",
+) -> Dict[str, Any]:
+    """
+    Merge the small chunk files of a hive-partitioned dataset into few large files.
+
+    Every ``subreddit=/_date=`` partition is rewritten as files of at most
+    ``rows_per_file`` rows (one row group each) sorted by ``sort_by``, and a
+    ``_metadata`` summary with all row-group footers is written at the root so
+    readers can plan a scan without opening every file.
+
+    Args:
+        root (str): Dataset root directory (e.g. ``data/parquet_raw``).
+        rows_per_file (int): Maximum rows per compacted file / row group.
+        sort_by (str, optional): Column to sort each partition by, if present.
+
+    Returns:
+        Dict[str, Any]: Report with partition and file counts and scan time
+        (seconds) before and after compaction.
+
+    Raises:
+        FileNotFoundError: If root does not exist.
+        ValueError: If rows_per_file is not positive.
+    """
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Dataset root not found: {root}")
+    if rows_per_file < 1:
+        raise ValueError("rows_per_file must be >= 1.")
+
+    _recover_compactions(root)
+    partitions = _list_partitions(root)
+    report: Dict[str, Any] = {
+        "partitions": len(partitions),
+        "files_before": sum(len(files) for files in partitions.values()),
+        "scan_s_before": _time_scan(root),
+    }
+    metadata_path = os.path.join(root, METADATA_FILE)
+    if os.path.exists(metadata_path):
+        os.remove(metadata_path)
+
+    collector: List[pq.FileMetaData] = []
+    schemas: List[pa.Schema] = []
+    for part_dir, files in sorted(partitions.items()):
+        written = _compact_partition(part_dir, files, rows_per_file, sort_by)
+        for path in written:
+            md = pq.read_metadata(path)
+            md.set_file_path(os.path.relpath(path, root).replace(os.sep, "/"))
+            collector.append(md)
+            schemas.append(md.schema.to_arrow_schema())
+
+    report["metadata_written"] = False
+    if collector:
+        try:
+            pq.write_metadata(schemas[0], metadata_path, metadata_collector=collector)
+            report["metadata_written"] = True
+        except Exception as e:
+            # Files written before COMMENT_SCHEMA existed may not share one schema
+            logger.warning(f"Skipping {METADATA_FILE}: partition schemas differ ({e})")
+            if os.path.exists(metadata_path):
+                os.remove(metadata_path)
+
+    report["files_after"] = sum(len(files) for files in _list_partitions(root).values())
+    report["scan_s_after"] = _time_scan(root)
+    logger.info(
+        f"Compacted {root}: {report['files_before']} → {report['files_after']} files, "
+        f"scan {report['scan_s_before']}s → {report['scan_s_after']}s"
+    )
+    return report
+
+
+def _clear_dataset(root: str) -> None:
+    """Remove the chunk, compacted and summary files of an earlier ingest into ``root``."""
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        for name in filenames:
+            if (
+                (name.endswith(".parquet") and name.startswith(("chunk-", "compacted-", ".compacting-")))
+                or name.startswith(COMPACT_JOURNAL)
+                or (dirpath == root and name in (METADATA_FILE, "_common_metadata", MANIFEST_FILE))
+            ):
+                os.remove(os.path.join(dirpath, name))
+                removed += 1
+        if dirpath != root and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    if removed:
+        logger.info(f"Removed {removed} files of an earlier ingest from {root}")
+
+
+def _list_partitions(root: str) -> Dict[str, List[str]]:
+    """Map every directory holding data files to its sorted list of .parquet files."""
+    partitions: Dict[str, List[str]] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        files = sorted(
+            os.path.join(dirpath, f)
+            for f in filenames
+            if f.endswith(".parquet") and not f.startswith((".", "_"))
+        )
+        if files:
+            partitions[dirpath] = files
+    return partitions
+
+
+def _compact_partition(
+    part_dir: str,
+    files: List[str],
+    rows_per_file: int,
+    sort_by: Optional[str],
+) -> List[str]:
+    """Rewrite one partition directory; returns the paths of the compacted files."""
+    table = pa.concat_tables(
+        [pq.read_table(f, partitioning=None) for f in files],
+        promote_options="permissive",
+    )
+    if sort_by and sort_by in table.column_names:
+        table = table.sort_by(sort_by)
+
+    # Write under hidden names first so a crash never leaves a half-written visible file.
+    # Final names are unique per run, so they never collide with the originals
+    # (e.g. the files of an earlier compaction)
+    run = uuid.uuid4().hex[:8]
+    staged = []
+    for i, offset in enumerate(range(0, max(table.num_rows, 1), rows_per_file)):
+        tmp = os.path.join(part_dir, f".compacting-{run}-{i:05d}.parquet")
+        pq.write_table(
+            table.slice(offset, rows_per_file),
+            tmp,
+            row_group_size=rows_per_file,
+            use_dictionary=True,
+        )
+        staged.append((os.path.basename(tmp), f"compacted-{run}-{i:05d}.parquet"))
+
+    # Once the journal is on disk the compaction is committed: the new files are
+    # moved into place before any original is removed, and a crash at any point
+    # after this is finished by _recover_compactions on the next run
+    journal = {"staged": staged, "replaces": [os.path.basename(f) for f in files]}
+    journal_tmp = os.path.join(part_dir, f"{COMPACT_JOURNAL}.{run}")
+    with open(journal_tmp, "w", encoding="utf-8") as fh:
+        json.dump(journal, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(journal_tmp, os.path.join(part_dir, COMPACT_JOURNAL))
+    _finish_compaction(part_dir)
+    return [os.path.join(part_dir, final) for _, final in staged]
+
+
+def _finish_compaction(part_dir: str) -> None:
+    """Apply the journal in ``part_dir``: move staged files into place, then drop the originals."""
+    journal_path = os.path.join(part_dir, COMPACT_JOURNAL)
+    with open(journal_path, "r", encoding="utf-8") as fh:
+        journal = json.load(fh)
+    for tmp, final in journal["staged"]:
+        tmp_path = os.path.join(part_dir, tmp)
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, os.path.join(part_dir, final))
+    for name in journal["replaces"]:
+        path = os.path.join(part_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    os.remove(journal_path)
+
+
+def _recover_compactions(root: str) -> None:
+    """
+    Clean up after compactions that were interrupted.
+
+    A partition with a journal is rolled forward (its staged files already hold
+    every row). Staged files without a journal were never committed and are
+    deleted; the originals next to them are still complete.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        if COMPACT_JOURNAL in filenames:
+            logger.warning(f"Finishing interrupted compaction in {dirpath}")
+            _finish_compaction(dirpath)
+            continue
+        for name in filenames:
+            if name.startswith((".compacting-", f"{COMPACT_JOURNAL}.")):
+                logger.warning(f"Removing uncommitted compaction file {os.path.join(dirpath, name)}")
+                os.remove(os.path.join(dirpath, name))
+
+
+def _time_scan(root: str, column: str = "created_utc") -> Optional[float]:
+    """Seconds to discover the dataset and read one column; None if it cannot be scanned."""
+    start = time.perf_counter()
+    try:
+        dataset = ds.dataset(
+            root,
+            format="parquet",
+            partitioning="hive",
+            ignore_prefixes=[".", METADATA_FILE, "_common_metadata", MANIFEST_FILE],
+        )
+        dataset.to_table(columns=[column] if column in dataset.schema.names else [])
+    except Exception as e:
+        logger.warning(f"Could not scan {root}: {e}")
+        return None
+    return round(time.perf_counter() - start, 3)
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────
+def _parse_args(argv: Optional[List[str]] = None):
+    import argparse
+
+    p = argparse.ArgumentParser(prog="python -m nlp_core.io")
+    sub = p.add_subparsers(dest="command", required=True)
+    c = sub.add_parser("compact", help="Compact a partitioned Parquet dataset in place")
+    c.add_argument("root", help="Dataset root, e.g. data/parquet_raw")
+    c.add_argument("--rows-per-file", type=int, default=DEFAULT_COMPACT_ROWS)
+    c.add_argument("--sort-by", default="created_utc")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    if args.command == "compact":
+        report = compact_dataset(args.root, args.rows_per_file, args.sort_by or None)
+        print(f"▪ Compacted {args.root} ({report['partitions']} partitions)")
+        print(f"  files : {report['files_before']} → {report['files_after']}")
+        print(f"  scan  : {report['scan_s_before']}s → {report['scan_s_after']}s")
+        if not report["metadata_written"]:
+            print(f"  ! {METADATA_FILE} not written (mixed schemas)")
+
+
+if __name__ == "__main__":
+    main()
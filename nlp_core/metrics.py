@@ -0,0 +1,301 @@
+# nlp_core/metrics.py
+"""
+Stage-level metrics for the pipeline.
+
+Every instrumented stage appends one record per call to a per-process list:
+stage name, rows, wall and CPU seconds, rows/sec, batch size, current and peak
+RSS, and the worker it ran on. Dask workers keep their records until the
+driver collects them with :func:`collect`, which also adds the model-load
+times from :mod:`nlp_core.models`; :func:`write_report` then stores the raw
+records as Parquet and a per-stage summary as JSON.
+
+Setting ``NLP_PROFILE`` to a comma-separated list of stage names (or "all")
+runs those stages under the pyinstrument sampling profiler, if installed, and
+writes one HTML profile per call to ``NLP_PROFILE_DIR`` (default "profiles").
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import resource
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from nlp_core.models import load_metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+PROFILE_ENV = "NLP_PROFILE"
+PROFILE_DIR_ENV = "NLP_PROFILE_DIR"
+REPORT_COLUMNS = (
+    "stage", "worker", "start", "wall_s", "cpu_s", "rows", "rows_per_s",
+    "batch_size", "rss_mb", "peak_rss_mb",
+)
+
+_records: List[Dict[str, Any]] = []
+_lock = threading.Lock()
+_warned_profiler = False
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def record(stage_name: str, **fields: Any) -> Dict[str, Any]:
+    """
+    Append a finished measurement (e.g. an ingest chunk timed by its caller).
+
+    Args:
+        stage_name (str): Stage name.
+        **fields: Any of REPORT_COLUMNS or extra columns.
+
+    Returns:
+        Dict[str, Any]: The stored record.
+    """
+    rec = {"stage": stage_name, "worker": _worker_name(), "start": time.time(), **fields}
+    wall, rows = rec.get("wall_s"), rec.get("rows")
+    if rows is not None and wall:
+        rec.setdefault("rows_per_s", rows / wall)
+    rec.setdefault("rss_mb", _rss_mb())
+    rec.setdefault("peak_rss_mb", _peak_rss_mb())
+    with _lock:
+        _records.append(rec)
+    return rec
+
+
+@contextmanager
+def stage(stage_name: str, rows: Optional[int] = None, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block as one call of ``stage_name``.
+
+    The yielded dict can be filled in while the block runs (e.g. ``rows`` once
+    they are known); it is recorded when the block exits, also on errors.
+
+    Args:
+        stage_name (str): Stage name.
+        rows (int, optional): Rows processed.
+        **fields: Extra columns such as ``batch_size``.
+
+    Yields:
+        Dict[str, Any]: Fields of the record being built.
+    """
+    fields = {"rows": rows, **fields}
+    profiler = _start_profiler(stage_name)
+    start, wall0, cpu0 = time.time(), time.perf_counter(), time.process_time()
+    try:
+        yield fields
+    finally:
+        wall = time.perf_counter() - wall0
+        cpu = time.process_time() - cpu0
+        if profiler is not None:
+            _save_profile(profiler, stage_name)
+        record(stage_name, start=start, wall_s=wall, cpu_s=cpu, **fields)
+
+
+def instrument(stage_name: str) -> Callable:
+    """
+    Decorator timing a batch function whose first argument is its list of texts.
+
+    The record gets ``rows=len(texts)`` and the call's ``batch_size`` argument
+    when the function has one.
+
+    Args:
+        stage_name (str): Stage name.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorate(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            texts = next(iter(bound.arguments.values()))
+            extra = {"batch_size": bound.arguments["batch_size"]} if "batch_size" in bound.arguments else {}
+            with stage(stage_name, rows=len(texts), **extra):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def drain() -> List[Dict[str, Any]]:
+    """Return and clear this process's records (run on each worker via ``client.run``)."""
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+
+def model_loads() -> List[Dict[str, Any]]:
+    """One "model_load" record per model loaded in this process."""
+    worker = _worker_name()
+    return [
+        {"stage": "model_load", "model": name, "worker": worker, "wall_s": seconds}
+        for name, seconds in load_metrics().items()
+    ]
+
+
+def collect(client=None) -> List[Dict[str, Any]]:
+    """
+    Gather the records of this process and, given a Dask client, of every worker.
+
+    Args:
+        client (distributed.Client, optional): Cluster to collect from.
+
+    Returns:
+        List[Dict[str, Any]]: All records, model loads included.
+    """
+    records = drain() + model_loads()
+    if client is not None:
+        for per_worker in client.run(drain).values():
+            records.extend(per_worker)
+        for per_worker in client.run(model_loads).values():
+            records.extend(per_worker)
+    return records
+
+
+def summarize(records: Sequence[Dict[str, Any]]) -> "pd.DataFrame":
+    """
+    Per-stage totals: calls, rows, wall/CPU seconds, throughput, batch size and memory.
+
+    ``rows_per_s`` is total rows over total wall seconds (summed across workers,
+    so it is the per-worker rate); ``cpu_util`` is CPU over wall time and
+    ``mib_per_s`` the byte throughput of stages that report ``bytes`` (ingest).
+
+    Args:
+        records (Sequence[Dict[str, Any]]): Output of :func:`collect`.
+
+    Returns:
+        pd.DataFrame: One row per stage (model loads per model).
+    """
+    # Only reporting needs pandas; instrumented modules import just the stdlib parts
+    import pandas as pd
+
+    frame = pd.DataFrame(list(records))
+    if frame.empty:
+        return pd.DataFrame(columns=["stage"])
+    for col in REPORT_COLUMNS:
+        if col not in frame:
+            frame[col] = None
+    if "model" in frame:
+        loads = frame["stage"] == "model_load"
+        frame.loc[loads, "stage"] = "model_load:" + frame.loc[loads, "model"].astype(str)
+    if "bytes" not in frame:
+        frame["bytes"] = None
+    numeric = ["wall_s", "cpu_s", "rows", "bytes", "batch_size", "rss_mb", "peak_rss_mb"]
+    frame[numeric] = frame[numeric].apply(pd.to_numeric, errors="coerce")
+    summary = frame.groupby("stage", sort=False).agg(
+        calls=("stage", "size"),
+        workers=("worker", "nunique"),
+        rows=("rows", "sum"),
+        bytes=("bytes", "sum"),
+        wall_s=("wall_s", "sum"),
+        cpu_s=("cpu_s", "sum"),
+        mean_batch=("batch_size", "mean"),
+        max_rss_mb=("rss_mb", "max"),
+        peak_rss_mb=("peak_rss_mb", "max"),
+    )
+    # Stages that never report rows or bytes get NaN rather than a zero sum
+    for col in ("rows", "bytes"):
+        summary[col] = summary[col].where(frame.groupby("stage", sort=False)[col].count() > 0)
+    wall = summary["wall_s"].where(summary["wall_s"] > 0)
+    summary["rows_per_s"] = summary["rows"] / wall
+    summary["mib_per_s"] = summary["bytes"] / 2**20 / wall
+    summary["cpu_util"] = summary["cpu_s"] / wall
+    return summary.reset_index()
+
+
+def write_report(
+    records: Sequence[Dict[str, Any]],
+    out_dir: str,
+    run_id: str,
+    meta: Optional[Dict[str, Any]] = None,
+) -> Dict[str, str]:
+    """
+    Write ``<run_id>.parquet`` (raw records) and ``<run_id>.json`` (summary) to ``out_dir``.
+
+    Args:
+        records (Sequence[Dict[str, Any]]): Output of :func:`collect`.
+        out_dir (str): Report directory.
+        run_id (str): Run identifier (file stem).
+        meta (Dict[str, Any], optional): Run settings stored in the JSON.
+
+    Returns:
+        Dict[str, str]: Paths of the "json" and "parquet" files.
+    """
+    import pandas as pd
+
+    os.makedirs(out_dir, exist_ok=True)
+    frame = pd.DataFrame(list(records))
+    parquet_path = os.path.join(out_dir, f"{run_id}.parquet")
+    frame.to_parquet(parquet_path, index=False)
+    summary = summarize(records)
+    report = {
+        "run_id": run_id,
+        "meta": meta or {},
+        "stages": json.loads(summary.to_json(orient="records")),
+    }
+    json_path = os.path.join(out_dir, f"{run_id}.json")
+    with open(json_path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, default=str)
+    return {"json": json_path, "parquet": parquet_path}
+
+
+# ─── sampling profiler ───────────────────────────────────────────────
+def _profiled_stages() -> List[str]:
+    value = os.environ.get(PROFILE_ENV, "")
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def _start_profiler(stage_name: str):
+    global _warned_profiler
+    wanted = _profiled_stages()
+    if not wanted or ("all" not in wanted and stage_name not in wanted):
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        if not _warned_profiler:
+            logging.warning(f"{PROFILE_ENV} is set but pyinstrument is not installed; not profiling.")
+            _warned_profiler = True
+        return None
+    profiler = Profiler()
+    try:
+        profiler.start()
+    except RuntimeError:
+        # Another profiler is already running in this thread (nested stages)
+        return None
+    return profiler
+
+
+def _save_profile(profiler, stage_name: str) -> None:
+    profiler.stop()
+    out_dir = os.environ.get(PROFILE_DIR_ENV, "profiles")
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{stage_name}-{os.getpid()}-{time.time_ns()}.html")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(profiler.output_html())
+    logging.info(f"Profile of stage '{stage_name}' written to {path}")
@@ -0,0 +1,126 @@
+# nlp_core/models.py
+"""
+Process-wide registry of lazily loaded models.
+
+Modules register a loader per model name at import time (cheap); the model is
+only built on the first :func:`get_model` call and then reused for the lifetime
+of the process, so each Dask worker loads just the models its stages touch.
+"""
+
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_loaders: Dict[str, Callable[[], Any]] = {}
+_models: Dict[str, Any] = {}
+_load_seconds: Dict[str, float] = {}
+_lock = threading.RLock()
+
+# Module that registers each name prefix, imported on demand so that e.g.
+# warm_up(["sentiment.roberta"]) works in a fresh worker process
+_PROVIDERS: Dict[str, str] = {
+    "sentiment": "nlp_core.sentiment",
+    "emotion": "nlp_core.emotion",
+    "sarcasm": "nlp_core.sarcasm",
+    "spacy": "nlp_core.spacy_pipe",
+    "topic": "nlp_core.topic",
+}
+
+
+def register_model(name: str, loader: Callable[[], Any], replace: bool = False) -> None:
+    """
+    Register a zero-argument loader under ``name``.
+
+    Args:
+        name (str): Registry key, e.g. "sentiment.roberta".
+        loader (Callable[[], Any]): Builds the model. May return None to signal
+            that the model is unavailable; callers then degrade gracefully.
+        replace (bool): Replace an existing loader and drop its loaded model.
+
+    Raises:
+        ValueError: If ``name`` is already registered and ``replace`` is False.
+    """
+    with _lock:
+        if name in _loaders and not replace:
+            if _loaders[name] is loader:
+                return
+            raise ValueError(f"Model '{name}' is already registered.")
+        _loaders[name] = loader
+        _models.pop(name, None)
+        _load_seconds.pop(name, None)
+
+
+def get_model(name: str, loader: Optional[Callable[[], Any]] = None) -> Any:
+    """
+    Return the model registered as ``name``, loading it on first use.
+
+    Args:
+        name (str): Registry key.
+        loader (Callable[[], Any], optional): Registered on the fly if ``name`` is unknown.
+
+    Returns:
+        Any: The loaded model (or None if its loader reported it unavailable).
+
+    Raises:
+        KeyError: If ``name`` is not registered and no loader is given.
+    """
+    if name in _models:
+        return _models[name]
+    with _lock:
+        if name in _models:  # loaded by another thread meanwhile
+            return _models[name]
+        if name not in _loaders and loader is None:
+            provider = _PROVIDERS.get(name.split(".", 1)[0])
+            if provider is not None:
+                importlib.import_module(provider)
+        if name not in _loaders:
+            if loader is None:
+                raise KeyError(f"No model registered as '{name}'.")
+            _loaders[name] = loader
+        start = time.perf_counter()
+        model = _loaders[name]()
+        _load_seconds[name] = time.perf_counter() - start
+        _models[name] = model
+        logging.info(f"Loaded model '{name}' in {_load_seconds[name]:.1f}s")
+        return model
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    Load models ahead of the first request, e.g. via ``client.run(warm_up, names)``.
+
+    Args:
+        names (Iterable[str], optional): Models to load. Defaults to every registered one.
+
+    Returns:
+        Dict[str, float]: Load time in seconds of every model loaded in this process.
+    """
+    for name in list(names) if names is not None else registered_models():
+        get_model(name)
+    return load_metrics()
+
+
+def load_metrics() -> Dict[str, float]:
+    """Seconds spent loading each model in this process."""
+    return dict(_load_seconds)
+
+
+def is_loaded(name: str) -> bool:
+    return name in _models
+
+
+def registered_models() -> List[str]:
+    return sorted(_loaders)
+
+
+def unload(name: Optional[str] = None) -> None:
+    """Drop one (or every) loaded model; it is reloaded on next use."""
+    with _lock:
+        if name is None:
+            _models.clear()
+            _load_seconds.clear()
+        else:
+            _models.pop(name, None)
+            _load_seconds.pop(name, None)
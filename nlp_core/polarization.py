@@ -2,7 +2,13 @@
 
 import numpy as np
 from scipy.spatial.distance import jensenshannon
-from typing import List
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+# Pseudo-count added to every category of a histogram before normalising, so
+# sparse bins do not blow up the divergence through near-empty categories
+DEFAULT_ALPHA = 0.5
+# Upper bound on the float64 elements of one (bins, pairs, categories) block
+DEFAULT_MAX_ELEMENTS = 1 << 23
 
 def js_divergence(p: np.ndarray, q: np.ndarray) -> float:
     """
@@ -23,6 +29,220 @@ def js_divergence(p: np.ndarray, q: np.ndarray) -> float:
     # Jensen-Shannon (scipy returns sqrt(JS), so square it)
     return float(jensenshannon(p_norm, q_norm) ** 2)
 
+def smooth_histograms(counts: np.ndarray, alpha: float = DEFAULT_ALPHA) -> np.ndarray:
+    """
+    Turn category counts into probability distributions with additive smoothing.
+
+    Args:
+        counts (np.ndarray): Non-negative counts whose last axis is the category
+            axis, e.g. (groups, bins, categories).
+        alpha (float): Pseudo-count added to every category. A histogram with no
+            observations becomes uniform (or NaN when ``alpha`` is 0).
+
+    Returns:
+        np.ndarray: float64 distributions of the same shape.
+    """
+    counts = np.asarray(counts, dtype="float64")
+    if np.any(counts < 0):
+        raise ValueError("Counts must be non-negative.")
+    smoothed = counts + alpha
+    totals = smoothed.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return smoothed / totals
+
+def _xlogx_sum(x: np.ndarray) -> np.ndarray:
+    # Σ x·ln(x) over the last axis, with 0·ln(0) = 0
+    logs = np.log(x, out=np.zeros_like(x), where=x > 0)
+    return np.einsum("...k,...k->...", x, logs)
+
+def pairwise_js(
+    counts: np.ndarray,
+    alpha: float = DEFAULT_ALPHA,
+    min_count: float = 1,
+    max_elements: int = DEFAULT_MAX_ELEMENTS,
+) -> np.ndarray:
+    """
+    Jensen-Shannon divergence between every pair of groups in every bin.
+
+    Uses JS(P, Q) = H(M) - (H(P) + H(Q)) / 2 with M = (P + Q) / 2 and the
+    natural log, so values match :func:`js_divergence` (in [0, ln 2]). Each
+    group's entropy is computed once; only the mixtures are pairwise, and they
+    are evaluated in blocks of bins so memory stays under ``max_elements``.
+
+    Args:
+        counts (np.ndarray): (groups, bins, categories) histograms, e.g. topic,
+            emotion or stance counts per subreddit and time bin.
+        alpha (float): Additive smoothing, see :func:`smooth_histograms`.
+        min_count (float): Groups with fewer observations than this in a bin
+            get NaN for every pair in that bin instead of a divergence against
+            their (smoothed) prior.
+        max_elements (int): Element budget of one block of mixtures.
+
+    Returns:
+        np.ndarray: (bins, groups, groups) symmetric matrices with a zero diagonal.
+    """
+    counts = np.asarray(counts, dtype="float64")
+    if counts.ndim != 3:
+        raise ValueError("counts must have shape (groups, bins, categories).")
+    n_groups, n_bins, n_cats = counts.shape
+    probs = np.ascontiguousarray(smooth_histograms(counts, alpha).transpose(1, 0, 2))   # (B, G, K)
+    neg_entropy = _xlogx_sum(probs)                                                     # (B, G)
+    rows, cols = np.triu_indices(n_groups, k=1)
+    out = np.zeros((n_bins, n_groups, n_groups))
+    if len(rows) and n_bins:
+        step = max(1, max_elements // max(1, len(rows) * n_cats))
+        for start in range(0, n_bins, step):
+            block = probs[start:start + step]
+            mix = (block[:, rows] + block[:, cols]) * 0.5                               # (b, pairs, K)
+            js = 0.5 * (neg_entropy[start:start + step, rows] + neg_entropy[start:start + step, cols])
+            js -= _xlogx_sum(mix)
+            np.maximum(js, 0.0, out=js)   # rounding can leave tiny negatives
+            out[start:start + step, rows, cols] = js
+            out[start:start + step, cols, rows] = js
+    sparse = counts.sum(axis=-1).T < min_count                                          # (B, G)
+    if sparse.any():
+        out[sparse[:, :, None] | sparse[:, None, :]] = np.nan
+        diagonal = np.arange(n_groups)
+        out[:, diagonal, diagonal] = 0.0
+    return out
+
+def mean_polarization(matrices: np.ndarray) -> np.ndarray:
+    """
+    Mean divergence over the distinct group pairs of each matrix.
+
+    Args:
+        matrices (np.ndarray): (bins, groups, groups) output of :func:`pairwise_js`.
+
+    Returns:
+        np.ndarray: (bins,) means, NaN where no pair has a value.
+    """
+    n_groups = matrices.shape[-1]
+    rows, cols = np.triu_indices(n_groups, k=1)
+    pairs = matrices[:, rows, cols]
+    valid = ~np.isnan(pairs)
+    totals = np.where(valid, pairs, 0.0).sum(axis=1)
+    counts = valid.sum(axis=1)
+    return np.divide(totals, counts, out=np.full(len(totals), np.nan), where=counts > 0)
+
+def histograms_from_rollup(
+    binned,
+    group: str = "subreddit",
+    category: str = "topic",
+    value: str = "n",
+) -> Tuple[List, np.ndarray, List, np.ndarray]:
+    """
+    Dense (groups, bins, categories) counts from a re-binned rollup cube.
+
+    Args:
+        binned (pd.DataFrame): Output of ``nlp_core.rollup.rebin`` with ``group``
+            and ``category`` among its dimensions.
+        group (str): Column compared pairwise (e.g. "subreddit").
+        category (str): Column the histograms are over ("topic", "emotion", "stance").
+        value (str): Count column.
+
+    Returns:
+        Tuple[List, np.ndarray, List, np.ndarray]: Group labels, bin starts,
+        category labels and the count array.
+    """
+    groups, g_idx = np.unique(binned[group].to_numpy(), return_inverse=True)
+    bins, b_idx = np.unique(binned["bin_ts"].to_numpy(), return_inverse=True)
+    cats, c_idx = np.unique(binned[category].to_numpy(), return_inverse=True)
+    counts = np.zeros((len(groups), len(bins), len(cats)))
+    np.add.at(counts, (g_idx, b_idx, c_idx), binned[value].to_numpy(dtype="float64"))
+    return list(groups), bins, list(cats), counts
+
+class PolarizationTracker:
+    """
+    Pairwise JS divergences maintained as new bins (or late counts) arrive.
+
+    Only the bins touched by an update are recomputed, so a streaming
+    dashboard pays for the new data rather than the whole history.
+
+    Args:
+        groups (Sequence[Hashable]): Groups compared pairwise (e.g. subreddits).
+        n_categories (int): Histogram length (topics, emotions, stances, …).
+        alpha (float): Additive smoothing, see :func:`smooth_histograms`.
+        min_count (float): See :func:`pairwise_js`.
+    """
+
+    def __init__(
+        self,
+        groups: Sequence[Hashable],
+        n_categories: int,
+        alpha: float = DEFAULT_ALPHA,
+        min_count: float = 1,
+    ):
+        self.groups = list(groups)
+        self.n_categories = n_categories
+        self.alpha = alpha
+        self.min_count = min_count
+        self._bins: Dict[Hashable, int] = {}
+        self._labels: List[Hashable] = []
+        self._counts = np.zeros((len(self.groups), 0, n_categories))
+        self._js = np.zeros((0, len(self.groups), len(self.groups)))
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    @property
+    def bins(self) -> List[Hashable]:
+        """Bin labels in arrival order."""
+        return list(self._labels)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """(groups, bins, categories) accumulated counts."""
+        return self._counts[:, : len(self._labels)]
+
+    @property
+    def matrices(self) -> np.ndarray:
+        """(bins, groups, groups) divergences, aligned with :attr:`bins`."""
+        return self._js[: len(self._labels)]
+
+    def update(self, bins: Sequence[Hashable], counts: np.ndarray) -> np.ndarray:
+        """
+        Add counts for new or existing bins and recompute those bins.
+
+        Args:
+            bins (Sequence[Hashable]): Bin labels (e.g. bin start timestamps).
+            counts (np.ndarray): (groups, len(bins), categories) counts to add.
+
+        Returns:
+            np.ndarray: (len(bins), groups, groups) divergences of the given bins.
+        """
+        counts = np.asarray(counts, dtype="float64")
+        if counts.shape != (len(self.groups), len(bins), self.n_categories):
+            raise ValueError(
+                f"counts must have shape ({len(self.groups)}, {len(bins)}, {self.n_categories})."
+            )
+        positions = np.array([self._slot(label) for label in bins], dtype="int64")
+        np.add.at(self._counts, (slice(None), positions), counts)
+        touched = np.unique(positions)
+        self._js[touched] = pairwise_js(self._counts[:, touched], self.alpha, self.min_count)
+        return self._js[positions]
+
+    def overall(self) -> np.ndarray:
+        """(groups, groups) divergences of the counts pooled over every bin."""
+        pooled = self.counts.sum(axis=1, keepdims=True)
+        return pairwise_js(pooled, self.alpha, self.min_count)[0]
+
+    def _slot(self, label: Hashable) -> int:
+        position = self._bins.get(label)
+        if position is not None:
+            return position
+        position = len(self._labels)
+        if position == self._counts.shape[1]:
+            # Grow geometrically so appending bins one at a time stays O(1) amortised
+            capacity = max(16, 2 * position)
+            counts = np.zeros((len(self.groups), capacity, self.n_categories))
+            counts[:, :position] = self._counts
+            js = np.zeros((capacity, len(self.groups), len(self.groups)))
+            js[:position] = self._js
+            self._counts, self._js = counts, js
+        self._bins[label] = position
+        self._labels.append(label)
+        return position
+
 def moral_foundation_vectors(comments: List[str]) -> np.ndarray:
     """
     Placeholder for mapping comments to Moral Foundations embeddings (requires a model).
@@ -0,0 +1,235 @@
+# nlp_core/query.py
+"""
+Filtered reads of the enriched ``features`` dataset.
+
+run_pipeline writes the features hive-partitioned by subreddit and day
+(``subreddit=<name>/_date=<YYYY-MM-DD>/part.N.parquet``) next to a
+``_metadata`` file that holds every row group's footer. A query prunes whole
+partitions on ``subreddit``/``_date``, reads only the requested columns and
+skips row groups whose min/max statistics rule out its filters, e.g. a
+``created_utc`` range or ``("sarcasm_score", ">", 0.8)``.
+
+Dataset discovery and footers are read once per process and reused until the
+dataset is rewritten, so repeated queries from the API or the dashboard only
+touch the row groups they return.
+"""
+
+import datetime
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARTITION_COLUMNS: Tuple[str, ...] = ("subreddit", "_date")
+METADATA_FILE = "_metadata"
+# Columns returned when a query names none
+DEFAULT_COLUMNS: Tuple[str, ...] = (
+    "id", "subreddit", "created_utc", "sentiment", "dominant_emotion", "stance", "sarcasm_score", "topic",
+)
+FILTER_OPS: Tuple[str, ...] = ("==", "!=", "<", "<=", ">", ">=", "in", "not in")
+
+# (column, op, value), as in pyarrow's ``filters`` argument
+Filter = Tuple[str, str, Any]
+
+_datasets: Dict[str, "FeatureDataset"] = {}
+_lock = threading.Lock()
+
+
+def dataset_version(path: str) -> Tuple[str, int, int]:
+    """
+    Identity of the dataset's current version.
+
+    run_pipeline rewrites ``_metadata`` (or, without one, recreates the root
+    directory) on every run, so its path, mtime and size change with the data.
+
+    Args:
+        path (str): Dataset root.
+
+    Returns:
+        Tuple[str, int, int]: Stat'ed path, mtime in ns and size.
+
+    Raises:
+        FileNotFoundError: If ``path`` does not exist.
+    """
+    metadata = os.path.join(path, METADATA_FILE)
+    target = metadata if os.path.exists(metadata) else path
+    stat = os.stat(target)
+    return target, stat.st_mtime_ns, stat.st_size
+
+
+class FeatureDataset:
+    """
+    The features dataset with partitions discovered and footers loaded.
+
+    Use :func:`open_features` for the shared, cached instance.
+
+    Args:
+        path (str): Dataset root (run_pipeline ``features``).
+
+    Raises:
+        FileNotFoundError: If ``path`` is missing or holds no Parquet files.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        if not os.path.isdir(self.path):
+            raise FileNotFoundError(f"No features dataset at {self.path}; run the pipeline first.")
+        self.version = dataset_version(self.path)
+        metadata = os.path.join(self.path, METADATA_FILE)
+        if os.path.exists(metadata):
+            # A single read gives every file's row-group statistics
+            self.dataset = ds.parquet_dataset(metadata, partitioning="hive")
+        else:
+            # Hive directories like _date=… must not be skipped as hidden
+            self.dataset = ds.dataset(
+                self.path, format="parquet", partitioning="hive",
+                ignore_prefixes=[".", METADATA_FILE, "_common_metadata"],
+            )
+        self.fragments = list(self.dataset.get_fragments())
+        if not self.fragments:
+            raise FileNotFoundError(f"No Parquet files in {self.path}; run the pipeline first.")
+        for fragment in self.fragments:
+            # Loads the footer once; later scans reuse it
+            fragment.ensure_complete_metadata()
+        partitions = [ds.get_partition_keys(fragment.partition_expression) for fragment in self.fragments]
+        self.subreddits: List[str] = sorted({str(p["subreddit"]) for p in partitions if "subreddit" in p})
+        self.dates: List[str] = sorted({str(p["_date"]) for p in partitions if "_date" in p})
+        self.num_rows = sum(fragment.metadata.num_rows for fragment in self.fragments)
+        self._subreddit_names = {name.lower(): name for name in self.subreddits}
+
+    @property
+    def schema(self) -> pa.Schema:
+        return self.dataset.schema
+
+    def expression(
+        self,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        filters: Optional[Sequence[Filter]] = None,
+    ) -> Optional[ds.Expression]:
+        """
+        Dataset filter for the query arguments of :meth:`query`.
+
+        Raises:
+            ValueError: If a filter names an unknown column or operator.
+        """
+        terms: List[ds.Expression] = []
+        if subreddits is not None:
+            # Case-insensitive, like the search filters; unknown names match nothing
+            names = [self._subreddit_names[s.lower()] for s in subreddits if s.lower() in self._subreddit_names]
+            terms.append(ds.field("subreddit").isin(pa.array(names, type=self.schema.field("subreddit").type)))
+        # Day bounds prune _date partitions, created_utc bounds the row groups
+        if start_ts is not None:
+            terms.append(ds.field("_date") >= _utc_day(start_ts))
+            terms.append(ds.field("created_utc") >= start_ts)
+        if end_ts is not None:
+            terms.append(ds.field("_date") <= _utc_day(end_ts))
+            terms.append(ds.field("created_utc") <= end_ts)
+        for column, op, value in filters or ():
+            self._check_columns([column])
+            if op not in FILTER_OPS:
+                raise ValueError(f"Unknown filter operator {op!r}; available: {list(FILTER_OPS)}")
+            terms.append(pq.filters_to_expression([(column, op, value)]))
+        if not terms:
+            return None
+        expression = terms[0]
+        for term in terms[1:]:
+            expression = expression & term
+        return expression
+
+    def query(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        filters: Optional[Sequence[Filter]] = None,
+        limit: Optional[int] = None,
+    ) -> pa.Table:
+        """
+        Read the matching rows of ``columns``.
+
+        Args:
+            columns (Sequence[str], optional): Columns to read (default DEFAULT_COLUMNS).
+            subreddits (Sequence[str], optional): Subreddits to keep (case-insensitive).
+            start_ts (int, optional): Earliest ``created_utc`` (inclusive).
+            end_ts (int, optional): Latest ``created_utc`` (inclusive).
+            filters (Sequence[Filter], optional): Further ``(column, op, value)``
+                conditions, all of which must hold; ops are FILTER_OPS.
+            limit (int, optional): Return at most this many rows, stopping the scan early.
+
+        Returns:
+            pa.Table: Matching rows, in dataset order.
+
+        Raises:
+            ValueError: If a column or filter operator is unknown.
+        """
+        columns = list(columns or DEFAULT_COLUMNS)
+        self._check_columns(columns)
+        scanner = self.dataset.scanner(
+            columns=columns, filter=self.expression(subreddits, start_ts, end_ts, filters)
+        )
+        return scanner.head(limit) if limit is not None else scanner.to_table()
+
+    def count(
+        self,
+        subreddits: Optional[Sequence[str]] = None,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        filters: Optional[Sequence[Filter]] = None,
+    ) -> int:
+        """Number of rows :meth:`query` would return without a limit."""
+        expression = self.expression(subreddits, start_ts, end_ts, filters)
+        if expression is None:
+            return self.num_rows
+        return self.dataset.count_rows(filter=expression)
+
+    def _check_columns(self, columns: Sequence[str]) -> None:
+        unknown = [name for name in columns if name not in self.schema.names]
+        if unknown:
+            raise ValueError(f"Unknown feature columns {unknown}")
+
+
+def _utc_day(ts: int) -> str:
+    # The ingest's _date partition value of a created_utc timestamp
+    return datetime.datetime.fromtimestamp(int(ts), tz=datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def open_features(path: str) -> FeatureDataset:
+    """
+    Shared :class:`FeatureDataset` for ``path``, reopened when the data changes.
+
+    Args:
+        path (str): Dataset root (run_pipeline ``features``).
+
+    Returns:
+        FeatureDataset: Discovered dataset with footers loaded.
+
+    Raises:
+        FileNotFoundError: If there is no dataset at ``path``.
+    """
+    key = os.path.abspath(path)
+    version = dataset_version(key)
+    with _lock:
+        cached = _datasets.get(key)
+        if cached is None or cached.version != version:
+            cached = _datasets[key] = FeatureDataset(key)
+        return cached
+
+
+def query_features(path: str, **kwargs) -> pa.Table:
+    """
+    :meth:`FeatureDataset.query` on the shared dataset at ``path``.
+
+    Args:
+        path (str): Dataset root (run_pipeline ``features``).
+        **kwargs: Passed to :meth:`FeatureDataset.query`.
+
+    Returns:
+        pa.Table: Matching rows.
+    """
+    return open_features(path).query(**kwargs)
@@ -0,0 +1,411 @@
+# nlp_core/rollup.py
+"""
+Time-binned aggregate cube behind the dashboard.
+
+The pipeline reduces the enriched comments to one row per
+(5-minute bin, subreddit, stance, topic, dominant emotion) holding additive
+measures only: comment counts plus sentiment and sarcasm sums and counts.
+Because every measure is a sum, coarser bins, subreddit subsets and weighted
+averages are all exact re-aggregations of the cube and never need the
+comment-level features again.
+"""
+
+import logging
+import os
+import uuid
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BIN_MINUTES = 5
+CUBE_FILE = "cube.parquet"
+NO_EMOTION = "none"
+
+DIMENSIONS: Tuple[str, ...] = ("subreddit", "stance", "topic", "emotion")
+# (sum column, count column) of each averaged measure
+MEASURES: Dict[str, Tuple[str, str]] = {
+    "sentiment": ("sentiment_sum", "sentiment_n"),
+    "sarcasm": ("sarcasm_sum", "sarcasm_n"),
+}
+SUM_COLUMNS: Tuple[str, ...] = ("n", "sentiment_sum", "sentiment_n", "sarcasm_sum", "sarcasm_n")
+# Feature columns the cube is built from
+SOURCE_COLUMNS: Tuple[str, ...] = (
+    "created_utc", "subreddit", "stance", "topic", "dominant_emotion", "sentiment", "sarcasm_score",
+)
+WEIGHTINGS: Tuple[str, ...] = ("Raw", "Equalized", "Inverse Frequency")
+SMOOTHERS: Tuple[str, ...] = ("EWMA", "LOESS")
+
+
+def dominant_emotion(emotions: Optional[Mapping[str, float]]) -> str:
+    """
+    Highest-scoring label of an emotion mapping.
+
+    Args:
+        emotions (Mapping[str, float], optional): Emotion label → score.
+
+    Returns:
+        str: The top label, or NO_EMOTION if there are no scores.
+    """
+    if not emotions:
+        return NO_EMOTION
+    return max(emotions.items(), key=lambda item: item[1])[0]
+
+
+def _empty_cube() -> pd.DataFrame:
+    frame = pd.DataFrame({
+        "bin_ts": pd.Series(dtype="int64"),
+        "subreddit": pd.Series(dtype="string"),
+        "stance": pd.Series(dtype="string"),
+        "topic": pd.Series(dtype="int32"),
+        "emotion": pd.Series(dtype="string"),
+    })
+    for col in SUM_COLUMNS:
+        frame[col] = pd.Series(dtype="int64" if col == "n" or col.endswith("_n") else "float64")
+    return frame
+
+
+# ─── building ────────────────────────────────────────────────────────
+def rollup_partition(df: pd.DataFrame, bin_minutes: int = BIN_MINUTES) -> pd.DataFrame:
+    """
+    Aggregate one partition of enriched comments into cube rows.
+
+    Args:
+        df (pd.DataFrame): Comments with the SOURCE_COLUMNS.
+        bin_minutes (int): Bin width; the stored cube uses BIN_MINUTES.
+
+    Returns:
+        pd.DataFrame: One row per bin_ts (bin start, epoch seconds) and DIMENSIONS
+        with the SUM_COLUMNS.
+    """
+    if df.empty:
+        return _empty_cube()
+    width = bin_minutes * 60
+    created = pd.to_numeric(df["created_utc"], errors="coerce").to_numpy(dtype="float64")
+    sentiment = pd.to_numeric(df["sentiment"], errors="coerce").to_numpy(dtype="float64")
+    sarcasm = pd.to_numeric(df["sarcasm_score"], errors="coerce").to_numpy(dtype="float64")
+    frame = pd.DataFrame({
+        "bin_ts": (np.floor(created / width) * width),
+        "subreddit": df["subreddit"].astype("string").str.lower().to_numpy(),
+        "stance": df["stance"].astype("string").fillna("neutral/other").to_numpy(),
+        "topic": pd.to_numeric(df["topic"], errors="coerce").fillna(-1).to_numpy(dtype="int32"),
+        "emotion": df["dominant_emotion"].astype("string").fillna(NO_EMOTION).to_numpy(),
+        "n": 1,
+        "sentiment_sum": np.nan_to_num(sentiment),
+        "sentiment_n": (~np.isnan(sentiment)).astype("int64"),
+        "sarcasm_sum": np.nan_to_num(sarcasm),
+        "sarcasm_n": (~np.isnan(sarcasm)).astype("int64"),
+    })
+    frame = frame[np.isfinite(created)]
+    frame["bin_ts"] = frame["bin_ts"].astype("int64")
+    return combine_rollups([frame])
+
+
+def combine_rollups(parts: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Merge partial cubes, summing rows that share a bin and dimension key.
+
+    Args:
+        parts (Iterable[pd.DataFrame]): Outputs of :func:`rollup_partition`.
+
+    Returns:
+        pd.DataFrame: Combined cube sorted by bin_ts.
+    """
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return _empty_cube()
+    frame = pd.concat(parts, ignore_index=True)
+    keys = ["bin_ts", *DIMENSIONS]
+    cube = frame.groupby(keys, sort=False, dropna=False)[list(SUM_COLUMNS)].sum().reset_index()
+    return cube.sort_values(keys, kind="stable", ignore_index=True)
+
+
+def write_rollup(cube: pd.DataFrame, path: str, bin_minutes: int = BIN_MINUTES) -> str:
+    """
+    Write a cube to Parquet (dimensions dictionary-encoded), replacing ``path`` atomically.
+
+    Args:
+        cube (pd.DataFrame): Cube from :func:`combine_rollups`.
+        path (str): Output file.
+        bin_minutes (int): Bin width recorded in the file metadata.
+
+    Returns:
+        str: ``path``.
+    """
+    table = pa.Table.from_pandas(cube, preserve_index=False)
+    for name in ("subreddit", "stance", "emotion"):
+        i = table.schema.get_field_index(name)
+        table = table.set_column(i, name, table.column(name).cast(pa.string()).dictionary_encode())
+    table = table.replace_schema_metadata({b"bin_minutes": str(bin_minutes).encode()})
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(os.path.abspath(path)), f".{os.path.basename(path)}.{uuid.uuid4().hex}")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+    return path
+
+
+def build_rollup(features_path: str, out_path: str, bin_minutes: int = BIN_MINUTES) -> int:
+    """
+    Build the cube from the enriched feature Parquet with Dask.
+
+    Each partition is reduced on its worker; only the partial cubes travel
+    back to be combined.
+
+    Args:
+        features_path (str): Enriched Parquet directory (run_pipeline ``features``).
+        out_path (str): Cube file to write.
+        bin_minutes (int): Bin width.
+
+    Returns:
+        int: Number of cube rows.
+    """
+    import dask.dataframe as dd
+
+    feats = dd.read_parquet(features_path, columns=list(SOURCE_COLUMNS))
+    partials = feats.map_partitions(rollup_partition, bin_minutes, meta=_empty_cube()).compute()
+    cube = combine_rollups([partials])
+    write_rollup(cube, out_path, bin_minutes)
+    logging.info(f"Rollup: {int(cube['n'].sum()):,} comments → {len(cube):,} cube rows at {out_path}")
+    return len(cube)
+
+
+# ─── querying (dashboard) ────────────────────────────────────────────
+def load_rollup(path: str) -> pd.DataFrame:
+    """
+    Read a cube with categorical dimensions (fast filters and group-bys).
+
+    Args:
+        path (str): Cube file.
+
+    Returns:
+        pd.DataFrame: The cube.
+
+    Raises:
+        FileNotFoundError: If ``path`` does not exist.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No rollup cube at {path}; run the pipeline first.")
+    cube = pq.read_table(path).to_pandas()
+    for name in ("subreddit", "stance", "emotion"):
+        cube[name] = cube[name].astype("category")
+    return cube
+
+
+def filter_rollup(
+    cube: pd.DataFrame,
+    subreddits: Optional[Sequence[str]] = None,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Restrict a cube to subreddits (case-insensitive) and a bin_ts range (inclusive).
+
+    Args:
+        cube (pd.DataFrame): Cube from :func:`load_rollup`.
+        subreddits (Sequence[str], optional): Subreddits to keep; None keeps all.
+        start_ts (int, optional): First bin start (epoch seconds).
+        end_ts (int, optional): Last bin start (epoch seconds).
+
+    Returns:
+        pd.DataFrame: Matching rows.
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    if subreddits is not None:
+        mask &= cube["subreddit"].isin([s.lower() for s in subreddits]).to_numpy()
+    bins = cube["bin_ts"].to_numpy()
+    if start_ts is not None:
+        mask &= bins >= start_ts
+    if end_ts is not None:
+        mask &= bins <= end_ts
+    return cube[mask]
+
+
+def rebin(cube: pd.DataFrame, bin_minutes: int, by: Sequence[str] = ("subreddit",)) -> pd.DataFrame:
+    """
+    Re-aggregate a cube to wider bins, keeping the dimensions in ``by``.
+
+    Args:
+        cube (pd.DataFrame): Cube (or a filtered slice of one).
+        bin_minutes (int): New bin width; a multiple of the cube's BIN_MINUTES.
+        by (Sequence[str]): Dimensions to keep; the others are summed out.
+
+    Returns:
+        pd.DataFrame: Columns bin_ts, ``by`` and SUM_COLUMNS.
+
+    Raises:
+        ValueError: If ``bin_minutes`` is not a positive multiple of BIN_MINUTES.
+    """
+    if bin_minutes <= 0 or bin_minutes % BIN_MINUTES:
+        raise ValueError(f"bin_minutes must be a positive multiple of {BIN_MINUTES}.")
+    width = bin_minutes * 60
+    keys = {"bin_ts": cube["bin_ts"].to_numpy() // width * width}
+    keys.update({name: cube[name].to_numpy() for name in by})
+    frame = pd.DataFrame(keys)
+    for col in SUM_COLUMNS:
+        frame[col] = cube[col].to_numpy()
+    return frame.groupby(["bin_ts", *by], sort=True, observed=True)[list(SUM_COLUMNS)].sum().reset_index()
+
+
+def weighted_series(binned: pd.DataFrame, weighting: str = "Raw", by: str = "subreddit") -> pd.DataFrame:
+    """
+    Combine per-group series (e.g. per subreddit) into one series per measure.
+
+    ``Raw`` averages over comments, so large groups dominate. ``Equalized``
+    averages each bin's group means, so every group counts the same in every
+    bin. ``Inverse Frequency`` weights a group by the inverse of its volume over
+    the whole window, equalising groups overall while keeping their
+    bin-to-bin activity.
+
+    Args:
+        binned (pd.DataFrame): Output of :func:`rebin` with ``by`` among its dimensions.
+        weighting (str): One of WEIGHTINGS.
+        by (str): Group column to combine over.
+
+    Returns:
+        pd.DataFrame: Indexed by bin_ts with ``volume`` and one column per MEASURES
+        key (NaN where a bin has no scored comments).
+
+    Raises:
+        ValueError: If ``weighting`` is unknown.
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting '{weighting}'; expected one of {WEIGHTINGS}.")
+    frame = pd.DataFrame({"bin_ts": binned["bin_ts"].to_numpy(), "volume": binned["n"].to_numpy()})
+    for measure, (sum_col, n_col) in MEASURES.items():
+        counts = binned[n_col].to_numpy(dtype="float64")
+        if weighting == "Raw":
+            weights = np.ones_like(counts)
+        elif weighting == "Equalized":
+            weights = np.divide(1.0, counts, out=np.zeros_like(counts), where=counts > 0)
+        else:
+            totals = binned.groupby(by, observed=True)[n_col].transform("sum").to_numpy(dtype="float64")
+            weights = np.divide(1.0, totals, out=np.zeros_like(totals), where=totals > 0)
+        frame[f"{measure}_num"] = weights * binned[sum_col].to_numpy(dtype="float64")
+        frame[f"{measure}_den"] = weights * counts
+    grouped = frame.groupby("bin_ts", sort=True).sum()
+    out = pd.DataFrame({"volume": grouped["volume"]}, index=grouped.index)
+    for measure in MEASURES:
+        den = grouped[f"{measure}_den"].to_numpy()
+        out[measure] = np.divide(
+            grouped[f"{measure}_num"].to_numpy(), den, out=np.full(len(den), np.nan), where=den > 0
+        )
+    return out
+
+
+def group_means(binned: pd.DataFrame, measure: str, by: str = "subreddit") -> pd.DataFrame:
+    """
+    Wide bin_ts × group table of one measure's mean.
+
+    Args:
+        binned (pd.DataFrame): Output of :func:`rebin`.
+        measure (str): Key of MEASURES.
+        by (str): Group column.
+
+    Returns:
+        pd.DataFrame: Mean per bin (rows) and group (columns); NaN where a group has no data.
+    """
+    sum_col, n_col = MEASURES[measure]
+    wide = binned.pivot_table(index="bin_ts", columns=by, values=[sum_col, n_col], aggfunc="sum", observed=True)
+    den = wide[n_col]
+    return wide[sum_col].div(den.where(den > 0))
+
+
+def fill_bins(frame: pd.DataFrame, bin_minutes: int) -> pd.DataFrame:
+    """Reindex a bin_ts-indexed frame onto a gap-free grid (missing bins are NaN)."""
+    if frame.empty:
+        return frame
+    width = bin_minutes * 60
+    grid = np.arange(frame.index.min(), frame.index.max() + width, width)
+    return frame.reindex(grid)
+
+
+# ─── smoothing ───────────────────────────────────────────────────────
+def ewma(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    Exponentially weighted moving average along axis 0 that skips NaNs.
+
+    Args:
+        values (np.ndarray): (T,) or (T, C) series on a regular grid.
+        span (int): Span in bins (alpha = 2 / (span + 1)).
+
+    Returns:
+        np.ndarray: Smoothed values, NaN before a column's first observation.
+    """
+    return pd.DataFrame(values).ewm(span=max(span, 1), ignore_na=True).mean().to_numpy().reshape(np.shape(values))
+
+
+def loess(values: np.ndarray, half_width: int) -> np.ndarray:
+    """
+    Local linear regression with tricube weights along axis 0.
+
+    On a regular grid the weighted sums of every local fit are convolutions
+    with fixed kernels, so the whole smoother costs a few ``np.convolve``
+    calls per column. NaNs are treated as missing observations; edges use the
+    points that exist.
+
+    Args:
+        values (np.ndarray): (T,) or (T, C) series on a regular grid.
+        half_width (int): Neighbours on each side of a point.
+
+    Returns:
+        np.ndarray: Smoothed values; NaN where fewer than two points are in range.
+    """
+    data = np.asarray(values, dtype="float64")
+    matrix = data.reshape(len(data), -1)
+    h = max(int(half_width), 1)
+    offsets = np.arange(-h, h + 1, dtype="float64")
+    weights = (1 - np.abs(offsets / (h + 1)) ** 3) ** 3
+    # Kernels are reversed because np.convolve flips its second argument
+    k0, k1, k2 = weights[::-1], (weights * offsets)[::-1], (weights * offsets ** 2)[::-1]
+    out = np.full(matrix.shape, np.nan)
+    for c in range(matrix.shape[1]):
+        y = matrix[:, c]
+        present = ~np.isnan(y)
+        mask = present.astype("float64")
+        y0 = np.where(present, y, 0.0)
+        s0 = np.convolve(mask, k0, mode="same")
+        s1 = np.convolve(mask, k1, mode="same")
+        s2 = np.convolve(mask, k2, mode="same")
+        t0 = np.convolve(y0, k0, mode="same")
+        t1 = np.convolve(y0, k1, mode="same")
+        det = s0 * s2 - s1 ** 2
+        # Fitted value at offset 0 of the local line a + b·d
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fit = np.where(det > 1e-12, (s2 * t0 - s1 * t1) / det, t0 / s0)
+        fit[s0 <= 0] = np.nan
+        out[:, c] = fit
+    return out.reshape(data.shape)
+
+
+def smooth(frame: pd.DataFrame, method: str = "EWMA", window: int = 3) -> pd.DataFrame:
+    """
+    Smooth every column of a gap-free, bin-indexed frame.
+
+    Args:
+        frame (pd.DataFrame): Output of :func:`fill_bins`.
+        method (str): "EWMA" (span = ``window``) or "LOESS" (half-width = ``window``).
+        window (int): Smoothing window in bins; 1 or less returns the frame unchanged.
+
+    Returns:
+        pd.DataFrame: Smoothed frame with the same index and columns.
+
+    Raises:
+        ValueError: If ``method`` is unknown.
+    """
+    if method not in SMOOTHERS:
+        raise ValueError(f"Unknown smoothing method '{method}'; expected one of {SMOOTHERS}.")
+    if window <= 1 or frame.empty:
+        return frame
+    values = frame.to_numpy(dtype="float64")
+    smoothed = ewma(values, window) if method == "EWMA" else loess(values, window)
+    return pd.DataFrame(smoothed, index=frame.index, columns=frame.columns)
+
+
+def to_datetime_index(frame: pd.DataFrame) -> pd.DataFrame:
+    """Replace a bin_ts (epoch seconds) index with UTC timestamps for plotting."""
+    out = frame.copy()
+    out.index = pd.to_datetime(out.index, unit="s", utc=True)
+    out.index.name = "time"
+    return out
@@ -1,14 +1,26 @@
 from typing import Optional, List, Dict, Any
-from transformers import pipeline
 import logging
 
-try:
-    _sarcasm_pipeline = pipeline(
-        "text-classification", model="mrm8488/t5-base-finetuned-sarcasm-twitter"
-    )
-except Exception as e:
-    logging.error(f"Could not load sarcasm model: {e}")
-    _sarcasm_pipeline = None
+from nlp_core.batching import DEFAULT_BATCH_SIZE, DEFAULT_TOKEN_BUDGET, run_batched
+from nlp_core.metrics import instrument
+from nlp_core.models import get_model, register_model
+
+SARCASM_MODEL = "mrm8488/t5-base-finetuned-sarcasm-twitter"
+# Feature-cache identity of detect_sarcasm_batch; bump the version when _to_score changes
+MODEL_NAME = SARCASM_MODEL
+MODEL_VERSION = "1"
+
+
+def _load_sarcasm_pipeline():
+    try:
+        from transformers import pipeline
+        return pipeline("text-classification", model=SARCASM_MODEL)
+    except Exception as e:
+        logging.error(f"Could not load sarcasm model: {e}")
+        return None
+
+
+register_model("sarcasm.t5", _load_sarcasm_pipeline)
 
 
 def detect_sarcasm(text: str) -> Optional[float]:
@@ -21,25 +33,63 @@ def detect_sarcasm(text: str) -> Optional[float]:
     Returns:
         Optional[float]: Probability that the text is sarcastic, or None if unavailable.
     """
-    if not text or _sarcasm_pipeline is None:
+    if not text:
+        return None
+    sarcasm_pipeline = get_model("sarcasm.t5")
+    if sarcasm_pipeline is None:
         return None
 
     try:
         # HF pipelines are typed as generators; make them a list for safe indexing
         results: List[Dict[str, Any]] = list(
-            _sarcasm_pipeline(text, truncation=True)  # type: ignore[arg-type]
+            sarcasm_pipeline(text, truncation=True)  # type: ignore[arg-type]
         )
         if not results:
             return None
 
-        result = results[0]
-        score = float(result.get("score", 0.0))
-
-        # Some models don’t include a numeric score—fallback to label
-        if "label" in result and "score" not in result:
-            label = str(result["label"]).upper()
-            score = 1.0 if "SARCASM" in label else 0.0
-
-        return score
+        return _to_score(results[0])
     except Exception:
         return None
+
+
+@instrument("sarcasm")
+def detect_sarcasm_batch(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> List[Optional[float]]:
+    """
+    Batched :func:`detect_sarcasm` over length-bucketed, padded batches.
+
+    Args:
+        texts (List[str]): Input texts.
+        batch_size (int): Maximum texts per forward pass.
+        token_budget (int): Maximum padded tokens per forward pass.
+
+    Returns:
+        List[Optional[float]]: Sarcasm probability per text, None if empty or unavailable.
+    """
+    sarcasm_pipeline = get_model("sarcasm.t5")
+    if sarcasm_pipeline is None:
+        return [None] * len(texts)
+    outputs = run_batched(sarcasm_pipeline, texts, batch_size, token_budget)
+    scores: List[Optional[float]] = []
+    for out in outputs:
+        if isinstance(out, list):
+            out = out[0] if out else None
+        try:
+            scores.append(_to_score(out) if isinstance(out, dict) else None)
+        except Exception:
+            scores.append(None)
+    return scores
+
+
+def _to_score(result: Dict[str, Any]) -> float:
+    score = float(result.get("score", 0.0))
+
+    # Some models don’t include a numeric score—fallback to label
+    if "label" in result and "score" not in result:
+        label = str(result["label"]).upper()
+        score = 1.0 if "SARCASM" in label else 0.0
+
+    return score
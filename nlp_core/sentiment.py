@@ -1,25 +1,41 @@
 # nlp_core/sentiment.py
 
-import numpy as np
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from transformers import pipeline
+import math
 import logging
+from collections.abc import Iterable
+from typing import Any, List, Optional
 
-# Initialize global models (load once for efficiency)
-_vader = SentimentIntensityAnalyzer()
-try:
-    _roberta_pipeline = pipeline(
-        "sentiment-analysis",
-        model="cardiffnlp/twitter-roberta-base-sentiment",
-        return_all_scores=False
-    )
-except Exception as e:
-    logging.error(f"Failed to load RoBERTa sentiment model: {e}")
-    _roberta_pipeline = None
+from nlp_core.batching import DEFAULT_BATCH_SIZE, DEFAULT_TOKEN_BUDGET, run_batched
+from nlp_core.metrics import instrument
+from nlp_core.models import get_model, register_model
 
-from typing import Any, Dict, List, cast
+ROBERTA_MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
+# Feature-cache identity of fused_sentiment_batch; bump the version when _fuse changes
+MODEL_NAME = f"vader+{ROBERTA_MODEL}"
+MODEL_VERSION = "1"
 
-from typing import Any, List, Dict, cast
+
+# Models are built on first use (once per process) through nlp_core.models
+def _load_vader():
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+
+def _load_roberta():
+    try:
+        from transformers import pipeline
+        return pipeline(
+            "sentiment-analysis",
+            model=ROBERTA_MODEL,
+            return_all_scores=False
+        )
+    except Exception as e:
+        logging.error(f"Failed to load RoBERTa sentiment model: {e}")
+        return None
+
+
+register_model("sentiment.vader", _load_vader)
+register_model("sentiment.roberta", _load_roberta)
 
 def fused_sentiment(text: str) -> float:
     """
@@ -29,15 +45,12 @@ def fused_sentiment(text: str) -> float:
     if not text:
         return 0.0
 
-    # ── VADER ─────────────────────────────────────────────────────────────
-    vader_score: float = _vader.polarity_scores(text)["compound"]
-
     # ── RoBERTa ───────────────────────────────────────────────────────────
-    from collections.abc import Iterable
-    roberta_score = 0.0
-    if _roberta_pipeline is not None:
+    first: Any = None
+    roberta_pipeline = get_model("sentiment.roberta")
+    if roberta_pipeline is not None:
         try:
-            raw = _roberta_pipeline(text, truncation=True)       # type: ignore[arg-type]
+            raw = roberta_pipeline(text, truncation=True)       # type: ignore[arg-type]
 
             # Ensure we have an iterable to pass into list()
             if isinstance(raw, Iterable):
@@ -48,19 +61,57 @@ def fused_sentiment(text: str) -> float:
                 results = [raw]
 
             if results:
-                first: Any = results[0]
-                conf: float
-
-                if isinstance(first, dict):
-                    conf = float(first.get("score", 0.5))
-                else:  # unexpected type (e.g., Tensor) → neutral
-                    conf = 0.5
-
-                roberta_score = (conf - 0.5) * 2  # map [0,1] → [-1,1]
+                first = results[0]
 
         except Exception:
             pass  # leave roberta_score = 0
 
+    return _fuse(text, first)
+
+
+@instrument("sentiment")
+def fused_sentiment_batch(
+    texts: List[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> List[float]:
+    """
+    Batched :func:`fused_sentiment`: RoBERTa runs on length-bucketed batches.
+
+    Args:
+        texts (List[str]): Input texts.
+        batch_size (int): Maximum texts per forward pass.
+        token_budget (int): Maximum padded tokens per forward pass.
+
+    Returns:
+        List[float]: Fused score in [-1, 1] per text (0.0 for empty texts).
+    """
+    roberta_pipeline = get_model("sentiment.roberta")
+    if roberta_pipeline is None:
+        outputs: List[Any] = [None] * len(texts)
+    else:
+        outputs = run_batched(roberta_pipeline, texts, batch_size, token_budget)
+    return [
+        _fuse(text, out[0] if isinstance(out, list) and out else out) if text else 0.0
+        for text, out in zip(texts, outputs)
+    ]
+
+
+def _fuse(text: str, roberta_result: Optional[Any]) -> float:
+    # ── VADER ─────────────────────────────────────────────────────────────
+    vader_score: float = get_model("sentiment.vader").polarity_scores(text)["compound"]
+
+    # ── RoBERTa ───────────────────────────────────────────────────────────
+    roberta_score = 0.0
+    if roberta_result is not None:
+        conf: float
+        if isinstance(roberta_result, dict):
+            conf = float(roberta_result.get("score", 0.5))
+        else:  # unexpected type (e.g., Tensor) → neutral
+            conf = 0.5
+
+        roberta_score = (conf - 0.5) * 2  # map [0,1] → [-1,1]
+
     # ── Fuse & squash ─────────────────────────────────────────────────────
-    combined = np.tanh(0.6 * vader_score + 0.4 * roberta_score)
+    combined = math.tanh(0.6 * vader_score + 0.4 * roberta_score)
     return float(combined)
@@ -1,52 +1,244 @@
 # nlp_core/spacy_pipe.py
 
-import spacy
-from spacy.tokens import Doc
-from spacy.attrs import POS
-from typing import List, Dict, Union
+from collections import deque
+from itertools import chain
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, Iterator, List, Mapping, Sequence, Set, Union
 
-# Load a transformer-backed English model for better performance on complex language
-try:
-    nlp = spacy.load("en_core_web_trf")
-except OSError:
-    # Fallback to small model if transformer model is not available
-    nlp = spacy.load("en_core_web_sm")
+import numpy as np
+import pyarrow as pa
 
-def analyze_text(doc: Doc) -> Dict:
+from nlp_core.models import get_model, register_model
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens import Doc
+
+# Pipeline components each feature needs (any one of a set is enough to run it)
+FEATURE_COMPONENTS: Dict[str, Set[str]] = {
+    "num_tokens": set(),
+    "num_sentences": {"parser", "senter", "sentencizer"},
+    "entities": {"ner"},
+    "pos_counts": {"tagger", "morphologizer", "attribute_ruler"},
+    "noun_chunks": {"parser", "tagger", "morphologizer", "attribute_ruler"},
+}
+DEFAULT_FEATURES = tuple(FEATURE_COMPONENTS)
+# Shared encoders the components above listen to
+_ENCODERS = {"tok2vec", "transformer"}
+MODEL_NAME = "en_core_web_trf"
+FALLBACK_MODEL = "en_core_web_sm"
+# Feature-cache version of analyze_text's output; the model part of the key
+# comes from loaded_model_name(), since either model may be installed
+MODEL_VERSION = "1"
+# Universal POS tags, the columns of pos_count_matrix
+POS_TAGS = (
+    "ADJ", "ADP", "ADV", "AUX", "CCONJ", "DET", "INTJ", "NOUN", "NUM",
+    "PART", "PRON", "PROPN", "PUNCT", "SCONJ", "SYM", "VERB", "X", "SPACE",
+)
+# Arrow type of entity label lists: labels come from a small fixed set (PERSON,
+# ORG, GPE, ...), so each list item is a dictionary index rather than a string
+ENTITY_LABELS_TYPE = pa.list_(pa.dictionary(pa.int8(), pa.string()))
+
+
+def _load_nlp() -> "Language":
+    import spacy
+
+    # Load a transformer-backed English model for better performance on complex language
+    try:
+        return spacy.load(MODEL_NAME)
+    except OSError:
+        # Fallback to small model if transformer model is not available
+        return spacy.load(FALLBACK_MODEL)
+
+
+register_model("spacy.en", _load_nlp)
+
+
+def get_nlp() -> "Language":
+    """Return the shared spaCy pipeline, loading it on first use."""
+    return get_model("spacy.en")
+
+
+def loaded_model_name() -> str:
+    """Name and version of the loaded pipeline, e.g. "en_core_web_sm-3.7.1"."""
+    nlp = get_nlp()
+    return f"{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}"
+
+
+def __getattr__(name: str):
+    # Keep `from nlp_core.spacy_pipe import nlp` working without loading at import
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def analyze_text(doc: "Doc", features: Sequence[str] = DEFAULT_FEATURES) -> Dict:
     """
     Extract features from a spaCy Doc for analysis or statistics.
 
     Args:
         doc (spacy.tokens.Doc): Parsed document.
+        features (Sequence[str]): Keys of FEATURE_COMPONENTS to compute.
 
     Returns:
         Dict: A dictionary of extracted features (e.g., entity counts, sentence lengths).
     """
-    features = {
-        "num_tokens": len(doc),
-        "num_sentences": len(list(doc.sents)),
-        "entities": [ent.label_ for ent in doc.ents],
-        "pos_counts": doc.count_by(POS),
-        "noun_chunks": [chunk.text for chunk in doc.noun_chunks]
+    from spacy.attrs import POS
+
+    extractors = {
+        "num_tokens": lambda: len(doc),
+        "num_sentences": lambda: len(list(doc.sents)),
+        "entities": lambda: [ent.label_ for ent in doc.ents],
+        "pos_counts": lambda: doc.count_by(POS),
+        "noun_chunks": lambda: [chunk.text for chunk in doc.noun_chunks],
+    }
+    return {name: extractors[name]() for name in features}
+
+
+def _empty_features(features: Sequence[str]) -> Dict:
+    empty: Dict[str, Any] = {
+        "num_tokens": 0,
+        "num_sentences": 0,
+        "entities": [],
+        "pos_counts": {},
+        "noun_chunks": [],
     }
-    return features
+    return {name: empty[name] for name in features}
+
+
+def disabled_components(nlp: "Language", features: Sequence[str]) -> List[str]:
+    """
+    Names of the enabled pipeline components that ``features`` do not need.
+
+    Args:
+        nlp (Language): Loaded spaCy pipeline.
+        features (Sequence[str]): Keys of FEATURE_COMPONENTS.
+
+    Returns:
+        List[str]: Components to disable while extracting.
+
+    Raises:
+        ValueError: If a feature name is unknown.
+    """
+    unknown = sorted(set(features) - set(FEATURE_COMPONENTS))
+    if unknown:
+        raise ValueError(f"Unknown spaCy features {unknown}; available: {list(FEATURE_COMPONENTS)}")
+    needed: Set[str] = set()
+    for name in features:
+        needed |= FEATURE_COMPONENTS[name]
+    if needed & set(nlp.pipe_names):
+        needed |= _ENCODERS
+    return [name for name in nlp.pipe_names if name not in needed]
+
 
-def process_texts(texts: Union[List[str], str]) -> List[Doc]:
+def extract_features(
+    texts: Iterable[str],
+    features: Sequence[str] = DEFAULT_FEATURES,
+    batch_size: int = 64,
+    n_process: int = 1,
+) -> Iterator[Dict]:
+    """
+    Stream feature records for texts through ``nlp.pipe``.
+
+    Components the requested features do not need are disabled, and each Doc is
+    reduced to a small dict as soon as it is produced, so only ``batch_size``
+    Docs are alive at a time. Empty texts are not sent to spaCy.
+
+    Args:
+        texts (Iterable[str]): Input strings (consumed lazily).
+        features (Sequence[str]): Keys of FEATURE_COMPONENTS to compute.
+        batch_size (int): Texts per spaCy batch.
+        n_process (int): spaCy worker processes. Values above 1 need a parent that
+            may fork, e.g. Dask workers started with ``distributed.worker.daemon: False``.
+
+    Yields:
+        Dict: One feature record per input text, in input order.
+    """
+    nlp = get_nlp()
+    disable = disabled_components(nlp, features)
+    # One marker per input: True if the text went to spaCy, False if it was empty
+    markers: Deque[bool] = deque()
+
+    def feed() -> Iterator[str]:
+        for text in texts:
+            markers.append(bool(text))
+            if text:
+                yield text
+
+    docs = nlp.pipe(feed(), batch_size=batch_size, n_process=n_process, disable=disable)
+    for doc in docs:
+        while markers and not markers[0]:
+            markers.popleft()
+            yield _empty_features(features)
+        markers.popleft()
+        yield analyze_text(doc, features)
+    while markers:
+        markers.popleft()
+        yield _empty_features(features)
+
+def process_texts(texts: Union[List[str], str], batch_size: int = 64) -> List["Doc"]:
     """
     Apply the spaCy pipeline to a list of texts.
 
+    Prefer :func:`extract_features` when only features are needed; this keeps
+    every Doc in memory.
+
     Args:
         texts (List[str] or str): List of input strings.
+        batch_size (int): Texts per spaCy batch.
 
     Returns:
         List[Doc]: List of spaCy Doc objects.
     """
+    from spacy.tokens import Doc
+
     if not isinstance(texts, list):
         raise TypeError("Input to process_texts must be a list of strings.")
-    docs = []
-    for text in texts:
-        if not text:
-            docs.append(Doc(nlp.vocab, words=[]))
-        else:
-            docs.append(nlp(text))
-    return docs
+    nlp = get_nlp()
+    parsed = iter(nlp.pipe([text for text in texts if text], batch_size=batch_size))
+    return [next(parsed) if text else Doc(nlp.vocab, words=[]) for text in texts]
+
+
+def pos_count_matrix(pos_counts: Sequence[Mapping[int, int]]) -> np.ndarray:
+    """
+    Dense POS count matrix for ``pos_counts`` features.
+
+    Args:
+        pos_counts (Sequence[Mapping[int, int]]): ``doc.count_by(POS)`` results,
+            keyed by spaCy POS ids.
+
+    Returns:
+        np.ndarray: uint16 array of shape ``(len(pos_counts), len(POS_TAGS))``;
+        counts saturate at 65535.
+    """
+    from spacy.parts_of_speech import IDS
+
+    lengths = np.fromiter(map(len, pos_counts), dtype=np.int64, count=len(pos_counts))
+    total = int(lengths.sum())
+    pos_ids = np.fromiter(chain.from_iterable(pos_counts), dtype=np.int64, count=total)
+    counts = np.fromiter(chain.from_iterable(c.values() for c in pos_counts), dtype=np.int64, count=total)
+    rows = np.repeat(np.arange(len(pos_counts)), lengths)
+    # POS id → column, -1 for ids outside POS_TAGS
+    column = np.full(max(IDS.values()) + 1, -1, dtype=np.int64)
+    column[[IDS[tag] for tag in POS_TAGS]] = np.arange(len(POS_TAGS))
+    cols = np.where(pos_ids < len(column), column[np.minimum(pos_ids, len(column) - 1)], -1)
+    keep = cols >= 0
+    out = np.zeros((len(pos_counts), len(POS_TAGS)), dtype=np.uint16)
+    out[rows[keep], cols[keep]] = np.minimum(counts[keep], np.iinfo(np.uint16).max)
+    return out
+
+
+def entity_label_array(entities: Sequence[Sequence[str]]) -> pa.ListArray:
+    """
+    Entity label lists as a dictionary-encoded Arrow list array.
+
+    Args:
+        entities (Sequence[Sequence[str]]): ``entities`` feature per text.
+
+    Returns:
+        pa.ListArray: Array of type ENTITY_LABELS_TYPE.
+    """
+    offsets = np.zeros(len(entities) + 1, dtype=np.int32)
+    np.cumsum([len(labels) for labels in entities], out=offsets[1:])
+    values = pa.array([label for labels in entities for label in labels], type=pa.string())
+    values = values.dictionary_encode().cast(ENTITY_LABELS_TYPE.value_type)
+    return pa.ListArray.from_arrays(pa.array(offsets), values, type=ENTITY_LABELS_TYPE)
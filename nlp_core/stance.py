@@ -4,6 +4,9 @@ from typing import Literal
 
 # Define possible stance labels
 STANCE_LABELS = ("pro-Biden", "pro-Trump", "neutral/other")
+# Feature-cache identity of detect_stance; change both when a real model replaces the stub
+MODEL_NAME = "stance-stub"
+MODEL_VERSION = "0"
 
 def detect_stance(text: str) -> str:
     """
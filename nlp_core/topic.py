@@ -1,18 +1,58 @@
-from bertopic import BERTopic
-from sentence_transformers import SentenceTransformer
-from typing import List, Any, Optional, Tuple
+import os
+import json
+from typing import TYPE_CHECKING, List, Any, Optional, Sequence, Tuple
 from collections.abc import Mapping
 
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-try:
-    _topic_model: BERTopic = BERTopic(verbose=False, embedding_model=embed_model)
-except Exception as e:
-    raise RuntimeError(f"BERTopic initialization failed: {e}") from e
+from nlp_core.models import get_model, is_loaded, register_model
+from nlp_core.embedding_cache import _sentence_transformer_loader
+from nlp_core.metrics import instrument
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from bertopic import BERTopic
+
+EMBED_MODEL = "all-MiniLM-L6-v2"
+
+
+def _load_embed_model():
+    # Same instance the embedding cache encodes with, so a worker loads it once
+    model = get_model(f"embeddings.{EMBED_MODEL}", _sentence_transformer_loader(EMBED_MODEL))
+    if model is None:
+        raise RuntimeError(f"Embedding model '{EMBED_MODEL}' is not available.")
+    return model
+
+
+def _load_topic_model() -> "BERTopic":
+    from bertopic import BERTopic
+    try:
+        return BERTopic(verbose=False, embedding_model=get_model("topic.embedder"))
+    except Exception as e:
+        raise RuntimeError(f"BERTopic initialization failed: {e}") from e
+
+
+register_model("topic.embedder", _load_embed_model)
+register_model("topic.bertopic", _load_topic_model)
+
+
+def __getattr__(name: str):
+    # `embed_model` used to be built at import time; keep it reachable lazily
+    if name == "embed_model":
+        return get_model("topic.embedder")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def get_topics(docs: List[str]) -> Tuple[List[int], List[Any]]:
+    """
+    Fit the shared BERTopic model on ``docs`` and return their topics.
+
+    This refits from scratch on every call, so topic ids are only meaningful
+    within one call. For partitioned data use :func:`fit_topic_model` once and
+    :func:`transform_topics` per partition.
+    """
     if not docs:
         raise ValueError("No documents provided.")
-    topics, probs = _topic_model.fit_transform(docs)
+    topics, probs = get_model("topic.bertopic").fit_transform(docs)
     topics_list = list(topics)
     if probs is None:
         probs_list = []
@@ -26,12 +66,131 @@ def get_topics(docs: List[str]) -> Tuple[List[int], List[Any]]:
                 probs_list = []
     return topics_list, probs_list
 
+# ─── Fit once, transform per partition ─────────────────────────────────
+KEYWORDS_FILE = "topic_keywords.json"
+
+
+def stratified_sample(
+    df: "pd.DataFrame",
+    per_group: int,
+    by: Sequence[str] = ("subreddit", "_date"),
+    seed: int = 0,
+) -> "pd.DataFrame":
+    """
+    Take up to ``per_group`` random rows from every group, so large subreddits
+    and busy days do not dominate the topic model fit.
+
+    Args:
+        df (pd.DataFrame): Rows to sample from.
+        per_group (int): Maximum rows per group.
+        by (Sequence[str]): Grouping columns.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: The sampled rows.
+    """
+    shuffled = df.sample(frac=1.0, random_state=seed)
+    return shuffled.groupby(list(by), observed=True, sort=False).head(per_group)
+
+
+def fit_topic_model(
+    docs: List[str],
+    save_dir: str,
+    embeddings: Optional["np.ndarray"] = None,
+    top_n: int = 5,
+) -> List[List[str]]:
+    """
+    Phase one: fit BERTopic on a sample and save it for :func:`transform_topics`.
+
+    The model is saved with safetensors serialisation, which keeps the topic
+    embeddings and c-TF-IDF but not UMAP/HDBSCAN, so later ``transform`` calls
+    are a cheap nearest-topic lookup. Keywords are extracted once and written
+    to ``save_dir/topic_keywords.json``.
+
+    Args:
+        docs (List[str]): Sample documents.
+        save_dir (str): Output directory for the model.
+        embeddings (np.ndarray, optional): Precomputed embeddings for ``docs``.
+        top_n (int): Keywords per topic.
+
+    Returns:
+        List[List[str]]: Keywords per topic.
+
+    Raises:
+        ValueError: If no documents are provided.
+    """
+    from bertopic import BERTopic
+
+    if not docs:
+        raise ValueError("No documents provided.")
+    model = BERTopic(verbose=False, embedding_model=get_model("topic.embedder"))
+    model.fit(docs, embeddings=embeddings)
+    os.makedirs(save_dir, exist_ok=True)
+    model.save(
+        save_dir,
+        serialization="safetensors",
+        save_ctfidf=True,
+        save_embedding_model=EMBED_MODEL,
+    )
+    keywords = extract_keywords(model, top_n=top_n)
+    with open(os.path.join(save_dir, KEYWORDS_FILE), "w", encoding="utf-8") as fh:
+        json.dump(keywords, fh)
+    return keywords
+
+
+def load_topic_model(model_dir: str) -> "BERTopic":
+    """Load a model saved by :func:`fit_topic_model` (once per process)."""
+    from bertopic import BERTopic
+
+    path = os.path.abspath(model_dir)
+    return get_model(
+        f"topic.saved:{path}",
+        lambda: BERTopic.load(path, embedding_model=get_model("topic.embedder")),
+    )
+
+
+@instrument("topic")
+def transform_topics(
+    docs: List[str],
+    model_dir: str,
+    embeddings: Optional["np.ndarray"] = None,
+) -> Tuple[List[int], List[float]]:
+    """
+    Phase two: assign documents to the topics of a saved model.
+
+    Args:
+        docs (List[str]): Documents to assign.
+        model_dir (str): Directory written by :func:`fit_topic_model`.
+        embeddings (np.ndarray, optional): Precomputed embeddings for ``docs``.
+
+    Returns:
+        Tuple[List[int], List[float]]: Topic id and confidence per document.
+    """
+    if not docs:
+        return [], []
+    topics, probs = load_topic_model(model_dir).transform(docs, embeddings=embeddings)
+    if probs is None:
+        confidence = [0.0] * len(docs)
+    else:
+        confidence = [float(p.max()) if hasattr(p, "max") else float(p) for p in probs]
+    return [int(t) for t in topics], confidence
+
+
+def load_keywords(model_dir: str) -> List[List[str]]:
+    """Keywords saved next to a model by :func:`fit_topic_model`."""
+    with open(os.path.join(model_dir, KEYWORDS_FILE), "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
 def extract_keywords(
-    topic_model: Optional[BERTopic] = _topic_model,
+    topic_model: Optional["BERTopic"] = None,
     top_n: int = 5
 ) -> List[List[str]]:
     if topic_model is None:
-        return []
+        # Default to the shared model, but never build one just to read keywords
+        if not is_loaded("topic.bertopic"):
+            return []
+        topic_model = get_model("topic.bertopic")
     info = topic_model.get_topic_info()
     num = len(info) - 1 if len(info) > 0 else 0
     results: List[List[str]] = []
@@ -13,50 +13,342 @@ Run:
 from __future__ import annotations
 
 import argparse
+import json
 import os
+import time
 from pathlib import Path
 
 import dask.dataframe as dd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from dask.dataframe.io.parquet.arrow import ArrowDatasetEngine
 from dask.distributed import Client, performance_report
 
-from nlp_core.io import zst_to_parquet
-from nlp_core.cleaning import clean_text
-from nlp_core.spacy_pipe import process_texts, analyze_text
-from nlp_core.sentiment import fused_sentiment
-from nlp_core.emotion import detect_emotions
+from nlp_core.io import MANIFEST_FILE, METADATA_FILE, zst_to_parquet
+from nlp_core.models import warm_up
+from nlp_core.cleaning import clean_texts
+from nlp_core.spacy_pipe import extract_features
+from nlp_core.batching import DEFAULT_BATCH_SIZE, DEFAULT_TOKEN_BUDGET
+from nlp_core.sentiment import fused_sentiment_batch
+from nlp_core.emotion import detect_emotions_batch
 from nlp_core.stance import detect_stance
-from nlp_core.topic import get_topics, extract_keywords
+from nlp_core.embedding_cache import EmbeddingCache
+from nlp_core.embeddings import DEFAULT_TRAIN_SIZE, INDEX_TYPES
+from nlp_core.index_segments import SegmentedEmbeddingStore
+from nlp_core.topic import EMBED_MODEL, fit_topic_model, load_keywords, load_topic_model, stratified_sample, transform_topics
 from nlp_core.polarization import js_divergence
-from nlp_core.sarcasm import detect_sarcasm
+from nlp_core.sarcasm import detect_sarcasm_batch
+from nlp_core.rollup import CUBE_FILE, build_rollup, dominant_emotion
+from nlp_core.query import PARTITION_COLUMNS
+from nlp_core.feature_cache import DEFAULT_MAX_ENTRIES, FeatureCache, cached_map
+from nlp_core import emotion, metrics, sarcasm, sentiment, spacy_pipe, stance
+
+
+# Models used by _nlp_partition; loaded once per worker before the NLP stage
+NLP_MODELS = [
+    "spacy.en",
+    "sentiment.vader",
+    "sentiment.roberta",
+    "emotion.goemotions",
+    "sarcasm.t5",
+    "topic.embedder",
+]
+
+SPACY_FEATURES = ("entities", "pos_counts")
+
+# Columns _nlp_partition adds, with their pandas dtypes. Fixed-width columns
+# replace per-row dicts: one float32 score per emotion label, one uint16 count
+# per POS tag, and entity labels as dictionary-encoded Arrow lists
+EMOTION_COLUMNS = [f"emo_{label}" for label in emotion.EMOTION_LABELS]
+POS_COLUMNS = [f"pos_{tag}" for tag in spacy_pipe.POS_TAGS]
+ENRICHED_COLUMNS = {
+    "entities": pd.ArrowDtype(spacy_pipe.ENTITY_LABELS_TYPE),
+    **dict.fromkeys(POS_COLUMNS, "uint16"),
+    "sentiment": "float32",
+    **dict.fromkeys(EMOTION_COLUMNS, "float32"),
+    "dominant_emotion": "string[pyarrow]",
+    "stance": "string[pyarrow]",
+    "sarcasm_score": "float32",
+    "topic": "int32",
+    "topic_confidence": "float32",
+}
 
 
 # ─────────────────────────────── helpers ────────────────────────────────
-def _nlp_partition(df_part):
+def _spacy_batch(texts, batch_size, n_process):
+    """spaCy features of one batch, timed as the "spacy" stage."""
+    with metrics.stage("spacy", rows=len(texts), batch_size=batch_size):
+        return list(extract_features(texts, features=SPACY_FEATURES, batch_size=batch_size, n_process=n_process))
+
+
+def _stance_batch(texts):
+    """Stance of one batch, timed as the "stance" stage."""
+    with metrics.stage("stance", rows=len(texts)):
+        return [detect_stance(t) for t in texts]
+
+
+@metrics.instrument("nlp.partition")
+def _nlp_partition(
+    df_part,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    spacy_batch: int = 64,
+    spacy_procs: int = 1,
+    topic_model_dir: str | None = None,
+    embed_root: str | None = None,
+    feature_cache: str | None = None,
+    cache_entries: int = DEFAULT_MAX_ENTRIES,
+    run_id: str | None = None,
+):
     """Apply all NLP functions to a pandas partition and return the enriched df."""
-    # Spacy bulk processing – single call per partition keeps it fast
-    docs = process_texts(df_part["clean_body"].tolist())
-    feats = [analyze_text(doc) for doc in docs]
-
-    df_part = df_part.copy()
-    df_part["entities"] = [f["entities"] for f in feats]
-    df_part["pos_counts"] = [f["pos_counts"] for f in feats]
-    df_part["sentiment"] = df_part["clean_body"].apply(fused_sentiment)
-    df_part["emotions"] = df_part["clean_body"].apply(detect_emotions)
-    df_part["stance"] = df_part["clean_body"].apply(detect_stance)
-    df_part["sarcasm_score"] = df_part["clean_body"].apply(detect_sarcasm)
-
-    # Topic modelling: run only if partition is non-empty
     texts = df_part["clean_body"].tolist()
-    if texts:
-        topics, probs = get_topics(texts)
-        df_part["topic"] = topics
-        df_part["topic_confidence"] = [float(p.max()) if hasattr(p, "max") else float(p) for p in probs]
-        # keywords once per partition for illustration
-        df_part.attrs["keywords"] = extract_keywords()
+    # Every stage runs once per distinct text; results of unchanged models come
+    # from the persistent cache
+    cache = FeatureCache(feature_cache, cache_entries) if feature_cache else None
+    try:
+        # Spacy streaming via nlp.pipe – only the components these features need run
+        feats = cached_map(
+            texts,
+            lambda batch: _spacy_batch(batch, spacy_batch, spacy_procs),
+            f"spacy:{','.join(SPACY_FEATURES)}", spacy_pipe.loaded_model_name(), spacy_pipe.MODEL_VERSION,
+            cache, run_id,
+        )
+
+        # Transformer classifiers run on length-bucketed batches, not row by row
+        sentiments = cached_map(
+            texts, lambda batch: fused_sentiment_batch(batch, batch_size, token_budget),
+            "sentiment", sentiment.MODEL_NAME, sentiment.MODEL_VERSION, cache, run_id,
+        )
+        emotions = cached_map(
+            texts, lambda batch: detect_emotions_batch(batch, batch_size, token_budget),
+            "emotion", emotion.MODEL_NAME, emotion.MODEL_VERSION, cache, run_id,
+        )
+        stances = cached_map(
+            texts, _stance_batch,
+            "stance", stance.MODEL_NAME, stance.MODEL_VERSION, cache, run_id,
+        )
+        sarcasm_scores = cached_map(
+            texts, lambda batch: detect_sarcasm_batch(batch, batch_size, token_budget),
+            "sarcasm", sarcasm.MODEL_NAME, sarcasm.MODEL_VERSION, cache, run_id,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+
+    # Topic assignment against the global model fitted once on a sample
+    if texts and topic_model_dir is not None:
+        embeddings = None
+        if embed_root is not None:
+            embeddings = EmbeddingCache(embed_root, EMBED_MODEL).get(df_part["id"].tolist())
+        topics, confidence = transform_topics(texts, topic_model_dir, embeddings)
     else:
-        df_part["topic"] = []
-        df_part["topic_confidence"] = []
-    return df_part
+        topics, confidence = [-1] * len(texts), [0.0] * len(texts)
+    return _enriched_frame(df_part, feats, sentiments, emotions, stances, sarcasm_scores, topics, confidence)
+
+
+def _enriched_frame(df_part, feats, sentiments, emotions, stances, sarcasm_scores, topics, confidence):
+    """
+    ``df_part`` with the ENRICHED_COLUMNS built from per-row stage outputs.
+
+    The stage outputs (and the feature cache) keep their per-row dicts; they are
+    packed into typed columns only here, so a partition never holds them as
+    object columns.
+    """
+    entities = spacy_pipe.entity_label_array([f["entities"] for f in feats])
+    pos = spacy_pipe.pos_count_matrix([f["pos_counts"] for f in feats])
+    emo = emotion.emotion_matrix(emotions)
+    columns = {
+        "entities": pd.arrays.ArrowExtensionArray(entities),
+        **{col: pos[:, j] for j, col in enumerate(POS_COLUMNS)},
+        "sentiment": np.asarray(sentiments, dtype=np.float32),
+        **{col: emo[:, j] for j, col in enumerate(EMOTION_COLUMNS)},
+        "dominant_emotion": [dominant_emotion(e) for e in emotions],
+        "stance": stances,
+        "sarcasm_score": np.asarray(sarcasm_scores, dtype=np.float32),
+        "topic": np.asarray(topics, dtype=np.int32),
+        "topic_confidence": np.asarray(confidence, dtype=np.float32),
+    }
+    # Built positionally and joined on a fresh index: partition indexes repeat
+    added = pd.DataFrame(columns).astype(ENRICHED_COLUMNS)
+    out = pd.concat([df_part.reset_index(drop=True), added], axis=1)
+    out.index = df_part.index
+    return out
+
+
+def _enriched_meta(meta):
+    """Empty frame with the columns and dtypes _nlp_partition returns for ``meta``."""
+    return meta.assign(**{col: pd.Series(dtype=dtype) for col, dtype in ENRICHED_COLUMNS.items()})
+
+
+def _parquet_schema(source, meta, extra=None):
+    """
+    Full Arrow schema of ``meta`` for to_parquet.
+
+    Dask infers the output schema from the meta, which cannot tell a list or
+    struct column from a string one, so the types of object columns come from
+    the ``source`` dataset the frame was read from, plus ``extra`` new columns.
+    """
+    # Hive directories like _date=… must not be skipped as hidden, but the
+    # ingest manifest and summary files are not data; files may differ in
+    # which columns are all-null, so unify their footers
+    dataset = ds.dataset(
+        str(source), format="parquet", partitioning="hive",
+        ignore_prefixes=[".", MANIFEST_FILE, METADATA_FILE, "_common_metadata"],
+    )
+    source_schema = pa.unify_schemas(
+        [fragment.physical_schema for fragment in dataset.get_fragments()], promote_options="permissive"
+    )
+    types = {
+        name: source_schema.field(name).type
+        for name, dtype in meta.dtypes.items()
+        if dtype == object and name in source_schema.names
+    }
+    types.update(extra or {})
+    schema = pa.Schema.from_pandas(meta, preserve_index=False).remove_metadata()
+    for name, typ in types.items():
+        schema = schema.set(schema.get_field_index(name), pa.field(name, typ))
+    return schema
+
+
+class _PortableArrowEngine(ArrowDatasetEngine):
+    """
+    pyarrow engine for frames with nested Arrow columns (e.g. ``entities``).
+
+    The pandas metadata written with each file names every column's pandas
+    dtype, and pandas cannot parse the names of nested ArrowDtypes back, so any
+    read of the dataset would fail. Such columns are recorded as ``object``;
+    readers get plain lists, or Arrow arrays with a ``types_mapper``.
+    """
+
+    @classmethod
+    def _pandas_to_arrow_table(cls, df, preserve_index=False, schema=None):
+        table = super()._pandas_to_arrow_table(df, preserve_index=preserve_index, schema=schema)
+        pandas_meta = table.schema.pandas_metadata
+        if not pandas_meta:
+            return table
+        for column in pandas_meta["columns"]:
+            try:
+                pd.api.types.pandas_dtype(column["numpy_type"])
+            except TypeError:
+                column["numpy_type"] = "object"
+        metadata = dict(table.schema.metadata)
+        metadata[b"pandas"] = json.dumps(pandas_meta).encode()
+        return table.replace_schema_metadata(metadata)
+
+
+def _write_features(df_enriched, parquet_clean, parquet_feat):
+    """
+    Write the enriched frame hive-partitioned by PARTITION_COLUMNS, with a
+    _metadata footer index, so nlp_core.query can prune partitions and row
+    groups without listing files.
+
+    Returns:
+        int: Number of data files written.
+
+    Raises:
+        RuntimeError: If a written file holds no rows.
+    """
+    # Dask writes one file per partition for every group of the partition
+    # columns, and categoricals group by every category, observed or not: each
+    # partition would write an empty file into every subreddit × day directory
+    df_enriched = df_enriched.astype({col: "string[pyarrow]" for col in PARTITION_COLUMNS})
+    df_enriched.to_parquet(
+        parquet_feat, overwrite=True, write_index=False,
+        schema=_parquet_schema(parquet_clean, df_enriched._meta), engine=_PortableArrowEngine,
+        partition_on=list(PARTITION_COLUMNS), write_metadata_file=True,
+    )
+    fragments = list(ds.dataset(
+        str(parquet_feat), format="parquet", partitioning="hive",
+        ignore_prefixes=[".", METADATA_FILE, "_common_metadata"],
+    ).get_fragments())
+    empty = [fragment.path for fragment in fragments if fragment.metadata.num_rows == 0]
+    if empty:
+        raise RuntimeError(f"{len(empty):,} of {len(fragments):,} feature files are empty, e.g. {empty[0]}")
+    return len(fragments)
+
+
+def _embed_partition(df_part, embed_root, model_name, dtype):
+    """Encode the partition's new or changed comments into the embedding cache."""
+    cache = EmbeddingCache(embed_root, model_name, dtype=dtype)
+    with metrics.stage("embed", model=model_name) as rec:
+        rec["rows"] = encoded = cache.update(df_part["id"].tolist(), df_part["clean_body"].astype(str).tolist())
+    return pd.Series([encoded], dtype="int64")
+
+
+def _merge_cache(embed_root, model_name):
+    """Size-tiered merge of the model's embedding cache segments."""
+    return EmbeddingCache(embed_root, model_name).maybe_merge()
+
+
+def _update_index(parquet_clean, embed_root, model_name, index_dir, index_type="hnsw"):
+    """
+    Bring the segmented search index in line with the cleaned comments: drop
+    comments that are gone, append each day's new comments as a segment and
+    merge segments in the background meanwhile.
+    """
+    meta = pd.read_parquet(parquet_clean, columns=["id", "subreddit", "created_utc", "_date"])
+    cache = EmbeddingCache(embed_root, model_name)
+    index = SegmentedEmbeddingStore(index_dir, model_name, index_type=index_type)
+    if not index.is_trained:
+        index.train(cache.sample(DEFAULT_TRAIN_SIZE))
+
+    removed = index.remove(sorted(set(index.ids()) - set(meta["id"])))
+    new = meta[~index.contains(meta["id"].tolist())]
+    index.start_background_merges(cache=cache)
+    try:
+        for day, group in new.groupby("_date", observed=True, sort=True):
+            ids = group["id"].tolist()
+            index.add(ids, cache.get(ids), meta=group.set_index("id")[["subreddit", "created_utc"]], label=str(day))
+    finally:
+        index.stop_background_merges()
+    index.maybe_merge(cache)
+    return {"added": len(new), "removed": removed, "segments": len(index.segments()), "rows": len(index)}
+
+
+def _fit_on_worker(docs, ids, topic_dir, embed_root):
+    embeddings = EmbeddingCache(embed_root, EMBED_MODEL).get(ids)
+    return fit_topic_model(docs, topic_dir, embeddings=embeddings)
+
+
+def _fit_topics(client, parquet_clean, topic_dir, embed_root, per_group, seed=0):
+    """
+    Fit the global topic model on a subreddit × day stratified sample of the
+    cleaned comments and save it to ``topic_dir``. Returns None if there is
+    nothing to fit on.
+    """
+    cols = ["id", "clean_body", "subreddit", "_date"]
+    # Cap each group inside every partition first so only a small sample
+    # travels to the driver, then cap again across partitions
+    clean = dd.read_parquet(parquet_clean, columns=cols)
+    sample = clean.map_partitions(stratified_sample, per_group, seed=seed, meta=clean._meta).compute()
+    sample = stratified_sample(sample, per_group, seed=seed)
+    docs = sample["clean_body"].astype(str).tolist()
+    if not docs:
+        return None
+    # Fit on a worker so the driver never loads the embedding model
+    ids = sample["id"].tolist()
+    keywords = client.submit(_fit_on_worker, docs, ids, str(topic_dir), str(embed_root), pure=False).result()
+    print(f"  ↳ Topic model fitted on {len(docs):,} sampled comments ({len(keywords)} topics)")
+    return topic_dir
+
+
+def _print_report(path):
+    """One line per stage of the run report at ``path``."""
+    with open(path, "r", encoding="utf-8") as fh:
+        stages = json.load(fh)["stages"]
+    for row in stages:
+        rate = f"{row['rows_per_s']:>10,.0f} rows/s" if row.get("rows_per_s") else " " * 17
+        rss = f"peak RSS {row['peak_rss_mb']:,.0f} MiB" if row.get("peak_rss_mb") else ""
+        print(f"  ↳ {row['stage']:<32} {row['wall_s']:8.1f}s wall  {row['cpu_s'] or 0:8.1f}s CPU  {rate}  {rss}")
+
+
+def _ingest_columns(cols):
+    """The clean stage needs the comment body, the embedding cache its id."""
+    if cols is None:
+        return None
+    return list(cols) + [c for c in ("id", "body") if c not in cols]
 
 
 def parse_args():
@@ -64,8 +356,67 @@ def parse_args():
     p.add_argument("--zst", required=True, help="Path to compressed comments dump")
     p.add_argument("--out-root", required=True, help="Root folder for all artefacts")
     p.add_argument("--sub", nargs="+", default=None, help="Subreddits to include")
-    p.add_argument("--workers", type=int, default=4, help="Dask workers")
+    p.add_argument("--workers", type=int, default=4, help="Dask workers (also ZST parser processes)")
+    p.add_argument(
+        "--worker-memory", default="auto",
+        help="Memory limit per Dask worker, e.g. 4GB (default: system memory / workers)",
+    )
     p.add_argument("--chunk", type=int, default=50_000, help="Rows per Arrow chunk")
+    p.add_argument(
+        "--cols", nargs="+", default=None,
+        help="Comment fields to keep in parquet_raw (default: nlp_core.io.DEFAULT_COLUMNS)",
+    )
+    p.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+        help="Texts per transformer forward pass",
+    )
+    p.add_argument(
+        "--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET,
+        help="Max padded tokens per transformer forward pass",
+    )
+    p.add_argument("--spacy-batch", type=int, default=64, help="Texts per spaCy nlp.pipe batch")
+    p.add_argument(
+        "--spacy-procs", type=int, default=1,
+        help="spaCy processes per worker (needs non-daemonic Dask workers if > 1)",
+    )
+    p.add_argument(
+        "--no-warmup", action="store_true",
+        help="Load models lazily inside the first NLP task instead of up front",
+    )
+    p.add_argument(
+        "--embed-dtype", choices=["float16", "float32"], default="float16",
+        help="Storage precision of the embedding cache",
+    )
+    p.add_argument(
+        "--index-model", default=EMBED_MODEL,
+        help="Encoder of the search index served by the API",
+    )
+    p.add_argument(
+        "--index-type", choices=INDEX_TYPES, default="hnsw",
+        help="FAISS index type of a new search index (see benchmarks/bench_index.py)",
+    )
+    p.add_argument("--no-index", action="store_true", help="Skip building the search index")
+    p.add_argument(
+        "--topic-sample", type=int, default=2_000,
+        help="Max comments per subreddit and day used to fit the topic model",
+    )
+    p.add_argument("--refit-topics", action="store_true", help="Refit an existing topic model")
+    p.add_argument(
+        "--feature-cache-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+        help="NLP results kept in the feature cache before LRU eviction",
+    )
+    p.add_argument("--no-feature-cache", action="store_true", help="Recompute every NLP stage")
+    p.add_argument("--no-rollup", action="store_true", help="Skip building the dashboard rollup cube")
+    p.add_argument(
+        "--profile", nargs="+", default=None, metavar="STAGE",
+        help="Run these stages (e.g. sentiment spacy, or all) under pyinstrument; "
+             "HTML profiles go to <out-root>/reports/profiles",
+    )
+    p.add_argument("--no-compact", action="store_true", help="Skip parquet_raw compaction")
+    p.add_argument(
+        "--restart", action="store_true",
+        help="Discard the earlier ingest output and convert the dump from the start",
+    )
     return p.parse_args()
 
 
@@ -76,39 +427,142 @@ def main():
     parquet_raw = ROOT / "parquet_raw"
     parquet_clean = ROOT / "parquet_clean"
     parquet_feat = ROOT / "features"
+    topic_dir = ROOT / "models" / "topic"
+    embed_root = ROOT / "embeddings"
+    index_dir = embed_root / "index"
+    rollup_path = ROOT / "rollup" / CUBE_FILE
+    feature_cache = ROOT / "cache" / "features.sqlite"
+    report_dir = ROOT / "reports"
+    run_id = time.strftime("%Y%m%dT%H%M%S")
+    if args.profile:
+        # Set before the cluster starts so worker processes inherit it
+        os.environ[metrics.PROFILE_ENV] = ",".join(args.profile)
+        os.environ.setdefault(metrics.PROFILE_DIR_ENV, str(report_dir / "profiles"))
 
     # 1 ─── ZST ➜ Parquet
     print("▪ Converting ZST to Parquet …")
-    zst_to_parquet(
-        args.zst,
-        str(parquet_raw),
-        subs=args.sub,
-        chunk_size=args.chunk,
-    )
+    with metrics.stage("pipeline.ingest"):
+        compaction = zst_to_parquet(
+            args.zst,
+            str(parquet_raw),
+            subs=args.sub,
+            chunk_size=args.chunk,
+            workers=args.workers,
+            columns=_ingest_columns(args.cols),
+            compact=not args.no_compact,
+            resume=not args.restart,
+        )
+    if compaction:
+        print(
+            f"  ↳ Compacted {compaction['files_before']} → {compaction['files_after']} files, "
+            f"scan {compaction['scan_s_before']}s → {compaction['scan_s_after']}s"
+        )
 
     # 2 ─── Spin up Dask cluster
-    client = Client(n_workers=args.workers, threads_per_worker=1)
+    client = Client(n_workers=args.workers, threads_per_worker=1, memory_limit=args.worker_memory)
     print(f"▪ Dask dashboard: {client.dashboard_link}")
 
     with performance_report(filename="dask_report.html"):
-        # 3 ─── Load & clean
-        df = dd.read_parquet(parquet_raw)
-        df = df.dropna(subset=["body"])
-        df["clean_body"] = df["body"].map(clean_text, meta=("clean_body", "object"))
-        df = df[df["clean_body"] != ""]
-        df = df.persist()
-        df.to_parquet(parquet_clean, overwrite=True)
-        print("  ↳ Cleaned dataframe persisted.")
-
-        # 4 ─── NLP enrichment (map_partitions keeps memory bounded)
-        df_enriched = df.map_partitions(_nlp_partition, meta=df._meta)
-        df_enriched.to_parquet(parquet_feat, overwrite=True)
+        # 3 ─── Load & clean: streamed partition by partition straight to disk;
+        # every later stage reads parquet_clean back instead of holding it in memory
+        with metrics.stage("pipeline.clean"):
+            df = dd.read_parquet(parquet_raw)
+            df = df.dropna(subset=["body"])
+            df["clean_body"] = df["body"].map_partitions(
+                clean_texts, meta=("clean_body", "string[pyarrow]")
+            )
+            df = df[df["clean_body"] != ""]
+            df.to_parquet(
+                parquet_clean, overwrite=True, write_index=False, schema=_parquet_schema(parquet_raw, df._meta)
+            )
+        print(f"  ↳ Cleaned comments written to {parquet_clean}")
+
+        # 4 ─── Embeddings: only new or changed comments are encoded
+        embed_models = [EMBED_MODEL] + ([args.index_model] if not args.no_index else [])
+        for model_name in dict.fromkeys(embed_models):
+            with metrics.stage("pipeline.embed", model=model_name) as rec:
+                encoded = dd.read_parquet(parquet_clean, columns=["id", "clean_body"]).map_partitions(
+                    _embed_partition, str(embed_root), model_name, args.embed_dtype, meta=("encoded", "int64"),
+                ).sum().compute()
+                rec["rows"] = int(encoded)
+                # Every partition adds a segment; merge them while no partition writes
+                merges = client.submit(_merge_cache, str(embed_root), model_name, pure=False).result()
+            print(f"  ↳ Encoded {encoded:,} new or changed comments with {model_name} ({merges} segment merges)")
+        if not args.no_index:
+            with metrics.stage("pipeline.index"):
+                stats = client.submit(
+                    _update_index, str(parquet_clean), str(embed_root), args.index_model, str(index_dir),
+                    args.index_type, pure=False,
+                ).result()
+            print(
+                f"  ↳ Search index: +{stats['added']:,} / -{stats['removed']:,} comments, "
+                f"{stats['rows']:,} vectors in {stats['segments']} segments at {index_dir}"
+            )
+
+        # 5 ─── Topic model: fit once on a stratified sample, transform per partition
+        if args.refit_topics or not (topic_dir / "topic_embeddings.safetensors").exists():
+            with metrics.stage("pipeline.topic_fit"):
+                topic_model_dir = _fit_topics(client, parquet_clean, topic_dir, embed_root, args.topic_sample)
+        else:
+            topic_model_dir = topic_dir
+            print(f"  ↳ Reusing topic model at {topic_dir}")
+        if topic_model_dir is not None:
+            print(f"  ↳ Topic keywords: {load_keywords(str(topic_model_dir))[:5]} …")
+
+        # 6 ─── NLP enrichment (map_partitions keeps memory bounded)
+        if not args.no_warmup:
+            load_times = client.run(warm_up, NLP_MODELS)
+            if topic_model_dir is not None:
+                client.run(load_topic_model, str(topic_model_dir))
+            slowest = max((max(t.values(), default=0.0) for t in load_times.values()), default=0.0)
+            print(f"  ↳ Models warmed up on {len(load_times)} workers (slowest load {slowest:.1f}s)")
+        with metrics.stage("pipeline.nlp"):
+            clean = dd.read_parquet(parquet_clean)
+            df_enriched = clean.map_partitions(
+                _nlp_partition,
+                batch_size=args.batch_size,
+                token_budget=args.token_budget,
+                spacy_batch=args.spacy_batch,
+                spacy_procs=args.spacy_procs,
+                topic_model_dir=str(topic_model_dir) if topic_model_dir is not None else None,
+                embed_root=str(embed_root),
+                feature_cache=None if args.no_feature_cache else str(feature_cache),
+                cache_entries=args.feature_cache_entries,
+                run_id=run_id,
+                meta=_enriched_meta(clean._meta),
+            )
+            feat_files = _write_features(df_enriched, parquet_clean, parquet_feat)
+        print(f"  ↳ Features written to {parquet_feat} ({feat_files:,} files)")
         client.wait_for_workers(1)   # ensure tasks were scheduled
+        if not args.no_feature_cache:
+            with FeatureCache(str(feature_cache), args.feature_cache_entries) as cache:
+                for stage_name, counts in cache.run_stats(run_id).items():
+                    print(
+                        f"  ↳ {stage_name:<24} {counts['rows']:>10,} rows  {counts['dedup_rate']:6.1%} duplicates  "
+                        f"{counts['hit_rate']:6.1%} cache hits  {counts['computed']:,} computed"
+                    )
+
+        # 7 ─── Dashboard rollup: 5-min × subreddit × stance × topic × emotion
+        if not args.no_rollup:
+            with metrics.stage("pipeline.rollup") as rec:
+                rec["rows"] = cube_rows = build_rollup(str(parquet_feat), str(rollup_path))
+            print(f"  ↳ Rollup cube: {cube_rows:,} rows at {rollup_path}")
+
+    # 8 ─── Run report: per-stage throughput, CPU, memory and model-load times
+    report = metrics.write_report(
+        metrics.collect(client), str(report_dir), run_id,
+        meta=vars(args),
+    )
+    _print_report(report["json"])
 
     print("✓ Pipeline completed. Outputs:")
     print(f"   raw    ➜ {parquet_raw}")
     print(f"   clean  ➜ {parquet_clean}")
     print(f"   feats  ➜ {parquet_feat}")
+    print(f"   embeds ➜ {embed_root}")
+    print(f"   topics ➜ {topic_dir}")
+    print(f"   rollup ➜ {rollup_path}")
+    print(f"   report ➜ {report['json']}")
     client.close()
 
 